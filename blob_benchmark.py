@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Blob extraction with connectedComponentsWithStats vs. findContours + contourArea.
+
+For every frame and color class (red, blue, orange) this takes the largest
+blob within the detectors' area limits both ways (segmentation.py
+method="components" and method="contours") and checks that they agree:
+same blob found or not, bounding boxes overlapping (IoU), areas within 1%.
+It also checks that box_label() and ball_label() give the same answer with
+contours and with the default method="auto", then times per frame the blob
+stage on the full frame (3 masks) and the two detectors end to end (their
+ROI crops and scales, segmentation included).
+
+Frames: debug_1.jpg, the synthetic targets of decision_benchmark.py and
+hollow / textured ones (a box with a specular hole, a ring, a pitted box, a
+ball with a highlight, a box cut by the image border), each also with speckle
+noise (thousands of tiny in-range regions, the case that costs the contour
+loop the most); or an image directory / video. Exits with status 1 if the
+methods disagree on any frame or there are no frames.
+
+Usage: python3 blob_benchmark.py [image_dir|video|image] [repeats]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("HOPE_HAL", "sim")  # take_potato opens GPIO at import
+
+import cv2
+import numpy as np
+
+import find_box_color
+import take_potato
+from decision_benchmark import BGR, synthetic_frame
+from find_box_color import BOX_SEGMENTER, MAX_BOX_AREA, MIN_BOX_AREA
+from segmentation import Segmentation, Segmenter
+from segmentation_benchmark import load_frames
+from take_potato import BALL_SEGMENTER, MAX_BALL_AREA, MIN_BALL_AREA
+
+CLASSES = [("red", MIN_BOX_AREA, MAX_BOX_AREA), ("blue", MIN_BOX_AREA, MAX_BOX_AREA),
+           ("orange", MIN_BALL_AREA, MAX_BALL_AREA)]
+SPECKLE_COLORS = [(0, 0, 230), (230, 40, 0), (0, 120, 240)]  # in-range red, blue, orange BGR
+
+
+def speckled(frame, seed, share=0.08):
+    """Frame with `share` of its pixels replaced by single in-range colored specks"""
+    rng = np.random.default_rng(seed)
+    noisy = frame.copy()
+    hit = rng.random(frame.shape[:2]) < share
+    noisy[hit] = np.array(SPECKLE_COLORS, np.uint8)[rng.integers(0, 3, int(hit.sum()))]
+    return noisy
+
+
+def shaped(seed):
+    """Targets that are not solid rectangles: [(name, frame)]"""
+    rng = np.random.default_rng(seed)
+    hollow = synthetic_frame("red", seed)
+    cv2.rectangle(hollow, (280, 200), (360, 280), BGR["white"], -1)  # specular highlight
+    ring = synthetic_frame(None, seed)
+    cv2.circle(ring, (320, 240), 110, BGR["blue"], 25)
+    pitted = synthetic_frame("blue", seed)
+    pitted[140:341, 220:421][rng.random((201, 201)) < 0.2] = 120  # texture: 20% of pixels out of range
+    ball = synthetic_frame(None, seed)
+    cv2.circle(ball, (320, 240), 90, BGR["orange"], -1)
+    cv2.circle(ball, (290, 210), 25, BGR["white"], -1)
+    edge = synthetic_frame(None, seed)
+    cv2.rectangle(edge, (0, 100), (150, 380), BGR["red"], -1)
+    return [("hollow red box", hollow), ("blue ring", ring), ("pitted blue box", pitted),
+            ("ball with highlight", ball), ("red box at the border", edge)]
+
+
+def test_frames(spec):
+    if spec is not None:
+        return [(f"{spec} #{i}", f) for i, f in enumerate(load_frames(spec))]
+    frames = [("debug_1.jpg", f) for f in load_frames("debug_1.jpg")]
+    frames += [(f"synthetic {color or 'empty'}", synthetic_frame(color, i))
+               for i, color in enumerate(["red", "blue", "orange", None])]
+    frames += shaped(len(frames))
+    return frames + [(f"{name} + speckle", speckled(frame, i)) for i, (name, frame) in enumerate(frames)]
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    return w * h / float(aw * ah + bw * bh - w * h)
+
+
+def labels(frame, method, repeats=1):
+    """(box_label, ball_label), ms per call pair, with the detectors' segmenters switched to `method`"""
+    saved = find_box_color.BOX_SEGMENTER, take_potato.BALL_SEGMENTER
+    find_box_color.BOX_SEGMENTER = Segmenter(saved[0].classes, method)
+    take_potato.BALL_SEGMENTER = Segmenter(saved[1].classes, method)
+    try:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            found = find_box_color.box_label(frame), take_potato.ball_label(frame)
+        return found, (time.perf_counter() - start) * 1000 / repeats
+    finally:
+        find_box_color.BOX_SEGMENTER, take_potato.BALL_SEGMENTER = saved
+
+
+def main():
+    spec = sys.argv[1] if len(sys.argv) > 1 else None
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    frames = test_frames(spec)
+    if not frames:
+        print(f"no frames from {spec!r}")
+        sys.exit(1)
+    segmenters = {method: Segmenter(BOX_SEGMENTER.classes + BALL_SEGMENTER.classes, method)
+                  for method in ("contours", "components", "auto")}
+
+    print(f"{'':<34}{'blob stage ms':^33}{'detectors ms':^22}")
+    print(f"{'frame':<26}{'regions':>8}{'contours':>11}{'components':>11}{'auto':>11}{'contours':>11}{'auto':>11}"
+          f"  agreement")
+    all_agree = True
+    for name, frame in frames:
+        bits = segmenters["contours"].segment(frame)
+        hsv, bits = bits.hsv, bits.bits
+        notes, timings = [], {}
+        blobs = {}
+        for method, segmenter in segmenters.items():
+            start = time.perf_counter()
+            for _ in range(repeats):
+                segmentation = Segmentation(segmenter, bits, hsv)
+                found = {cls: segmentation.largest(cls, lo, hi) for cls, lo, hi in CLASSES}
+            timings[method] = (time.perf_counter() - start) * 1000 / repeats
+            blobs[method] = found
+        regions = sum(len(Segmentation(segmenters["components"], bits, hsv).areas(cls)) for cls, _, _ in CLASSES)
+        for cls, _, _ in CLASSES:
+            a, b = blobs["contours"][cls], blobs["components"][cls]
+            if (a is None) != (b is None):
+                notes.append(f"{cls} found by {'contours' if a else 'components'} only")
+            elif a is not None:
+                overlap, ratio = iou(a.bbox, b.bbox), b.area / a.area
+                if overlap < 0.95 or not 0.99 < ratio < 1.01:
+                    notes.append(f"{cls} IoU {overlap:.2f}, area x{ratio:.3f}")
+        (old, old_ms), (new, new_ms) = (labels(frame, method, repeats) for method in ("contours", "auto"))
+        if old != new:
+            notes.append(f"labels {old} vs {new}")
+        all_agree = all_agree and not notes
+        print(f"{name[:25]:<26}{regions:>8}{timings['contours']:>11.2f}{timings['components']:>11.2f}"
+              f"{timings['auto']:>11.2f}{old_ms:>11.2f}{new_ms:>11.2f}  {'; '.join(notes) or 'same'}")
+    print(f"equivalent on every frame: {'yes' if all_agree else 'NO'}")
+    sys.exit(0 if all_agree else 1)
+
+
+if __name__ == '__main__':
+    main()
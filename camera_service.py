@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""Long-lived shared camera: a capture thread filling a ring of preallocated frames.
+
+Detectors read the newest frames straight out of the ring (no copy) instead of
+opening and warming up cv2.VideoCapture(0) on every command. The frame source
+is pluggable so the service runs without a camera:
+
+    CameraService(0)                  # V4L2 device index
+    CameraService("match.mp4")        # recorded video, replayed at `fps`
+    CameraService("frames/")          # directory of still images, looped
+
+Sources may deliver frames in a native pixel format (native_capture.py:
+I420, YUYV); the ring keeps them as they come and SharedCapture.read_view()
+converts only what a detector asks for.
+"""
+import os
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# (sequence number, capture time from time.monotonic(), frame view)
+Frame = Tuple[int, float, np.ndarray]
+
+
+class V4L2Source:
+    """Live camera opened through OpenCV (V4L2 on the Pi)"""
+
+    def __init__(self, index: int = 0, width: Optional[int] = None, height: Optional[int] = None):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.cap: Optional[cv2.VideoCapture] = None
+
+    def open(self) -> bool:
+        self.cap = cv2.VideoCapture(self.index)
+        if self.width and self.height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return self.cap.isOpened()
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        return self.cap.read(out) if out is not None else self.cap.read()
+
+    def release(self) -> None:
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class VideoFileSource:
+    """Recorded video, paced to `fps` and looped so it behaves like a camera"""
+
+    def __init__(self, path: str, fps: Optional[float] = 30.0, loop: bool = True):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.cap: Optional[cv2.VideoCapture] = None
+        self._next_time = 0.0
+
+    def open(self) -> bool:
+        self.cap = cv2.VideoCapture(self.path)
+        self._next_time = time.monotonic()
+        return self.cap.isOpened()
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        _pace(self)
+        ret, frame = self.cap.read(out) if out is not None else self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(out) if out is not None else self.cap.read()
+        return ret, frame
+
+    def release(self) -> None:
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class ImageDirSource:
+    """Directory of still images played back in name order at `fps`"""
+
+    def __init__(self, path: str, fps: Optional[float] = 30.0, loop: bool = True):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.files: List[str] = []
+        self.position = 0
+        self._next_time = 0.0
+
+    def open(self) -> bool:
+        self.files = sorted(os.path.join(self.path, name) for name in os.listdir(self.path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.position = 0
+        self._next_time = time.monotonic()
+        return bool(self.files)
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.position >= len(self.files):
+            if not self.loop:
+                return False, None
+            self.position = 0
+        _pace(self)
+        frame = cv2.imread(self.files[self.position])
+        self.position += 1
+        if frame is None:
+            return False, None
+        if out is not None and out.shape == frame.shape:
+            np.copyto(out, frame)
+            return True, out
+        return True, frame
+
+    def release(self) -> None:
+        self.files = []
+
+
+def _pace(source) -> None:
+    """Sleep until the next frame is due for file-backed sources"""
+    if not source.fps:
+        return
+    delay = source._next_time - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    source._next_time = max(source._next_time, time.monotonic() - 1.0) + 1.0 / source.fps
+
+
+def open_source(spec: Union[int, str, object], width: Optional[int] = None,
+                height: Optional[int] = None, fps: Optional[float] = 30.0):
+    """Build a frame source from a device index, video path, image directory or source object"""
+    if hasattr(spec, "read") and hasattr(spec, "open"):
+        return spec
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return V4L2Source(int(spec), width, height)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, fps)
+    return VideoFileSource(spec, fps)
+
+
+class CameraService:
+    """Capture thread writing into a fixed ring of preallocated frame buffers.
+
+    latest() and frames_since() return views into the ring, not copies. A slot
+    is only rewritten after `ring_size - 1` newer frames, so consumers that look
+    at a handful of recent frames never see them change underneath; check
+    `is_current(seq)` if a frame is held for longer than that. capture() readers
+    get their own copies.
+    """
+
+    def __init__(self, source: Union[int, str, object] = 0, ring_size: int = 8,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 fps: Optional[float] = 30.0, warmup_frames: int = 2):
+        self.source = open_source(source, width, height, fps)
+        self.ring_size = ring_size
+        self.warmup_frames = warmup_frames
+        self.pixel_format = "BGR"  # of the frames in the ring, set by start()
+        self.frames: Optional[np.ndarray] = None
+        self.timestamps = np.zeros(ring_size, dtype=np.float64)
+        self.sequence = 0  # number of frames written so far
+        self.dropped = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._decode = None
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """Open the source and start capturing; True once the first frame is in the ring"""
+        if self._running:
+            return True
+        if not self.source.open():
+            print("ERROR: Camera source not accessible", file=sys.stderr)
+            return False
+
+        # Sources with locked exposure say how few frames they need to settle
+        for _ in range(getattr(self.source, "settle_frames", self.warmup_frames)):
+            self.source.read()
+        self.pixel_format = getattr(self.source, "pixel_format", "BGR")
+        ret, first = self.source.read()
+        if not ret:
+            print("ERROR: Camera source returned no frames", file=sys.stderr)
+            self.source.release()
+            return False
+        if self.pixel_format == "MJPG":
+            # JPEG sizes vary and the ring slots are fixed: decode here as cv2 would
+            self.pixel_format = "BGR"
+            self._decode = lambda data: cv2.imdecode(data, cv2.IMREAD_COLOR)
+            first = self._decode(first)
+
+        # Preallocate the ring with the geometry of the first frame
+        self.frames = np.empty((self.ring_size,) + first.shape, dtype=first.dtype)
+        self._store(first)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name="camera-service", daemon=True)
+        self._thread.start()
+        return self.wait_for_frame(0, timeout) is not None
+
+    def stop(self) -> None:
+        """Stop the capture thread and release the source"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.source.release()
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _store(self, frame: np.ndarray) -> None:
+        """Copy a frame that was not decoded in place into the next slot and publish it"""
+        slot = self.sequence % self.ring_size
+        if frame.shape != self.frames.shape[1:]:
+            frame = cv2.resize(frame, (self.frames.shape[2], self.frames.shape[1]))
+        np.copyto(self.frames[slot], frame)
+        self._publish(slot)
+
+    def _publish(self, slot: int) -> None:
+        with self._cond:
+            self.timestamps[slot] = time.monotonic()
+            self.sequence += 1
+            self._cond.notify_all()
+
+    def _capture_loop(self) -> None:
+        while self._running:
+            slot = self.sequence % self.ring_size
+            try:
+                # Decode straight into the ring slot when the backend supports it
+                ret, frame = self.source.read(self.frames[slot])
+            except Exception as exc:
+                print(f"Camera read error: {exc}", file=sys.stderr)
+                ret, frame = False, None
+            if not ret or frame is None:
+                self.dropped += 1
+                time.sleep(0.005)
+                continue
+            if self._decode is not None:
+                frame = self._decode(frame)
+            if frame.ctypes.data == self.frames[slot].ctypes.data and frame.shape == self.frames.shape[1:]:
+                self._publish(slot)
+            else:
+                self._store(frame)
+
+    def _frame(self, seq: int) -> Frame:
+        slot = seq % self.ring_size
+        return seq, float(self.timestamps[slot]), self.frames[slot]
+
+    def is_current(self, seq: int) -> bool:
+        """True while the slot holding frame `seq` has not been overwritten"""
+        return self.sequence - seq < self.ring_size
+
+    def latest(self, n: int = 1) -> List[Frame]:
+        """The newest `n` frames (oldest first); fewer if not yet captured"""
+        with self._cond:
+            newest = self.sequence - 1
+            oldest = max(0, newest - min(n, self.ring_size - 1) + 1)
+            return [self._frame(seq) for seq in range(oldest, newest + 1)]
+
+    def frames_since(self, t: float) -> List[Frame]:
+        """Frames captured after monotonic time `t` that are still in the ring (oldest first)"""
+        with self._cond:
+            newest = self.sequence - 1
+            oldest = max(0, self.sequence - (self.ring_size - 1))
+            return [self._frame(seq) for seq in range(oldest, newest + 1)
+                    if self.timestamps[seq % self.ring_size] > t]
+
+    def wait_for_frame(self, after_seq: int = -1, timeout: float = 1.0) -> Optional[Frame]:
+        """Block until a frame newer than `after_seq` exists and return the newest one"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.sequence - 1 <= after_seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (not self._running and self.sequence == 0):
+                    return None
+                self._cond.wait(remaining)
+            return self._frame(self.sequence - 1)
+
+    def capture(self) -> "SharedCapture":
+        """A cv2.VideoCapture-like reader for code written against cap.read()"""
+        return SharedCapture(self)
+
+
+class SharedCapture:
+    """Drop-in for cv2.VideoCapture: read() returns the next new frame from the ring.
+
+    Frames are the caller's own (copied out of the ring where the view would
+    share its memory), so a detector can hold one while the ring moves on.
+    release() is a no-op; the controller owns the camera and keeps it open.
+    """
+
+    def __init__(self, service: CameraService, timeout: float = 1.0):
+        self.service = service
+        self.timeout = timeout
+        self.last_seq = service.sequence - 2  # the current frame counts as new
+
+    def isOpened(self) -> bool:
+        return self.service.running
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        return self.read_view("bgr")
+
+    def read_view(self, view: str = "bgr") -> Tuple[bool, Optional[np.ndarray]]:
+        """The next new frame as "bgr", "gray" or "half" (half-resolution BGR)"""
+        from native_capture import to_view
+        while True:
+            frame = self.service.wait_for_frame(self.last_seq, self.timeout)
+            if frame is None:
+                return False, None
+            seq, _, slot = frame
+            self.last_seq = seq
+            if view == "bgr" and self.service.pixel_format == "BGR":
+                image = slot
+            else:
+                image = to_view(slot, self.service.pixel_format, view)
+            if np.may_share_memory(image, slot):
+                image = image.copy()
+            if self.service.is_current(seq):
+                return True, image
+            # The capture thread reached the slot while it was read: take a newer frame
+
+    def release(self) -> None:
+        pass
+
+
+if __name__ == '__main__':
+    # Report capture rate for a source: camera_service.py [index|video|image_dir] [seconds]
+    spec = sys.argv[1] if len(sys.argv) > 1 else "0"
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    service = CameraService(spec)
+    if not service.start():
+        sys.exit(1)
+    try:
+        start_seq = service.sequence
+        time.sleep(seconds)
+        captured = service.sequence - start_seq
+        shape = service.frames.shape[1:]
+        print(f"{captured / seconds:.1f} frames/s, frame {shape}, dropped reads {service.dropped}")
+    finally:
+        service.stop()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Deadlines and cooperative cancellation for the controller's tasks.
+
+The controller runs each command's task on a worker thread under a
+CancelToken. The token is cancelled when the command's deadline passes or
+the ESP32 sends ABORT; long-running loops poll it and stop early:
+
+    while not vote.done and not cancelled():    # vision: stop, return the best guess so far
+        ...
+    check()                                      # motion: raise Cancelled between ticks
+
+The token lives in a context variable, so threads started with
+pipeline.background() (detectors, GPIO timelines) see the token of the task
+that started them. A task that does not return within `grace` seconds of
+the cancel (a driver call that never comes back) is abandoned: its thread
+keeps running, but its token stays cancelled, so it stops at its next check.
+"""
+import threading
+from concurrent.futures import Future, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+
+from pipeline import background
+
+CANCEL_GRACE = 1.0  # s a cancelled task gets to return its partial result
+CHECK_INTERVAL = 0.1  # s between checks in long waits
+
+
+class Cancelled(Exception):
+    """Raised by check() in a task whose token was cancelled"""
+
+
+class CancelToken:
+    """Set once, from any thread, with the reason ("timeout", "abort")"""
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel (runs the on_cancel callbacks); False if it already was"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as exc:
+                print(f"Cancel callback failed: {exc}")
+        return True
+
+    def on_cancel(self, callback: Callable[[], Any]) -> None:
+        """Call `callback` when cancelled (now, if it already is), e.g. to kill a subprocess"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Sleep up to `timeout` s, returning early (True) when cancelled"""
+        return self._event.wait(timeout)
+
+
+class _Never(CancelToken):
+    """The token outside any task: never cancelled"""
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        return False
+
+    def on_cancel(self, callback: Callable[[], Any]) -> None:
+        pass
+
+
+NEVER = _Never()
+
+_current: ContextVar[CancelToken] = ContextVar("cancel_token", default=NEVER)
+
+
+def current() -> CancelToken:
+    """The running task's token"""
+    return _current.get()
+
+
+def cancelled() -> bool:
+    return _current.get().cancelled
+
+
+def check() -> None:
+    """Raise Cancelled if the running task was cancelled"""
+    _current.get().check()
+
+
+@contextmanager
+def active(token: CancelToken):
+    """Make `token` current in this thread (and in threads it starts with background())"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def run_with_deadline(name: str, fn: Callable, deadline: Optional[float], token: CancelToken, *args,
+                      grace: float = CANCEL_GRACE) -> Future:
+    """Run fn(*args) on a worker thread with `token` current; wait at most `deadline` s.
+
+    On the deadline the token is cancelled ("timeout"); cancelled by the
+    deadline or from another thread, fn gets `grace` s more to return.
+    Returns fn's Future, which is not done if fn had to be abandoned.
+    """
+    def task():
+        with active(token):
+            return fn(*args)
+
+    future = background(name, task)
+    settled = threading.Event()
+    future.add_done_callback(lambda _: settled.set())
+    token.on_cancel(settled.set)
+    if not settled.wait(deadline):
+        token.cancel("timeout")
+    wait([future], timeout=grace)
+    return future
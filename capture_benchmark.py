@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Per-frame cost of getting from the camera's pixel format to what each detector
+needs: through BGR (cv2.VideoCapture's default) vs. native views (native_capture.py).
+
+For each native format (I420, YUYV, MJPG) and view:
+  gray  tag detector input: BGR conversion + cvtColor(GRAY) vs. the Y plane
+  half  color detectors' coarse pass: BGR conversion + 0.5x resize vs. to_half()
+Then checks that the box, ball and tag labels on native views agree with the
+labels on full BGR frames, frame by frame.
+
+Without --video the vision_pipeline_benchmark clip is synthesized.
+
+Usage: python3 capture_benchmark.py [--video clip.mp4] [--frames 150]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault("HOPE_HAL", "sim")  # take_potato opens GPIO at import
+
+import cv2
+
+from camera_service import open_source
+from find_box_color import BOX_HALF_MODE, box_label
+from is_red_good import TAG_SCALES, TAG_SWEEP
+from native_capture import EXPOSURE_PRESETS, from_bgr, to_bgr, to_view
+from tag_detector import detect
+from take_potato import BALL_HALF_MODE, ball_label
+from vision_pipeline_benchmark import synthesize
+
+REPEAT = 5  # conversions timed per frame, best kept
+
+
+def load(video, frames):
+    source = open_source(video, fps=None)
+    source.loop = False
+    source.open()
+    clip = []
+    try:
+        while len(clip) < frames:
+            ret, frame = source.read()
+            if not ret:
+                break
+            clip.append(frame)
+    finally:
+        source.release()
+    return clip
+
+
+def via_bgr(native, pixel_format, view):
+    bgr = to_bgr(native, pixel_format)
+    if view == "gray":
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(bgr, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+
+
+def time_ms(fn, frames):
+    """Mean over frames of the best of REPEAT runs, ms"""
+    total = 0.0
+    for frame in frames:
+        best = float("inf")
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            fn(frame)
+            best = min(best, time.perf_counter() - start)
+        total += best
+    return total / len(frames) * 1000
+
+
+def tag_label(gray):
+    tags = detect(gray, scales=TAG_SCALES, sweep=TAG_SWEEP)
+    return ("true" if tags[0].id % 2 == 0 else "false") if tags else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", help="Recorded video (default: a synthesized clip)")
+    parser.add_argument("--frames", type=int, default=150)
+    args = parser.parse_args()
+
+    video = args.video
+    if video is None:
+        video = os.path.join(tempfile.mkdtemp(prefix="hope_capture_"), "clip.avi")
+        synthesize(video, args.frames)
+    clip = load(video, args.frames)
+    print(f"{len(clip)} frames of {clip[0].shape[1]}x{clip[0].shape[0]}")
+
+    print(f"{'format':<8}{'view':<6}{'via BGR ms':>12}{'native ms':>11}{'speedup':>9}")
+    for pixel_format in ("I420", "YUYV", "MJPG"):
+        natives = [from_bgr(frame, pixel_format) for frame in clip]
+        for view in ("gray", "half"):
+            old = time_ms(lambda n: via_bgr(n, pixel_format, view), natives)
+            new = time_ms(lambda n: to_view(n, pixel_format, view), natives)
+            print(f"{pixel_format:<8}{view:<6}{old:>12.3f}{new:>11.3f}{old / new:>8.1f}x")
+
+    print(f"{'format':<8}{'task':<6}  labels vs. full BGR")
+    for pixel_format in ("I420", "YUYV", "MJPG"):
+        natives = [from_bgr(frame, pixel_format) for frame in clip]
+        checks = (("box", lambda f: box_label(f), lambda n: box_label(to_view(n, pixel_format, "half"), BOX_HALF_MODE)),
+                  ("ball", lambda f: ball_label(f), lambda n: ball_label(to_view(n, pixel_format, "half"), BALL_HALF_MODE)),
+                  ("tag", lambda f: tag_label(cv2.cvtColor(f, cv2.COLOR_BGR2GRAY)),
+                   lambda n: tag_label(to_view(n, pixel_format, "gray"))))
+        for task, reference, native in checks:
+            differ = sum(reference(f) != native(n) for f, n in zip(clip, natives))
+            print(f"{pixel_format:<8}{task:<6}  {'same' if not differ else f'{differ} differ'}")
+
+    print("frames dropped after start: " + ", ".join(f"{name} {preset.settle_frames}"
+                                                      for name, preset in EXPOSURE_PRESETS.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Change gating in front of the per-frame detectors: skip frames where nothing moved.
+
+Each frame is shrunk to a small color thumbnail (one cell per ~20x20 pixels,
+averaging away sensor noise; gray for gray frames) and compared, channel by
+channel, with the thumbnail of the last frame the detector actually ran on,
+so a red box turning into a blue one of the same brightness still counts:
+
+    no cell changed         the previous result is reused, the detector is skipped
+    a few cells changed     the task may re-check only that region (`region`
+                            callback, e.g. when nothing was seen before, a new
+                            target can only be where the image changed; the
+                            callback returns None to run the full detector,
+                            e.g. when a target may extend past the region)
+    otherwise               the detector runs on the whole frame
+
+Every `refresh` frames the detector runs on the whole frame regardless, so a
+slow drift or a missed change cannot hold a stale answer for long.
+
+    gate = ChangeGate("boxes", BOX_GATE)
+    for frame in frames:
+        label = gate(frame, box_label, box_region)   # box_label() only runs on changed frames
+
+Counts per task name (frames, full / region runs, reused results, detector
+and gate CPU ms) are kept process-wide in GATE_STATS; report() prints them.
+Set ENABLED = False to run every detector on every frame (replay.py --no-gate).
+"""
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Roi = Tuple[float, float, float, float]
+
+ENABLED = True  # process-wide switch on top of each task's GateConfig.enabled
+
+
+class GateConfig(NamedTuple):
+    enabled: bool = True
+    grid: Tuple[int, int] = (32, 24)  # thumbnail size (w, h): cells the frames are compared in
+    threshold: int = 8  # mean difference per cell and channel that counts as a change (0-255)
+    region_share: float = 0.25  # changes covering at most this share of the cells may be re-checked in place
+    refresh: int = 15  # the detector runs on the whole frame at least every N frames
+
+
+class GateStats:
+    """Counters of one task's gate, summed over every loop that used it"""
+
+    def __init__(self):
+        self.frames = 0
+        self.full = 0
+        self.region = 0
+        self.reused = 0
+        self.detect_ms = 0.0  # CPU ms in full detector runs
+        self.region_ms = 0.0  # CPU ms in region re-checks
+        self.gate_ms = 0.0  # CPU ms in the change detection itself
+
+    def saved_ms(self) -> float:
+        """CPU ms saved: skipped and region-only runs at the mean full-run cost, minus the gate's own cost"""
+        if not self.full:
+            return 0.0
+        mean = self.detect_ms / self.full
+        return (self.reused + self.region) * mean - self.region_ms - self.gate_ms
+
+    def summary(self) -> str:
+        skipped = self.frames - self.full
+        return (f"frames={self.frames} full={self.full} region={self.region} reused={self.reused} "
+                f"invocations_saved={skipped} cpu_ms_saved={self.saved_ms():.1f} gate_ms={self.gate_ms:.1f}")
+
+
+GATE_STATS: Dict[str, GateStats] = {}
+
+
+def report() -> str:
+    return "\n".join(f"{name:<8}{stats.summary()}" for name, stats in sorted(GATE_STATS.items()))
+
+
+class ChangeGate:
+    """Reuses a detector's result while the frame has not changed since it last ran"""
+
+    def __init__(self, name: str, config: GateConfig = GateConfig()):
+        self.config = config
+        self.stats = GATE_STATS.setdefault(name, GateStats())
+        self.reference: Optional[np.ndarray] = None  # thumbnail the current result was computed on
+        self.result: Any = None
+        self.since_full = 0
+        self._diff: Optional[np.ndarray] = None
+
+    def reset(self) -> None:
+        self.reference = None
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        return cv2.resize(frame, self.config.grid, interpolation=cv2.INTER_AREA)
+
+    def _changed_roi(self, changed: np.ndarray) -> Roi:
+        """Bounding box of the changed cells, one cell of padding, as frame fractions"""
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        height, width = changed.shape
+        return (max(0, cols[0] - 1) / width, max(0, rows[0] - 1) / height,
+                min(width, cols[-1] + 2) / width, min(height, rows[-1] + 2) / height)
+
+    def __call__(self, frame: np.ndarray, detect: Callable[[np.ndarray], Any],
+                 region: Optional[Callable[[np.ndarray, Roi, Any], Any]] = None) -> Any:
+        """detect(frame) -> result; region(frame, roi, previous) -> result, or None to run detect()"""
+        stats = self.stats
+        stats.frames += 1
+        if not (ENABLED and self.config.enabled):
+            start = time.thread_time()
+            result = detect(frame)
+            stats.full += 1
+            stats.detect_ms += (time.thread_time() - start) * 1000
+            return result
+
+        start = time.thread_time()
+        thumb = self._thumbnail(frame)
+        changed = None
+        if self.reference is not None and self.since_full < self.config.refresh:
+            self._diff = cv2.absdiff(thumb, self.reference, dst=self._diff)
+            diff = self._diff if self._diff.ndim == 2 else self._diff.max(axis=2)
+            changed = diff > self.config.threshold
+        stats.gate_ms += (time.thread_time() - start) * 1000
+        self.since_full += 1
+
+        if changed is not None and not changed.any():
+            stats.reused += 1
+            return self.result
+
+        if changed is not None and region is not None and changed.mean() <= self.config.region_share:
+            start = time.thread_time()
+            result = region(frame, self._changed_roi(changed), self.result)
+            stats.region_ms += (time.thread_time() - start) * 1000
+            if result is not None:
+                stats.region += 1
+                self.reference, self.result = thumb, result
+                return result
+
+        start = time.thread_time()
+        self.result = detect(frame)
+        stats.full += 1
+        stats.detect_ms += (time.thread_time() - start) * 1000
+        self.reference = thumb
+        self.since_full = 0
+        return self.result
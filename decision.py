@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Early-exit decision policy for the fixed-window vision detectors.
+
+Detectors feed one label per frame into a Vote and stop as soon as the answer
+is settled instead of always running for the full window:
+
+    vote = BOX_POLICY.start()
+    while not vote.done:
+        vote.add(label_for(frame))
+    decision = vote.decision()   # value, confidence, frames used, ms used
+
+A label is settled when it has at least `votes` of the last `window` frames,
+its share of the window reaches `min_confidence`, and `min_dwell` seconds have
+passed. "Nothing seen" (`absent`) can settle too, but only after the longer
+`absent_dwell`, since the target may still be coming into view. At
+`max_dwell` the most-voted label over the whole run wins, with earlier
+`priority` labels breaking ties.
+"""
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Hashable, NamedTuple, Optional, Sequence
+
+
+class Decision(NamedTuple):
+    value: Any
+    confidence: float  # share of the deciding window (or of all frames at timeout)
+    frames: int
+    elapsed_ms: float
+    settled: bool  # False when max_dwell ran out
+
+
+class DecisionPolicy:
+    """N-of-M voting with confidence threshold and min/max dwell times"""
+
+    def __init__(self, window: int = 5, votes: int = 3, min_confidence: float = 0.6,
+                 min_dwell: float = 0.0, max_dwell: float = 3.0,
+                 absent: Hashable = None, absent_dwell: Optional[float] = None,
+                 priority: Sequence[Hashable] = ()):
+        if votes > window:
+            raise ValueError("votes cannot exceed window")
+        self.window = window
+        self.votes = votes
+        self.min_confidence = min_confidence
+        self.min_dwell = min_dwell
+        self.max_dwell = max_dwell
+        self.absent = absent
+        self.absent_dwell = max_dwell if absent_dwell is None else absent_dwell
+        self.priority = list(priority)
+
+    def start(self, clock: Callable[[], float] = time.monotonic) -> "Vote":
+        return Vote(self, clock)
+
+
+class Vote:
+    """Running state of one decision"""
+
+    def __init__(self, policy: DecisionPolicy, clock: Callable[[], float] = time.monotonic):
+        self.policy = policy
+        self.clock = clock
+        self.start_time = clock()
+        self.recent: deque = deque(maxlen=policy.window)
+        self.totals: Counter = Counter()
+        self.frames = 0
+        self._settled: Optional[Decision] = None
+
+    @property
+    def elapsed(self) -> float:
+        return self.clock() - self.start_time
+
+    @property
+    def done(self) -> bool:
+        """True once a label is settled or max_dwell has passed"""
+        return self._settled is not None or self.elapsed >= self.policy.max_dwell
+
+    def add(self, label: Hashable, score: float = 1.0) -> Optional[Decision]:
+        """Record one frame's label (with an optional 0..1 score); returns the decision once settled"""
+        if self._settled is not None:
+            return self._settled
+        self.frames += 1
+        self.recent.append((label, score))
+        self.totals[label] += 1
+
+        policy = self.policy
+        elapsed = self.elapsed
+        dwell = policy.absent_dwell if label == policy.absent else policy.min_dwell
+        if elapsed < dwell or len(self.recent) < policy.votes:
+            return None
+
+        count = sum(1 for recent_label, _ in self.recent if recent_label == label)
+        confidence = sum(s for recent_label, s in self.recent if recent_label == label) / policy.window
+        if count >= policy.votes and confidence >= policy.min_confidence:
+            self._settled = Decision(label, confidence, self.frames, elapsed * 1000, True)
+        return self._settled
+
+    def decision(self) -> Decision:
+        """The settled decision, or the best label so far if the window ran out"""
+        if self._settled is not None:
+            return self._settled
+        elapsed_ms = self.elapsed * 1000
+        if not self.frames:
+            return Decision(self.policy.absent, 0.0, 0, elapsed_ms, False)
+
+        # Any real detection beats "nothing seen", as the fixed-window loops did
+        present = {label: n for label, n in self.totals.items() if label != self.policy.absent}
+        candidates = present or dict(self.totals)
+        rank = {label: i for i, label in enumerate(self.policy.priority)}
+        best = max(candidates, key=lambda label: (candidates[label], -rank.get(label, len(rank))))
+        return Decision(best, self.totals[best] / self.frames, self.frames, elapsed_ms, False)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Replay frame sequences through the box and ball detectors on a virtual 30 fps clock.
+
+Compares the old fixed 3-second windows with the early-exit DecisionPolicy:
+frames and ms to decision, and whether the answer matches the ground truth.
+Built-in synthetic sequences cover steady targets, empty scenes, targets that
+appear late and single-frame flicker; recorded sequences can be added as
+`image_dir:expected` arguments (expected is 1/0/-1 for boxes or orange/white).
+Exits with status 1 if the policy gets any answer wrong or takes longer than
+the old 3-second window to decide.
+
+Usage: python3 decision_benchmark.py [image_dir:expected ...]
+"""
+import os
+import sys
+
+os.environ.setdefault("HOPE_HAL", "sim")  # take_potato opens GPIO at import
+
+import cv2
+import numpy as np
+
+from camera_service import IMAGE_EXTENSIONS
+from find_box_color import BOX_POLICY, box_label, decide_boxes
+from replay import FPS, ReplayCapture
+from take_potato import BALL_POLICY, ball_label, decide_ball_color
+
+LEGACY_WINDOW_MS = 3000  # the fixed detection window the policy replaced
+
+BGR = {"red": (0, 0, 255), "blue": (255, 0, 0), "orange": (0, 128, 255), "white": (235, 235, 235)}
+
+
+def synthetic_frame(color, seed):
+    """640x480 noisy gray scene with an optional 200x200 colored target"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(90, 140, (480, 640, 3), dtype=np.uint8)
+    if color:
+        cv2.rectangle(frame, (220, 140), (420, 340), BGR[color], -1)
+    return frame
+
+
+def sequence(*parts):
+    """parts: (color or None, frame count) -> frame list"""
+    frames = []
+    for color, count in parts:
+        frames += [synthetic_frame(color, len(frames) + i) for i in range(count)]
+    return frames
+
+
+def legacy_boxes(cap):
+    """The old detect_boxes loop: 3 s window, any red frame wins, then blue"""
+    start, result, frames = cap.clock(), -1, 0
+    while cap.clock() - start < 3:
+        _, frame = cap.read()
+        frames += 1
+        label = box_label(frame)
+        if label == 1:
+            result = 1
+        elif result != 1 and label == 0:
+            result = 0
+    return result, frames, (cap.clock() - start) * 1000
+
+
+def legacy_ball(cap):
+    """The old detect_ball_color loop: stop on the first orange frame, else white after 3 s"""
+    start, frames = cap.clock(), 0
+    while cap.clock() - start < 3:
+        _, frame = cap.read()
+        frames += 1
+        if ball_label(frame) == "orange":
+            return "orange", frames, (cap.clock() - start) * 1000
+    return "white", frames, (cap.clock() - start) * 1000
+
+
+def load_dir(path):
+    names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+    return [cv2.imread(os.path.join(path, n)) for n in names]
+
+
+def main():
+    cases = [
+        ("boxes", "red box", sequence(("red", 90)), 1),
+        ("boxes", "blue box", sequence(("blue", 90)), 0),
+        ("boxes", "no box", sequence((None, 90)), -1),
+        ("boxes", "red appears at 0.5 s", sequence((None, 15), ("red", 75)), 1),
+        ("boxes", "blue, 1-frame red flicker", sequence(("blue", 10), ("red", 1), ("blue", 79)), 0),
+        ("ball", "orange ball", sequence(("orange", 90)), "orange"),
+        ("ball", "white ball", sequence(("white", 90)), "white"),
+        ("ball", "orange appears at 0.5 s", sequence(("white", 15), ("orange", 75)), "orange"),
+        ("ball", "orange appears at 1.5 s", sequence(("white", 45), ("orange", 45)), "orange"),
+        ("ball", "orange appears at 2.5 s", sequence(("white", 75), ("orange", 15)), "orange"),
+    ]
+    for arg in sys.argv[1:]:
+        path, _, expected = arg.rpartition(":")
+        kind = "ball" if expected in ("orange", "white") else "boxes"
+        cases.append((kind, path, load_dir(path), expected if kind == "ball" else int(expected)))
+
+    print(f"{'sequence':<30}{'legacy ms':>10}{'ok':>4}{'policy ms':>11}{'frames':>8}{'ok':>4}")
+    totals = [0.0, 0, 0.0, 0]
+    failures = []
+    for kind, name, frames, expected in cases:
+        if kind == "boxes":
+            legacy_value, _, legacy_ms = legacy_boxes(ReplayCapture(frames))
+            cap = ReplayCapture(frames)
+            decision = decide_boxes(cap, BOX_POLICY, clock=cap.clock)
+        else:
+            legacy_value, _, legacy_ms = legacy_ball(ReplayCapture(frames))
+            cap = ReplayCapture(frames)
+            decision = decide_ball_color(cap, BALL_POLICY, clock=cap.clock)
+        legacy_ok, policy_ok = legacy_value == expected, decision.value == expected
+        if not policy_ok:
+            failures.append(f"{name}: {decision.value}, expected {expected}")
+        if decision.elapsed_ms > LEGACY_WINDOW_MS + 1000 / FPS:
+            failures.append(f"{name}: decided after {decision.elapsed_ms:.0f} ms")
+        totals[0] += legacy_ms
+        totals[1] += legacy_ok
+        totals[2] += decision.elapsed_ms
+        totals[3] += policy_ok
+        print(f"{name[:29]:<30}{legacy_ms:>10.0f}{'yes' if legacy_ok else 'NO':>4}"
+              f"{decision.elapsed_ms:>11.0f}{decision.frames:>8}{'yes' if policy_ok else 'NO':>4}")
+    print(f"{'total':<30}{totals[0]:>10.0f}{totals[1]:>4}{totals[2]:>11.0f}{'':>8}{totals[3]:>4}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,65 +1,121 @@
 #!/usr/bin/env python3
-import cv2
 import numpy as np
+import sys
 import time
 
-def detect_boxes():
-    # Initialize camera
-    cap = cv2.VideoCapture(0)
+import hal
+from cancellation import cancelled
+from change_gate import ChangeGate, GateConfig
+from decision import Decision, DecisionPolicy
+from native_capture import CaptureProfile, read_view
+from roi import ProcessingMode, crosses_edge, detect_blobs, intersect
+from segmentation import ColorClass, Segmenter
+from speculation import get_cache
+from telemetry import span
+
+# Size constraints for ~25cm distance at 640x480 (scaled to the actual resolution)
+MIN_BOX_AREA = 10000
+MAX_BOX_AREA = 300000
+
+# HSV color ranges
+RED_LOWER1 = np.array([0, 120, 70])
+RED_UPPER1 = np.array([10, 255, 255])
+RED_LOWER2 = np.array([170, 120, 70])
+RED_UPPER2 = np.array([180, 255, 255])
+BLUE_LOWER = np.array([100, 150, 50])
+BLUE_UPPER = np.array([130, 255, 255])
+
+# Red and blue are classified together in one pass per frame
+BOX_SEGMENTER = Segmenter([
+    ColorClass("red", [(RED_LOWER1, RED_UPPER1), (RED_LOWER2, RED_UPPER2)]),
+    ColorClass("blue", [(BLUE_LOWER, BLUE_UPPER)]),
+])
+
+# Find candidates at half resolution, confirm them at full resolution.
+# Set roi=(x0, y0, x1, y1) (fractions of the frame) to ignore the rest of the view.
+BOX_MODE = ProcessingMode(roi=None, scale=0.5, refine=True)
+
+# Native cameras hand over the coarse pass directly: half-resolution BGR
+# converted from a quarter of the pixels, searched whole
+BOX_CAPTURE = CaptureProfile(view="half")
+BOX_HALF_MODE = BOX_MODE._replace(scale=1.0, refine=False)
+
+# Settle once 3 of the last 5 frames agree; "no box" (-1) needs 2 s of nothing
+BOX_POLICY = DecisionPolicy(window=5, votes=3, min_confidence=0.6, max_dwell=3.0,
+                            absent=-1, absent_dwell=2.0, priority=[1, 0])
+
+# Frames that did not change since the detector last ran reuse its label
+BOX_GATE = GateConfig()
+
+def box_label(frame, mode=None, hsv=None):
+    """Return 1 for a red box, 0 for a blue box, -1 if neither is in the frame
+    (hsv: roi.first_pass_hsv() of the frame, if already computed)"""
+    blobs = detect_blobs(BOX_SEGMENTER, frame, ["red", "blue"], MIN_BOX_AREA, MAX_BOX_AREA,
+                         BOX_MODE if mode is None else mode, first_match=True, hsv=hsv)
+    if blobs["red"] is not None:
+        return 1
+    if blobs["blue"] is not None:
+        return 0
+    return -1
+
+def box_region(frame, roi, previous, mode=BOX_MODE):
+    """Change gate region check: if no box was seen, a new one can only be where the image changed"""
+    if previous != -1:
+        return None
+    roi = intersect(mode.roi, roi)
+    if crosses_edge(BOX_SEGMENTER, frame, roi, ["red", "blue"]):
+        return None  # may be part of a larger region outside the crop: check the whole frame
+    return box_label(frame, mode._replace(roi=roi))
+
+def decide_boxes(cap=None, policy=BOX_POLICY, clock=time.monotonic):
+    """Vote on box_label() per frame until the policy settles; returns a Decision"""
+    # Initialize camera (or use the controller's shared camera)
+    owns_camera = cap is None
+    if owns_camera:
+        cap = hal.capture(0, BOX_CAPTURE)
     if not cap.isOpened():
-        return "error"
-    
-    # Size constraints for ~25cm distance (adjust as needed)
-    MIN_BOX_AREA = 10000
-    MAX_BOX_AREA = 300000
-    
-    # HSV color ranges
-    RED_LOWER1 = np.array([0, 120, 70])
-    RED_UPPER1 = np.array([10, 255, 255])
-    RED_LOWER2 = np.array([170, 120, 70])
-    RED_UPPER2 = np.array([180, 255, 255])
-    BLUE_LOWER = np.array([100, 150, 50])
-    BLUE_UPPER = np.array([130, 255, 255])
-    
-    start_time = time.time()
-    result = -1
+        return Decision("error", 0.0, 0, 0.0, False)
     
+    vote = policy.start(clock)
+    gate = ChangeGate("boxes", BOX_GATE)
     try:
-        while time.time() - start_time < 3:  # Run for 3 seconds
-            ret, frame = cap.read()
+        # On cancellation (deadline, ABORT) the best guess so far is the result
+        while not vote.done and not cancelled():
+            with span("camera"):
+                ret, frame, native = read_view(cap, BOX_CAPTURE.view)
             if not ret:
                 continue
-            
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            
-            # Detect red
-            red_mask = cv2.inRange(hsv, RED_LOWER1, RED_UPPER1) | \
-                      cv2.inRange(hsv, RED_LOWER2, RED_UPPER2)
-            red_contours, _ = cv2.findContours(red_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Detect blue
-            blue_mask = cv2.inRange(hsv, BLUE_LOWER, BLUE_UPPER)
-            blue_contours, _ = cv2.findContours(blue_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Check red contours
-            for cnt in red_contours:
-                area = cv2.contourArea(cnt)
-                if MIN_BOX_AREA < area < MAX_BOX_AREA:
-                    result = 1
-                    break
-            
-            # Check blue contours if red not found
-            if result != 1:
-                for cnt in blue_contours:
-                    area = cv2.contourArea(cnt)
-                    if MIN_BOX_AREA < area < MAX_BOX_AREA:
-                        result = 0
-                        break
+            mode = BOX_HALF_MODE if native else BOX_MODE
+            with span("detect"):
+                label = gate(frame, lambda f: box_label(f, mode),
+                             lambda f, roi, previous: box_region(f, roi, previous, mode))
+            vote.add(label)
     
     finally:
-        cap.release()
+        if owns_camera:
+            cap.release()
     
-    return result
+    return vote.decision()
+
+def detect_boxes(cap=None, policy=BOX_POLICY):
+    # A fresh answer from speculative detection (raspi.py --speculate) saves the wait
+    hit = get_cache().lookup("box")
+    if hit is not None:
+        print(f"Box decision {hit.decision.value} from the speculative cache "
+              f"({hit.age * 1000:.0f} ms old, confidence {hit.decision.confidence:.2f})", file=sys.stderr)
+        return hit.decision.value
+    decision = decide_boxes(cap, policy)
+    print(f"Box decision {decision.value} after {decision.frames} frames, "
+          f"{decision.elapsed_ms:.0f} ms (confidence {decision.confidence:.2f})", file=sys.stderr)
+    return decision.value
+
+def warm_up():
+    """Run the box detector once so its buffers exist before the first command (raspi.py start-up)"""
+    box_label(np.zeros((480, 640, 3), np.uint8))
+
+def run(camera=None):
+    """Entry point used by the controller's task registry"""
+    return str(detect_boxes(camera.capture() if camera is not None else None))
 
 if __name__ == '__main__':
-    print(detect_boxes())
\ No newline at end of file
+    print(run())
\ No newline at end of file
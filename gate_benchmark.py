@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Detector CPU time with and without change gating (change_gate.py), on replayed sequences.
+
+Replays replay.py's cases (the built-in synthetic ones, or a manifest) plus
+two moving scenes (a box and a ball panning across a noisy background: every
+frame changed, the gate's worst case) through the tasks twice, gate off and
+gate on, and reports per task: detector invocations, measured detector CPU
+ms (thread time of the per-frame work) and whether every case gave the same
+answer in both runs.
+
+Usage: python3 gate_benchmark.py [manifest.json]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("HOPE_HAL", "sim")  # take_potato opens GPIO at import
+
+import cv2
+
+import change_gate
+from decision_benchmark import BGR, synthetic_frame
+from replay import ReplayCapture, RUNNERS, load_manifest, synthetic_cases
+
+
+def panning(color, count=60):
+    """A 200x200 target moving 4 px per frame over a noisy background"""
+    frames = []
+    for i in range(count):
+        frame = synthetic_frame(None, i)
+        cv2.rectangle(frame, (40 + 4 * i, 140), (240 + 4 * i, 340), BGR[color], -1)
+        frames.append(frame)
+    return frames
+
+
+def run(cases, gated):
+    """[(task, name, value)], {task: thread CPU ms} with gating on or off"""
+    change_gate.ENABLED = gated
+    change_gate.GATE_STATS.clear()
+    values, cpu = [], {}
+    for task, name, frames, _ in cases:
+        cap = ReplayCapture(frames)
+        start = time.thread_time()
+        values.append((task, name, RUNNERS[task](cap)))
+        cpu[task] = cpu.get(task, 0.0) + (time.thread_time() - start) * 1000
+    return values, cpu, {name: stats for name, stats in change_gate.GATE_STATS.items()}
+
+
+def main():
+    cases = load_manifest(sys.argv[1]) if len(sys.argv) > 1 else synthetic_cases()
+    cases += [("boxes", "moving: red box", panning("red"), 1),
+              ("ball", "moving: orange ball", panning("orange"), "orange")]
+
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr = open(os.devnull, "w")  # the tasks' per-attempt logging
+    try:
+        run(cases, True)  # warm-up: detector construction, first-call allocations
+        plain, plain_cpu, plain_stats = run(cases, False)
+        gated, gated_cpu, gated_stats = run(cases, True)
+    finally:
+        sys.stdout.close()
+        sys.stdout, sys.stderr = real_stdout, sys.__stderr__
+
+    print(f"{'task':<7}{'runs off':>9}{'runs on':>9}{'saved':>7}{'CPU ms off':>12}{'CPU ms on':>11}{'saved':>8}")
+    for task in sorted(plain_cpu):
+        off, on = plain_stats[task], gated_stats[task]
+        saved = plain_cpu[task] - gated_cpu[task]
+        print(f"{task:<7}{off.full:>9}{on.full + on.region:>9}{off.full - on.full - on.region:>7}"
+              f"{plain_cpu[task]:>12.1f}{gated_cpu[task]:>11.1f}{saved / plain_cpu[task]:>7.0%}")
+    differ = [(task, name, a, b) for (task, name, a), (_, _, b) in zip(plain, gated) if a != b]
+    print("answers identical with and without gating: " + ("yes" if not differ else "NO"))
+    for task, name, a, b in differ:
+        print(f"  {name}: {a} without, {b} with")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""GPIO waveforms played from a background thread on absolute deadlines.
+
+A waveform is data: a list of Edge(t, pin, value) with t in seconds from the
+start, or built from (on, off) pairs with pattern_edges(). Every edge is timed
+against the start of the playback, not against the previous edge, so a late
+edge does not delay the ones after it (no drift). The thread waits on an Event
+until shortly before each deadline, then spins for the last SPIN seconds.
+
+    timeline = GpioTimeline(GPIO.output)
+    timeline.play(pattern_edges(pattern, BUZZER_PIN))   # returns at once
+    ...
+    stats = timeline.wait()                              # JitterStats of the playback
+
+MockGPIO records (time, pin, value) for each output call, so jitter can be
+measured on any Linux box (see gpio_timeline_benchmark.py).
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from pipeline import background
+
+SPIN = 0.002  # busy-wait this long before each edge; Event.wait alone can wake ~1 ms late
+
+
+class Edge(NamedTuple):
+    t: float  # seconds from the start of the waveform
+    pin: int
+    value: int
+
+
+class JitterStats(NamedTuple):
+    edges: int
+    mean_ms: float  # actual - scheduled edge time
+    p95_ms: float
+    max_ms: float
+    stopped: bool  # playback was cut short by stop()
+
+
+def pattern_edges(pattern: Sequence[Tuple[float, float]], pin: int, start: float = 0.0) -> List[Edge]:
+    """Edges for (on seconds, off seconds) pairs: HIGH, then LOW after `on`, next pair after `off`"""
+    edges = []
+    t = start
+    for on_time, off_time in pattern:
+        edges.append(Edge(t, pin, 1))
+        edges.append(Edge(t + on_time, pin, 0))
+        t += on_time + off_time
+    return edges
+
+
+def jitter_stats(errors: Sequence[float], stopped: bool = False) -> JitterStats:
+    """Summary of per-edge timing errors given in seconds"""
+    if not errors:
+        return JitterStats(0, 0.0, 0.0, 0.0, stopped)
+    ms = sorted(e * 1000 for e in errors)
+    p95 = ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))]
+    return JitterStats(len(ms), sum(ms) / len(ms), p95, ms[-1], stopped)
+
+
+class GpioTimeline:
+    """Plays edge lists on a daemon thread; one waveform at a time"""
+
+    def __init__(self, output: Callable[[int, int], None], clock=time.perf_counter, spin: float = SPIN,
+                 sleep: Optional[Callable[[float], None]] = None):
+        """sleep: wait with this instead of the Event (virtual time); stop() is then seen between edges"""
+        self.output = output
+        self.clock = clock
+        self.spin = spin
+        self.sleep = sleep
+        self.errors: List[float] = []  # per edge of the current playback, seconds
+        self._stop = threading.Event()
+        self._future: Optional[Future] = None
+
+    def play(self, edges: Sequence[Edge], name: str = "gpio timeline",
+             done: Optional[Callable[[JitterStats], None]] = None) -> Future:
+        """Start playing edges (a running waveform is stopped first); the Future gives JitterStats.
+
+        done(stats) runs on the playback thread when the waveform ends or is stopped,
+        before the Future resolves, so stop() and wait() return after it.
+        """
+        self.stop()
+        self._stop = threading.Event()
+        self._future = background(name, self._play, sorted(edges, key=lambda e: e.t), self._stop, done)
+        return self._future
+
+    def busy(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[JitterStats]:
+        """Block until the current waveform ends; its JitterStats (None if nothing was played)"""
+        return self._future.result(timeout) if self._future is not None else None
+
+    def stop(self) -> None:
+        """Cut the current waveform short; every pin it used is driven LOW"""
+        self._stop.set()
+        if self._future is not None:
+            self._future.result()
+
+    def _play(self, edges: List[Edge], stop: threading.Event, done) -> JitterStats:
+        errors = self.errors = []
+        start = self.clock()
+        try:
+            try:
+                for edge in edges:
+                    deadline = start + edge.t
+                    remaining = deadline - self.clock()
+                    if self.sleep is not None:
+                        if remaining > 0:
+                            self.sleep(remaining)
+                        if stop.is_set():
+                            break
+                    elif remaining > self.spin and stop.wait(remaining - self.spin):
+                        break
+                    while self.clock() < deadline:
+                        pass
+                    self.output(edge.pin, edge.value)
+                    errors.append(self.clock() - deadline)
+            finally:
+                if stop.is_set():
+                    for pin in {edge.pin for edge in edges}:
+                        self.output(pin, 0)
+        finally:
+            stats = jitter_stats(errors, stop.is_set())
+            if done is not None:
+                done(stats)  # also when output() raised, so the caller learns the waveform ended
+        return stats
+
+
+class MockGPIO:
+    """Stand-in for RPi.GPIO.output that records (clock(), pin, value)"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.log: List[Tuple[float, int, int]] = []
+
+    def output(self, pin: int, value: int) -> None:
+        self.log.append((self.clock(), pin, value))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Edge timing of the Starman chorus: the old sleep-chained loop vs. GpioTimeline.
+
+Both variants drive MockGPIO, which timestamps every output call, so this runs
+on plain Linux. Each edge's error is its logged time minus its ideal time from
+the start of the pattern; the last edge's error is the accumulated drift. The
+"loaded" rows run a CPU-bound Python thread alongside, as when a vision task
+shares the process. Pattern durations are scaled to keep the run short.
+
+Exits with status 1 if a timeline row exceeds its BOUNDS (p95 edge error,
+absolute drift), blocks the caller for more than MAX_BLOCKED_MS, or drifts
+more than the old loop did, in each of ATTEMPTS runs (one busy moment on the
+host can miss a bound, a regression misses it every time).
+
+Usage: python3 gpio_timeline_benchmark.py [scale]
+"""
+import sys
+import threading
+import time
+
+from gpio_timeline import GpioTimeline, MockGPIO, jitter_stats, pattern_edges
+from raspi_benchmark import install_mocks
+
+PIN = 15
+
+# Timeline rows: (p95 edge error ms, |drift| ms). Unloaded edges land within a
+# millisecond; a busy Python thread adds up to one GIL switch interval (5 ms) per
+# wake-up, and a loaded host sometimes a few more (still well under the old loop).
+BOUNDS = {"timeline": (3.0, 3.0), "timeline, loaded": (25.0, 25.0)}
+MAX_BLOCKED_MS = 20.0  # play() only schedules: the caller must not wait for the pattern
+ATTEMPTS = 3
+
+
+def legacy_play(pattern, output):
+    """play_starman.play_buzz_rhythm before the timeline: a sleep after every edge"""
+    for on_time, off_time in pattern:
+        output(PIN, 1)
+        time.sleep(on_time)
+        output(PIN, 0)
+        time.sleep(off_time)
+
+
+def timeline_play(pattern, output):
+    timeline = GpioTimeline(output)
+    timeline.play(pattern_edges(pattern, PIN))
+    return timeline
+
+
+def measure(play, pattern):
+    """(JitterStats, drift ms, ms the caller was blocked)"""
+    gpio = MockGPIO()
+    start = time.perf_counter()
+    timeline = play(pattern, gpio.output)
+    blocked = time.perf_counter() - start
+    if timeline is not None:
+        timeline.wait()
+    ideal = [start + edge.t for edge in pattern_edges(pattern, PIN)]
+    errors = [t - due for (t, _, _), due in zip(gpio.log, ideal)]
+    return jitter_stats(errors), errors[-1] * 1000, blocked * 1000
+
+
+def cpu_load(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def run(pattern):
+    """[(variant, JitterStats, drift ms, blocked ms)] for every variant, unloaded and loaded"""
+    rows = []
+    for loaded in (False, True):
+        stop = threading.Event()
+        if loaded:
+            threading.Thread(target=cpu_load, args=(stop,), daemon=True).start()
+        for name, play in (("sleep loop (old)", legacy_play), ("timeline", timeline_play)):
+            rows.append((f"{name}{', loaded' if loaded else ''}",) + measure(play, pattern))
+        stop.set()
+    return rows
+
+
+def check(rows):
+    """Bound violations of the timeline rows"""
+    results = {name: (stats, drift, blocked) for name, stats, drift, blocked in rows}
+    failures = []
+    for name, (max_p95, max_drift) in BOUNDS.items():
+        stats, drift, blocked = results[name]
+        legacy_drift = results[name.replace("timeline", "sleep loop (old)")][1]
+        if stats.p95_ms > max_p95:
+            failures.append(f"{name}: p95 {stats.p95_ms:.3f} ms > {max_p95} ms")
+        if abs(drift) > max_drift or abs(drift) > abs(legacy_drift):
+            failures.append(f"{name}: drift {drift:.3f} ms (bound {max_drift} ms, old loop {legacy_drift:.3f} ms)")
+        if blocked > MAX_BLOCKED_MS:
+            failures.append(f"{name}: caller blocked {blocked:.1f} ms")
+    return failures
+
+
+def main():
+    install_mocks(skip_waits=False)  # play_starman imports RPi.GPIO; the old loop needs the real sleep
+    from play_starman import pattern as chorus
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 0.25
+    pattern = [(on * scale, off * scale) for on, off in chorus]
+
+    for attempt in range(1, ATTEMPTS + 1):
+        rows = run(pattern)
+        failures = check(rows)
+        if not failures:
+            break
+        if attempt < ATTEMPTS:
+            print(f"attempt {attempt} missed a bound ({failures[0]}), measuring again", file=sys.stderr)
+
+    print(f"{len(pattern) * 2} edges, pattern scaled x{scale}")
+    print(f"{'variant':<26}{'mean ms':>9}{'p95 ms':>9}{'max ms':>9}{'drift ms':>10}{'blocked ms':>12}")
+    for name, stats, drift, blocked in rows:
+        print(f"{name:<26}{stats.mean_ms:>9.3f}{stats.p95_ms:>9.3f}{stats.max_ms:>9.3f}{drift:>10.3f}{blocked:>12.1f}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
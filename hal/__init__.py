@@ -0,0 +1,81 @@
+"""Hardware access for the task scripts: a Raspberry Pi backend and a simulated one.
+
+    GPIO = hal.gpio()                      # RPi.GPIO, or a recording SimGPIO
+    i2c = hal.i2c()                        # busio.I2C on SCL/SDA, or SimServoBus
+    ser = hal.serial_port(port, 115200)    # pyserial, or one end of an in-memory link
+    source = hal.camera(spec)              # frame source for CameraService
+    cap = hal.capture(0, profile)          # NativeCapture for a task without the shared camera
+    hal.clock(), hal.sleep(seconds)        # hardware timing: real or virtual time
+
+The backend comes from $HOPE_HAL ("pi" by default, or "sim"), or from use()
+called before the task modules are imported. It is imported on first use.
+In simulation, sleeps advance a virtual clock instead of waiting, so arm
+moves and suction waits take no wall time; see hal/sim.py and simulate.py.
+"""
+import importlib
+import os
+
+BACKENDS = ("pi", "sim")
+
+_name = os.environ.get("HOPE_HAL", "pi")
+_backend = None
+
+
+def use(name: str) -> None:
+    """Select the backend; call before any hardware is opened"""
+    global _name, _backend
+    if name not in BACKENDS:
+        raise ValueError(f"HAL backend must be one of {BACKENDS}, not {name!r}")
+    _name, _backend = name, None
+
+
+def backend():
+    """The selected backend module (hal.pi or hal.sim)"""
+    global _backend
+    if _backend is None:
+        if _name not in BACKENDS:
+            raise ValueError(f"HOPE_HAL must be one of {BACKENDS}, not {_name!r}")
+        _backend = importlib.import_module(f"hal.{_name}")
+    return _backend
+
+
+def simulated() -> bool:
+    return _name == "sim"
+
+
+def gpio():
+    """RPi.GPIO-compatible module"""
+    return backend().gpio()
+
+
+def i2c():
+    """busio.I2C-compatible bus for the PCA9685"""
+    return backend().i2c()
+
+
+def serial_port(port: str, baud_rate: int, timeout: float = 1.0):
+    """Open a serial.Serial-compatible port"""
+    return backend().serial_port(port, baud_rate, timeout)
+
+
+def serial_ports():
+    """Available ports, each with .device and .description"""
+    return backend().serial_ports()
+
+
+def camera(spec, width=None, height=None, fps=30.0):
+    """Frame source for CameraService from a device index, video file or image directory"""
+    return backend().camera(spec, width, height, fps)
+
+
+def capture(spec, profile):
+    """native_capture.NativeCapture for a task that opens the camera itself"""
+    return backend().capture(spec, profile)
+
+
+def clock() -> float:
+    return backend().clock()
+
+
+def sleep(seconds: float) -> None:
+    backend().sleep(seconds)
@@ -0,0 +1,43 @@
+"""Raspberry Pi backend: RPi.GPIO, busio I2C on the board's SCL/SDA, pyserial, native-format cameras"""
+import time
+
+clock = time.perf_counter
+sleep = time.sleep
+
+_i2c = None
+
+
+def gpio():
+    import RPi.GPIO as GPIO
+    return GPIO
+
+
+def i2c():
+    # One bus per process: blinka's platform detection runs once, not per task
+    global _i2c
+    if _i2c is None:
+        import board
+        import busio
+        _i2c = busio.I2C(board.SCL, board.SDA)
+    return _i2c
+
+
+def serial_port(port, baud_rate, timeout=1.0):
+    import serial
+    return serial.Serial(port, baud_rate, timeout=timeout)
+
+
+def serial_ports():
+    import serial.tools.list_ports
+    return serial.tools.list_ports.comports()
+
+
+def camera(spec, width=None, height=None, fps=30.0):
+    # picamera2 (I420) or V4L2 (YUYV), falling back to cv2.VideoCapture BGR
+    from native_capture import CaptureProfile, open_native
+    return open_native(spec, CaptureProfile(width or 640, height or 480, fps))
+
+
+def capture(spec, profile):
+    from native_capture import NativeCapture
+    return NativeCapture(spec, profile)
@@ -0,0 +1,320 @@
+"""Simulated backend: virtual time, recording GPIO, PCA9685 bus with servo kinematics,
+an in-memory serial link and recorded camera frames.
+
+Every device shares CLOCK. sleep() advances it instead of waiting, so a
+task's moves and waits take (almost) no wall time while its timing stays
+visible in virtual seconds. The clock is shared by all threads, so
+overlapping sleeps on two threads add up: simulated cycle times are an
+upper bound when steps run concurrently.
+
+    import hal; hal.use("sim")
+    esp = hal.sim.esp()          # the ESP32's end of the serial link
+    esp.write(b"TAKE_POTATO\\n"); esp.readline()
+
+stall() makes a device hang in wall time, as a stuck I2C bus or camera
+driver does, to check that the controller still answers (stall_check.py).
+"""
+import queue
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from pca9685 import CHANNELS, LED0_ON_L, OSCILLATOR_HZ, PRESCALE, FakeI2C
+
+SERVO_SPEED = 300.0  # deg/s, a loaded MG996R at 5 V (0.2 s / 60 deg)
+SERVO_PULSE = (500, 2400)  # us at 0 and 180 degrees, as PCA9685 defaults
+PORT = "sim"
+
+# device ("i2c", "camera") -> wall seconds every access blocks
+STALLS: Dict[str, float] = {}
+
+
+class SimClock:
+    """Virtual seconds, advanced by sleep()"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.now += max(0.0, seconds)
+        time.sleep(0)  # let other threads run, as a real sleep would
+
+
+CLOCK = SimClock()
+clock = CLOCK.time
+sleep = CLOCK.sleep
+
+
+def stall(device: str, seconds: float) -> None:
+    """Block every access to `device` for `seconds` of real time (0 clears it)"""
+    if seconds > 0:
+        STALLS[device] = seconds
+    else:
+        STALLS.pop(device, None)
+
+
+def _stall(device: str) -> None:
+    seconds = STALLS.get(device)
+    if seconds:
+        time.sleep(seconds)
+
+
+class SimGPIO:
+    """RPi.GPIO stand-in: outputs are logged as (time, pin, value), inputs set with set_input()"""
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, clock=CLOCK.time):
+        self.clock = clock
+        self.mode: Optional[int] = None
+        self.pins: Dict[int, int] = {}  # pin -> direction
+        self.levels: Dict[int, int] = {}
+        self.log: List[Tuple[float, int, int]] = []
+
+    def setmode(self, mode: int) -> None:
+        self.mode = mode
+
+    def setup(self, pin: int, direction: int) -> None:
+        if self.mode is None:
+            raise RuntimeError("Please set pin numbering mode using GPIO.setmode")
+        self.pins[pin] = direction
+
+    def output(self, pin: int, value) -> None:
+        if self.pins.get(pin) != self.OUT:
+            raise RuntimeError(f"GPIO {pin} has not been set up as an OUTPUT")
+        value = self.HIGH if value else self.LOW
+        self.levels[pin] = value
+        self.log.append((self.clock(), pin, value))
+
+    def input(self, pin: int) -> int:
+        if pin not in self.pins:
+            raise RuntimeError(f"GPIO {pin} has not been set up")
+        return self.levels.get(pin, self.LOW)
+
+    def set_input(self, pin: int, value: int) -> None:
+        """Drive an input pin from the simulation (e.g. the vacuum switch)"""
+        self.levels[pin] = value
+
+    def cleanup(self, channel=None) -> None:
+        pins = list(self.pins) if channel is None else [channel]
+        for pin in pins:
+            self.pins.pop(pin, None)
+            self.levels.pop(pin, None)
+        if channel is None:
+            self.mode = None
+
+
+class _Motion(NamedTuple):
+    t: float  # when the servo got its target
+    start: float  # angle at that time
+    target: Optional[float]  # None: released
+
+
+class SimServoBus(FakeI2C):
+    """FakeI2C whose PCA9685 channel writes drive servos that slew at SERVO_SPEED"""
+
+    def __init__(self, clock=CLOCK.time, address: int = 0x40):
+        super().__init__()
+        self.clock = clock
+        self.address = address
+        self.motions: Dict[int, _Motion] = {}
+
+    def writeto(self, address: int, buffer, *, start: int = 0, end: Optional[int] = None) -> None:
+        _stall("i2c")
+        super().writeto(address, buffer, start=start, end=end)
+        data = bytes(buffer[start:end])
+        if address != self.address or len(data) < 2:
+            return
+        first = max(0, (data[0] - LED0_ON_L) // 4)
+        last = min(CHANNELS - 1, (data[0] + len(data) - 2 - LED0_ON_L) // 4)
+        now = self.clock()
+        for channel in range(first, last + 1):
+            target = self.commanded(channel)
+            motion = self.motions.get(channel)
+            if motion is None or motion.target != target:
+                current = self.angle(channel, now)
+                self.motions[channel] = _Motion(now, target if current is None else current, target)
+
+    def commanded(self, channel: int) -> Optional[float]:
+        """Angle the chip is currently driving on a channel (None: output off)"""
+        count = self.channel_off(channel, self.address)
+        if count & 0x1000 or count == 0:
+            return None
+        prescale = self.registers[self.address][PRESCALE]
+        pulse_us = count * 1e6 * (prescale + 1) / OSCILLATOR_HZ
+        min_pulse, max_pulse = SERVO_PULSE
+        return (pulse_us - min_pulse) * 180.0 / (max_pulse - min_pulse)
+
+    def angle(self, channel: int, at: Optional[float] = None) -> Optional[float]:
+        """Where the servo horn is at time `at` (now by default); None if never driven"""
+        motion = self.motions.get(channel)
+        if motion is None:
+            return None
+        if motion.target is None:
+            return motion.start  # limp: stays where it was
+        t = (self.clock() if at is None else at) - motion.t
+        travel = motion.target - motion.start
+        step = min(abs(travel), SERVO_SPEED * t)
+        return motion.start + (step if travel >= 0 else -step)
+
+
+class SimCamera:
+    """Frame source wrapper whose reads hang while the camera is stalled"""
+
+    def __init__(self, source):
+        self.source = source
+        self.pixel_format = getattr(source, "pixel_format", "BGR")
+        self.settle_frames = getattr(source, "settle_frames", 2)
+
+    def open(self) -> bool:
+        return self.source.open()
+
+    def read(self, out=None):
+        _stall("camera")
+        return self.source.read(out)
+
+    def release(self) -> None:
+        self.source.release()
+
+
+class SimSerial:
+    """One end of an in-memory serial link with the parts of serial.Serial the controller uses"""
+
+    def __init__(self, timeout: Optional[float] = 1.0):
+        self.timeout = timeout
+        self.is_open = True
+        self.port = PORT
+        self._rx: "queue.Queue[bytes]" = queue.Queue()
+        self._buffer = b""
+        self.peer: Optional["SimSerial"] = None
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._buffer) + sum(len(chunk) for chunk in list(self._rx.queue))
+
+    def write(self, data: bytes) -> int:
+        if not self.is_open:
+            raise OSError("port is closed")
+        self.peer._rx.put(bytes(data))
+        return len(data)
+
+    def readline(self, timeout: Optional[float] = None) -> bytes:
+        """Bytes up to and including the next newline; what arrived so far on timeout"""
+        if not self.is_open:
+            raise OSError("port is closed")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                self._buffer += self._rx.get(timeout=remaining)
+            except queue.Empty:
+                break
+        line, newline, rest = self._buffer.partition(b"\n")
+        if newline:
+            self._buffer = rest
+            return line + newline
+        self._buffer = b""
+        return line
+
+    def reset_input_buffer(self) -> None:
+        self._buffer = b""
+        while not self._rx.empty():
+            self._rx.get_nowait()
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+class PortInfo(NamedTuple):
+    device: str
+    description: str
+
+
+_gpio: Optional[SimGPIO] = None
+_bus: Optional[SimServoBus] = None
+_link: Optional[Tuple[SimSerial, SimSerial]] = None
+
+
+def gpio() -> SimGPIO:
+    global _gpio
+    if _gpio is None:
+        _gpio = SimGPIO()
+    return _gpio
+
+
+def i2c() -> SimServoBus:
+    global _bus
+    if _bus is None:
+        _bus = SimServoBus()
+    return _bus
+
+
+def _pair() -> Tuple[SimSerial, SimSerial]:
+    global _link
+    if _link is None or not _link[0].is_open:
+        controller, esp32 = SimSerial(), SimSerial(timeout=None)
+        controller.peer, esp32.peer = esp32, controller
+        _link = (controller, esp32)
+    return _link
+
+
+def serial_port(port, baud_rate, timeout=1.0) -> SimSerial:
+    if port != PORT:
+        raise OSError(f"Simulated serial port is {PORT!r}, not {port!r}")
+    controller = _pair()[0]
+    controller.timeout = timeout
+    return controller
+
+
+def serial_ports() -> List[PortInfo]:
+    return [PortInfo(PORT, "ESP32 (simulated USB Serial)")]
+
+
+def esp() -> SimSerial:
+    """The ESP32's end of the serial link: write commands, readline() replies"""
+    return _pair()[1]
+
+
+def camera(spec, width=None, height=None, fps=30.0):
+    """Recorded frames only: a video file, an image directory or a source object.
+
+    Files are re-encoded to I420 as the Pi camera delivers them (native_capture.py).
+    """
+    from native_capture import CaptureProfile, open_native
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        raise ValueError("The simulated camera plays a recorded video or image directory, not a device")
+    return SimCamera(open_native(spec, CaptureProfile(width or 640, height or 480, fps, "I420")))
+
+
+class _NoDevice:
+    """Frame source for a device index: never opens, so the task answers without a camera"""
+
+    def open(self) -> bool:
+        return False
+
+    def read(self, out=None):
+        return False, None
+
+    def release(self) -> None:
+        pass
+
+
+def capture(spec, profile):
+    """NativeCapture over a recording; a device index opens nothing rather than the real camera"""
+    from native_capture import NativeCapture
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return NativeCapture(_NoDevice(), profile)
+    return NativeCapture(camera(spec, profile.width, profile.height, profile.fps), profile)
@@ -4,95 +4,133 @@ import sys
 import time
 import numpy as np
 
-def is_red_good(max_attempts=5, delay_sec=0.5):
+import hal
+from cancellation import cancelled, current
+from change_gate import ChangeGate, GateConfig
+from decision import DecisionPolicy
+from native_capture import CaptureProfile, read_view
+from roi import crop
+from speculation import get_cache
+from tag_detector import detect, draw_tags
+from telemetry import span
+from temporal import TemporalFilter
+
+# Part of the view the tag can appear in, (x0, y0, x1, y1) as fractions of the
+# frame; None searches the whole frame. Preprocessing only runs inside it.
+TAG_ROI = None
+
+# Extra passes for hard lighting: scales and tag_detector.SWEEP variants,
+# tried only when the base pass finds nothing. The sweep is opt-in
+# (TAG_SWEEP = SWEEP): it makes a no-tag attempt ~7x slower, and every
+# variant is another chance for a 16h5 false positive to return a parity
+# answer instead of "false".
+TAG_SCALES = (1.0,)
+TAG_SWEEP = ()
+
+# The tag detector only needs luma: the camera's Y plane, no color conversion
+TAG_CAPTURE = CaptureProfile(view="gray")
+
+# Speculative reads (speculation.py): 2 of the last 3 frames with a tag must agree
+TAG_POLICY = DecisionPolicy(window=3, votes=2, min_confidence=0.6, max_dwell=2.0)
+
+# Attempts on an unchanged view reuse the last detection
+TAG_GATE = GateConfig()
+
+def tag_region(gray, roi, previous):
+    """Change gate region check: if no tag was seen, a new one can only be where the image changed"""
+    if previous:
+        return None
+    region, (x, y) = crop(gray, roi)
+    tags = detect(region, scales=TAG_SCALES, sweep=TAG_SWEEP)
+    return [t._replace(corners=t.corners + np.float32([x, y])) for t in tags]
+
+def tag_value(tag):
+    """Reply for a detected tag: even IDs are good"""
+    return "true" if tag.id % 2 == 0 else "false"
+
+def is_red_good(max_attempts=5, delay_sec=0.5, cap=None, clock=time.monotonic, save_debug=True):
     """Robust AprilTag 16h5 detector with:
     - Adaptive lighting handling
     - Perspective/size tolerance
     - Multiple validation checks"""
     
-    # Enhanced detector parameters
-    params = cv2.aruco.DetectorParameters()
-    params.adaptiveThreshWinSizeMin = 3
-    params.adaptiveThreshWinSizeMax = 23
-    params.adaptiveThreshWinSizeStep = 10
-    params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
-    params.cornerRefinementWinSize = 5
-    params.cornerRefinementMaxIterations = 30
-    params.polygonalApproxAccuracyRate = 0.05  # More tolerant to distortion
-    
-    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_16h5)
-    detector = cv2.aruco.ArucoDetector(aruco_dict, params)
-    
-    cap = cv2.VideoCapture(0)
+    # Open the camera unless the controller's shared (already warm) camera is given
+    owns_camera = cap is None
+    if owns_camera:
+        cap = hal.capture(0, TAG_CAPTURE)
     if not cap.isOpened():
         print("ERROR: Camera not accessible", file=sys.stderr)
         return "false"
     
     try:
-        # Warm-up camera
-        for _ in range(2):
-            cap.read()
-        
-        for attempt in range(1, max_attempts + 1):
-            # Capture multiple frames for motion robustness
-            frames = []
-            for _ in range(3):
-                ret, frame = cap.read()
-                if ret:
-                    frames.append(frame)
-                time.sleep(0.1)
-            
-            if not frames:
-                print(f"Attempt {attempt}: No valid frames", file=sys.stderr)
-                time.sleep(delay_sec)
+        # Median of the newest 3 grayscale frames (ROI only) to reduce noise.
+        # Frames are pulled continuously, so the filter always holds the latest ones.
+        denoise = TemporalFilter(depth=3, mode="median")
+        gate = ChangeGate("tag", TAG_GATE)
+        attempt = 0
+        misses = 0
+        next_attempt = 0.0
+        while attempt < max_attempts and not cancelled():
+            with span("camera"):
+                ret, frame, _ = read_view(cap, TAG_CAPTURE.view)
+            if not ret:
+                misses += 1
+                if misses >= 3:
+                    attempt += 1
+                    misses = 0
+                    print(f"Attempt {attempt}: No valid frames", file=sys.stderr)
+                    current().wait(delay_sec)
                 continue
+            misses = 0
             
-            # Use median frame to reduce noise
-            median_frame = np.median(frames, axis=0).astype(np.uint8)
-            
-            # Preprocessing pipeline
-            gray = cv2.cvtColor(median_frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (3, 3), 0)
-            
-            # Adaptive histogram equalization
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-            enhanced = clahe.apply(gray)
-            
-            # Detect markers with enhanced parameters
-            corners, ids, _ = detector.detectMarkers(enhanced)
+            region, (roi_x, roi_y) = crop(frame, TAG_ROI)
+            median_gray = denoise(region)
+            if median_gray is None or clock() < next_attempt:
+                continue
+            attempt += 1
             
-            # Validation checks
-            valid_tags = []
-            if ids is not None:
-                for i, tag_id in enumerate(ids):
-                    # Check marker shape regularity
-                    peri = cv2.arcLength(corners[i][0], True)
-                    approx = cv2.approxPolyDP(corners[i][0], 0.04 * peri, True)
-                    
-                    if len(approx) == 4:  # Only accept quadrilateral markers
-                        valid_tags.append(tag_id[0])
+            # Preprocessing and detection with the cached, shared detector;
+            # sweep variants only run if the base parameters find nothing
+            with span("detect"):
+                tags = gate(median_gray, lambda gray: detect(gray, scales=TAG_SCALES, sweep=TAG_SWEEP), tag_region)
             
-            if valid_tags:
-                tag_id = valid_tags[0]
-                print(f"Attempt {attempt}: Valid AprilTag ID = {tag_id}", file=sys.stderr)
+            if tags:
+                tag = tags[0]
+                print(f"Attempt {attempt}: Valid AprilTag ID = {tag.id} "
+                      f"({tag.elapsed_ms:.1f} ms, scale {tag.scale}, variant {tag.variant})", file=sys.stderr)
                 
                 # Debug visualization (remove in production)
-                debug_frame = median_frame.copy()
-                cv2.aruco.drawDetectedMarkers(debug_frame, corners, ids)
-                cv2.imwrite(f"debug_{attempt}.jpg", debug_frame)
+                if save_debug:
+                    debug_frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR) if frame.ndim == 2 else frame.copy()
+                    draw_tags(debug_frame, [t._replace(corners=t.corners + np.float32([roi_x, roi_y])) for t in tags])
+                    cv2.imwrite(f"debug_{attempt}.jpg", debug_frame)
                 
-                return "true" if tag_id % 2 == 0 else "false"
+                return tag_value(tag)
             
             print(f"Attempt {attempt}: No valid tags detected", file=sys.stderr)
-            time.sleep(delay_sec)
+            next_attempt = clock() + delay_sec
         
         print("WARNING: No valid detection after retries", file=sys.stderr)
         return "false"
     
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        if owns_camera:
+            cap.release()
+
+def warm_up():
+    """Build the tag detectors and run one pass of every sweep variant (raspi.py start-up)"""
+    detect(np.zeros((480, 640), np.uint8), scales=TAG_SCALES, sweep=TAG_SWEEP)
+
+def run(camera=None):
+    """Entry point used by the controller's task registry"""
+    # A fresh answer from speculative detection (raspi.py --speculate) saves the wait
+    hit = get_cache().lookup("tag")
+    if hit is not None:
+        print(f"Tag decision {hit.decision.value} from the speculative cache "
+              f"({hit.age * 1000:.0f} ms old, confidence {hit.decision.confidence:.2f})", file=sys.stderr)
+        return hit.decision.value
+    return is_red_good(cap=camera.capture() if camera is not None else None)
 
 if __name__ == '__main__':
-    result = is_red_good()
+    result = run()
     print(result)
\ No newline at end of file
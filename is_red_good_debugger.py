@@ -1,15 +1,13 @@
 #!/usr/bin/env python3
 import cv2
 import numpy as np
+import sys
+
+from tag_detector import DEFAULT_CONFIG, get_detector
 
 def show_apriltag_debug():
-    # Initialize detector with optimized parameters
-    params = cv2.aruco.DetectorParameters()
-    params.adaptiveThreshWinSizeMin = 3
-    params.adaptiveThreshWinSizeMax = 23
-    params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
-    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_16h5)
-    detector = cv2.aruco.ArucoDetector(aruco_dict, params)
+    # Same cached detector and parameters as is_red_good
+    detector = get_detector(DEFAULT_CONFIG)
 
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
@@ -25,14 +23,9 @@ def show_apriltag_debug():
                 print("WARNING: Frame capture failed", file=sys.stderr)
                 continue
 
-            # Preprocessing
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (3, 3), 0)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-            enhanced = clahe.apply(gray)
-
-            # Detection
-            corners, ids, _ = detector.detectMarkers(enhanced)
+            # Preprocessing and detection
+            corners, ids = detector.detect_markers(frame)
+            enhanced = detector.enhanced
             debug_frame = frame.copy()
 
             # Visualization
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Coordinated multi-joint servo trajectories for the arm.
+
+All joints of a move start and stop together: every joint follows the same
+normalized velocity profile (trapezoidal, or S-curve with sinusoidal ramps),
+timed so that no joint exceeds its JointLimits. A list of waypoints becomes
+one timed Trajectory; where no joint reverses direction, the next move starts
+while the previous one is still decelerating (blending), so the arm does not
+stop at every intermediate pose.
+
+    planner = MotionPlanner(ServoKitServos(kit, [13, 14, 15]), limits, home=(180, 100, 180))
+    planner.move([Waypoint((60, 60, 13), speed=0.7, dwell=0.2), Waypoint((60, 7, 13))])
+
+Trajectories are sampled on a fixed-rate tick (TICK_HZ) and every joint is
+written on each tick; servos.settle() runs when a trajectory is complete.
+A cancelled task (cancellation.py) stops the arm at its last tick.
+SimulatedServos stands in for the hardware.
+"""
+import math
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from cancellation import cancelled, check
+from telemetry import span
+
+PROFILES = ("trapezoid", "scurve")
+TICK_HZ = 50.0  # PCA9685 servo PWM runs at 50 Hz, faster updates are not seen by the servo
+HOMING_SPEED = 0.3  # speed cap of a move planned from an unknown pose
+
+
+class JointLimits(NamedTuple):
+    max_velocity: float = 90.0  # deg/s
+    max_acceleration: float = 300.0  # deg/s^2
+    min_angle: float = 0.0
+    max_angle: float = 180.0
+
+
+class Waypoint(NamedTuple):
+    pose: Tuple[float, ...]  # one angle per joint
+    speed: float = 1.0  # fraction of the joint velocity/acceleration limits
+    dwell: float = 0.0  # seconds to hold the pose; > 0 also stops blending into the next move
+    blend: bool = True  # start the next move while this one decelerates
+
+
+class Segment(NamedTuple):
+    start: float  # trajectory time the move begins
+    duration: float
+    ramp: float  # acceleration (= deceleration) time
+    delta: Tuple[float, ...]
+
+
+class TickStats(NamedTuple):
+    ticks: int
+    skipped: int  # ticks dropped because a write ran late
+    elapsed: float
+
+
+def progress(t: float, duration: float, ramp: float, profile: str = "trapezoid") -> float:
+    """Fraction (0..1) of a move completed at time t"""
+    if t <= 0 or duration <= 0:
+        return 0.0 if duration > 0 else 1.0
+    if t >= duration:
+        return 1.0
+    cruise = 1.0 / (duration - ramp)  # normalized cruise velocity
+
+    def ramp_distance(x):
+        if profile == "scurve":
+            return cruise / 2 * (x - ramp / math.pi * math.sin(math.pi * x / ramp))
+        return cruise / 2 * x * x / ramp
+
+    if t < ramp:
+        return ramp_distance(t)
+    if t > duration - ramp:
+        return 1.0 - ramp_distance(duration - t)
+    return cruise * (t - ramp / 2)
+
+
+def segment_timing(delta: Sequence[float], limits: Sequence[JointLimits], speed: float = 1.0,
+                   profile: str = "trapezoid") -> Tuple[float, float]:
+    """(duration, ramp time) of the shortest synchronized move that keeps every joint within its limits"""
+    duration = ramp = cruise = 0.0
+    for d, limit in zip(delta, limits):
+        d = abs(d)
+        if d == 0:
+            continue
+        v = limit.max_velocity * speed
+        a = limit.max_acceleration * speed
+        if profile == "scurve":
+            a *= 2 / math.pi  # sinusoidal ramps peak at pi/2 times the mean acceleration
+        peak = math.sqrt(d * a) if d * a < v * v else v  # triangular if the joint never reaches v
+        ramp = max(ramp, peak / a)
+        duration = max(duration, peak / a + d / peak)
+        cruise = max(cruise, d / v)
+    # Longer ramps for the other joints' sake must not push any joint past its cruise speed
+    return max(duration, ramp + cruise, 2 * ramp), ramp
+
+
+class Trajectory:
+    """Timed sum of synchronized segments, sampled with sample(t)"""
+
+    def __init__(self, start: Sequence[float], segments: List[Segment], duration: float, profile: str):
+        self.start = tuple(float(a) for a in start)
+        self.segments = segments
+        self.duration = duration
+        self.profile = profile
+        self.end = tuple(a + sum(s.delta[i] for s in segments) for i, a in enumerate(self.start))
+
+    def sample(self, t: float) -> Tuple[float, ...]:
+        pose = list(self.start)
+        for segment in self.segments:
+            if t <= segment.start:
+                break
+            fraction = progress(t - segment.start, segment.duration, segment.ramp, self.profile)
+            for i, d in enumerate(segment.delta):
+                pose[i] += d * fraction
+        return tuple(pose)
+
+
+def plan(start: Sequence[float], waypoints: Sequence[Waypoint], limits: Sequence[JointLimits],
+         profile: str = "trapezoid") -> Trajectory:
+    """Blend waypoints into one Trajectory starting at pose `start`"""
+    if profile not in PROFILES:
+        raise ValueError(f"profile must be one of {PROFILES}")
+    segments: List[Segment] = []
+    pose = [float(a) for a in start]
+    t = 0.0
+    previous: Optional[Segment] = None
+    can_blend = False
+    for waypoint in waypoints:
+        if len(waypoint.pose) != len(limits):
+            raise ValueError(f"Waypoint {waypoint.pose} needs {len(limits)} joint angles")
+        for angle, limit in zip(waypoint.pose, limits):
+            if not limit.min_angle <= angle <= limit.max_angle:
+                raise ValueError(f"Angle {angle} outside {limit.min_angle}..{limit.max_angle}")
+
+        delta = tuple(float(b) - a for a, b in zip(pose, waypoint.pose))
+        duration, ramp = segment_timing(delta, limits, waypoint.speed, profile)
+        if duration > 0:
+            begin = t
+            # Only blend when no joint reverses: the overlapping ramps then add up to
+            # a velocity between the two cruise speeds, never above either limit
+            if can_blend and previous is not None and all(a * b >= 0 for a, b in zip(previous.delta, delta)):
+                begin = t - min(previous.ramp, ramp)
+            previous = Segment(begin, duration, ramp, delta)
+            segments.append(previous)
+            t = begin + duration
+        t += waypoint.dwell
+        can_blend = waypoint.blend and waypoint.dwell == 0
+        pose = [float(a) for a in waypoint.pose]
+    return Trajectory(start, segments, t, profile)
+
+
+class ServoKitServos:
+    """Arm joints on adafruit ServoKit channels; unchanged angles are not rewritten"""
+
+    def __init__(self, kit, channels: Sequence[int]):
+        self.kit = kit
+        self.channels = list(channels)
+        self._last: List[Optional[float]] = [None] * len(self.channels)
+
+    def read(self) -> List[Optional[float]]:
+        return [self.kit.servo[channel].angle for channel in self.channels]
+
+    def write(self, pose: Sequence[float]) -> None:
+        for i, (channel, angle) in enumerate(zip(self.channels, pose)):
+            angle = round(angle, 1)
+            if angle != self._last[i]:
+                self.kit.servo[channel].angle = angle
+                self._last[i] = angle
+
+    def settle(self) -> None:
+        pass
+
+
+class SimulatedServos:
+    """In-memory joints that record every written pose as (clock(), pose)"""
+
+    def __init__(self, pose: Sequence[Optional[float]] = (None, None, None), clock=time.monotonic):
+        self.angles: List[Optional[float]] = list(pose)
+        self.clock = clock
+        self.log: List[Tuple[float, Tuple[float, ...]]] = []
+
+    def read(self) -> List[Optional[float]]:
+        return list(self.angles)
+
+    def write(self, pose: Sequence[float]) -> None:
+        self.angles = [round(angle, 1) for angle in pose]
+        self.log.append((self.clock(), tuple(self.angles)))
+
+    def settle(self) -> None:
+        pass
+
+
+class MotionPlanner:
+    """Plans moves from the current arm pose and plays them on a fixed-rate tick"""
+
+    def __init__(self, servos, limits: Sequence[JointLimits], profile: str = "trapezoid",
+                 home: Optional[Sequence[float]] = None, tick_hz: float = TICK_HZ,
+                 clock=time.perf_counter, sleep=time.sleep):
+        if profile not in PROFILES:
+            raise ValueError(f"profile must be one of {PROFILES}")
+        self.servos = servos
+        self.limits = list(limits)
+        self.profile = profile
+        self.home = tuple(home) if home is not None else None
+        self.tick_hz = tick_hz
+        self.clock = clock
+        self.sleep = sleep
+
+    def pose(self) -> Tuple[float, ...]:
+        """Current joint angles; joints never written yet are assumed to be at home"""
+        angles = self.servos.read()
+        if any(a is None for a in angles):
+            if self.home is None:
+                raise RuntimeError("Arm pose unknown and no home pose configured")
+            angles = [h if a is None else a for a, h in zip(angles, self.home)]
+        return tuple(angles)
+
+    def plan(self, waypoints: Sequence[Waypoint]) -> Trajectory:
+        """Trajectory from the current pose; from an unknown one (assumed home) at HOMING_SPEED at most"""
+        if any(a is None for a in self.servos.read()):
+            waypoints = [w._replace(speed=min(w.speed, HOMING_SPEED)) for w in waypoints]
+        return plan(self.pose(), waypoints, self.limits, self.profile)
+
+    def run(self, trajectory: Trajectory) -> TickStats:
+        """Write trajectory.sample() to the servos every tick until it ends"""
+        with span("motion"):
+            return self._run(trajectory)
+
+    def _run(self, trajectory: Trajectory) -> TickStats:
+        period = 1.0 / self.tick_hz
+        start = self.clock()
+        ticks = skipped = 0
+        while ticks * period < trajectory.duration:
+            if cancelled():
+                # Hold the last written pose; the caller decides what happens next
+                self.servos.settle()
+                check()
+            self.servos.write(trajectory.sample(ticks * period))
+            ticks += 1
+            wait = start + ticks * period - self.clock()
+            if wait > 0:
+                self.sleep(wait)
+            elif wait < -period:
+                # Fell behind by more than a tick: drop the missed ticks instead of rushing through them
+                missed = int(-wait / period)
+                ticks += missed
+                skipped += missed
+        self.servos.write(trajectory.end)
+        self.servos.settle()
+        return TickStats(ticks, skipped, self.clock() - start)
+
+    def move(self, waypoints: Sequence[Waypoint]) -> TickStats:
+        """Plan from the current pose and run it; a move that changes nothing writes nothing"""
+        trajectory = self.plan(waypoints)
+        if not trajectory.segments and trajectory.duration == 0:
+            return TickStats(0, 0, 0.0)
+        return self.run(trajectory)
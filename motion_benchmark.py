@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Cycle time of take_potato_right + place_potato_orange: serialized joint moves vs. the motion planner.
+
+Runs PotatoServoController on a virtual clock with mocked hardware (see
+raspi_benchmark.py). The legacy controller is the old per-joint
+turn_servo_to_angle_with_speed loop (0.03/speed s per step, one joint after
+another); the new one plays coordinated trajectories on SimulatedServos with
+the trapezoidal and S-curve profiles. Fixed waits (suction, settling) are
+reported separately; the new sequence starts the pump during the descent.
+
+Usage: python3 motion_benchmark.py
+"""
+import os
+import sys
+import time
+
+from raspi_benchmark import install_mocks
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0  # time spent in plain time.sleep() calls (fixed waits)
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+    def wait(self, seconds):
+        self.slept += max(0.0, seconds)
+        self.sleep(seconds)
+
+
+def main():
+    install_mocks()
+    sys.stdout = open(os.devnull, "w")  # silence the controller's prints
+    from motion import TICK_HZ, SimulatedServos
+    from take_potato import HOME_POSE, PotatoServoController
+
+    class LegacyController(PotatoServoController):
+        """Old serialized moves: one joint at a time, one step per 0.03/speed s, fixed sleeps"""
+
+        step_sleep = time.sleep
+
+        def turn_servo_to_angle_with_speed(self, channel, target_angle, speed=0.5):
+            current_angle = self.pca.angles[channel] or 0
+            step = max(1, int(3 * speed))
+            if current_angle < target_angle:
+                for angle in range(int(current_angle), int(target_angle) + 1, step):
+                    self.set_angle(channel, angle)
+                    self.step_sleep(0.03 / speed)
+            else:
+                for angle in range(int(current_angle), int(target_angle) - 1, -step):
+                    self.set_angle(channel, angle)
+                    self.step_sleep(0.03 / speed)
+            self.set_angle(channel, target_angle)
+
+        def set_angle(self, channel, angle):
+            self.pca.set_angle(channel, angle)
+            self.pca.flush()
+
+        def move_to_home_position(self, speed=0.6):
+            self.turn_servo_to_angle_with_speed(self.elbow_servo, 180, speed)
+            self.turn_servo_to_angle_with_speed(self.shoulder_servo, 100, speed)
+            self.turn_servo_to_angle_with_speed(self.base_servo, 180, speed)
+
+        def position_arm(self, base_angle, shoulder_angle, elbow_angle, speed=0.6):
+            self.turn_servo_to_angle_with_speed(self.base_servo, base_angle, speed)
+            self.turn_servo_to_angle_with_speed(self.shoulder_servo, shoulder_angle, speed)
+            self.turn_servo_to_angle_with_speed(self.elbow_servo, elbow_angle, speed)
+
+        def take_potato_right(self):
+            self.position_arm(base_angle=60, shoulder_angle=60, elbow_angle=13, speed=0.7)
+            time.sleep(0.2)
+            self.position_arm(base_angle=60, shoulder_angle=7, elbow_angle=13, speed=0.6)
+            time.sleep(0.2)
+            self.sucker_on()
+            time.sleep(0.5)
+            time.sleep(3)
+            self.position_arm(base_angle=60, shoulder_angle=60, elbow_angle=13, speed=0.7)
+
+        def place_potato_orange(self):
+            self.position_arm(base_angle=5, shoulder_angle=126, elbow_angle=0, speed=0.6)
+            time.sleep(0.2)
+            self.sucker_off()
+            time.sleep(3)
+            self.move_to_home_position()
+
+    def cycle(controller, vclock):
+        start = vclock.now
+        controller.take_potato_right()
+        take = vclock.now - start
+        controller.place_potato_orange()
+        return take, vclock.now - start - take
+
+    results = []
+
+    vclock = VirtualClock()
+    time.sleep = vclock.wait
+    legacy = LegacyController()
+    legacy.step_sleep = vclock.sleep
+    for channel, angle in zip(legacy.arm_channels, HOME_POSE):
+        legacy.set_angle(channel, angle)
+    take, place = cycle(legacy, vclock)
+    results.append(("serialized (old)", take, place, vclock.slept, None))
+
+    for profile in ("trapezoid", "scurve"):
+        vclock = VirtualClock()
+        time.sleep = vclock.wait
+        servos = SimulatedServos(HOME_POSE, clock=vclock.clock)
+        controller = PotatoServoController(servos=servos)
+        controller.motion.profile = profile
+        controller.motion.clock, controller.motion.sleep = vclock.clock, vclock.sleep
+        controller.executor._sleep = vclock.wait  # sequence waits count as fixed waits
+        take, place = cycle(controller, vclock)
+        results.append((f"planner, {profile}", take, place, vclock.slept, len(servos.log)))
+
+    sys.stdout = sys.__stdout__
+    print(f"{'controller':<22}{'take s':>8}{'place s':>9}{'total s':>9}{'fixed waits':>13}{'moving s':>10}{'ticks':>7}")
+    for name, take, place, waits, ticks in results:
+        total = take + place
+        print(f"{name:<22}{take:>8.2f}{place:>9.2f}{total:>9.2f}{waits:>13.2f}{total - waits:>10.2f}"
+              f"{'-' if ticks is None else ticks:>7}")
+    print(f"(motion planner ticks at {TICK_HZ:.0f} Hz)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""Declarative arm/gate routines, compiled to a flat timed schedule.
+
+A sequence file (YAML or JSON) maps routine names to lists of steps:
+
+    move: [base, shoulder, elbow]        # null keeps a joint where it is; consecutive moves blend
+      speed: 0.6                         #   optional, fraction of the joint limits
+      settle: 0.2                        #   optional hold at the pose (stops blending)
+    servos: {5: 90, 6: 0}                # single channels (gates), written in one flush
+      settle: 0.5                        #   waited only if a channel actually moved
+    gpio: {pin: 17, value: 1}
+    wait: 3.0                            # or {timeout: 3.0, until: vacuum}: ends early once
+                                         #   the named condition holds
+    detect: ball_color                   # start a detector in the background
+    branch: {detector: ball_color, cases: {orange: [...], default: [...]}}
+    call: place_orange                   # inline another routine
+    result: "true"                       # value returned by the run
+
+Any step may carry `name:`, used as its label in the timing trace. Branch
+cases match the detector's value as lower-case text, so YAML's `true:` or
+`1:` keys match "true" and 1.
+
+compile_routine() resolves everything known in advance: arm poses, blended
+trajectories and the start time of every action, assuming waits run to their
+timeout. Steps after a branch are compiled into each case, so every path is
+a flat list of actions. Executor plays a schedule on the motion planner's
+clock. A wait that ends early or a skipped settle moves the rest of the
+schedule forward; a detector that answers late moves it back. Waits check
+for cancellation (cancellation.py) every CHECK_INTERVAL.
+
+    python3 motion_sequence.py sequences/take_potato.yaml main   # print the schedule
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from cancellation import CHECK_INTERVAL, check
+from motion import JointLimits, Waypoint, plan
+from pipeline import Trace, background
+
+STEP_KINDS = ("move", "servos", "gpio", "wait", "detect", "branch", "call", "result")
+STEP_OPTIONS = ("name", "speed", "settle")
+DEFAULT_SPEED = 0.6
+
+
+class Action(NamedTuple):
+    t: float  # start, seconds from the start of the schedule
+    kind: str  # trajectory, servos, gpio, wait, detect, branch, result
+    args: Any
+    duration: float  # time reserved on the timeline
+    label: str
+
+
+class Schedule(NamedTuple):
+    actions: List[Action]
+    duration: float  # longest path
+    end_pose: Optional[Tuple[float, ...]]  # None after a branch (depends on the case)
+
+
+# path -> (modification time, routines): each version of a file is parsed once per process
+_LOADED: Dict[str, Tuple[float, Dict[str, list]]] = {}
+
+
+def load_sequence(path: str) -> Dict[str, list]:
+    """Routines from a .yaml/.yml or .json sequence file, with every step checked"""
+    mtime = os.path.getmtime(path)
+    cached = _LOADED.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path) as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            import yaml  # only needed for YAML sequences
+            routines = yaml.safe_load(f)
+        else:
+            routines = json.load(f)
+    if not isinstance(routines, dict):
+        raise ValueError(f"{path}: expected a mapping of routine names to step lists")
+    for name, steps in routines.items():
+        _check_steps(routines, steps, f"{path}:{name}")
+    _LOADED[path] = (mtime, routines)
+    return routines
+
+
+def _step_kind(step) -> str:
+    if not isinstance(step, dict):
+        raise ValueError(f"step {step!r} is not a mapping")
+    kinds = [key for key in step if key in STEP_KINDS]
+    unknown = [key for key in step if key not in STEP_KINDS and key not in STEP_OPTIONS]
+    if len(kinds) != 1 or unknown:
+        raise ValueError(f"step {step!r} needs exactly one of {STEP_KINDS}"
+                         + (f" (unknown keys {unknown})" if unknown else ""))
+    return kinds[0]
+
+
+def _check_steps(routines, steps, where) -> None:
+    if not isinstance(steps, list):
+        raise ValueError(f"{where}: expected a list of steps")
+    for i, step in enumerate(steps):
+        try:
+            kind = _step_kind(step)
+            if kind == "call" and step["call"] not in routines:
+                raise ValueError(f"unknown routine {step['call']!r}")
+            if kind == "branch":
+                if "detector" not in step["branch"]:
+                    raise ValueError("branch needs a detector")
+                for case, case_steps in step["branch"]["cases"].items():
+                    _check_steps(routines, case_steps, f"{where}[{i}].{case}")
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{where}[{i}]: {e}") from None
+
+
+def _case_key(value) -> str:
+    return str(value).lower()
+
+
+def _expand(routines, steps, stack=()) -> list:
+    """Inline `call` steps"""
+    expanded = []
+    for step in steps:
+        if "call" in step:
+            name = step["call"]
+            if name in stack:
+                raise ValueError(f"Routine {name!r} calls itself")
+            expanded += _expand(routines, routines[name], stack + (name,))
+        else:
+            expanded.append(step)
+    return expanded
+
+
+def compile_routine(routines: Dict[str, list], name: str, start_pose: Optional[Sequence[float]] = None,
+                    limits: Sequence[JointLimits] = (), profile: str = "trapezoid") -> Schedule:
+    """Flat timed Schedule for a routine, starting with the arm at start_pose"""
+    if name not in routines:
+        raise ValueError(f"Unknown routine {name!r}")
+    start = tuple(float(a) for a in start_pose) if start_pose is not None else None
+    return _compile(_expand(routines, routines[name], (name,)), start, list(limits), profile, routines)
+
+
+def _compile(steps, pose, limits, profile, routines) -> Schedule:
+    actions: List[Action] = []
+    t = 0.0
+    waypoints: List[Waypoint] = []
+    labels: List[str] = []
+
+    def flush_moves():
+        nonlocal t, pose
+        if not waypoints:
+            return
+        trajectory = plan(pose, waypoints, limits, profile)
+        if trajectory.duration > 0:
+            actions.append(Action(t, "trajectory", trajectory, trajectory.duration, " + ".join(dict.fromkeys(labels))))
+            t += trajectory.duration
+        pose = trajectory.end
+        waypoints.clear()
+        labels.clear()
+
+    for i, step in enumerate(steps):
+        kind = _step_kind(step)
+        label = step.get("name", kind)
+        if kind == "move":
+            if pose is None:
+                raise ValueError("move step without an arm")
+            current = waypoints[-1].pose if waypoints else pose
+            target = tuple(float(c if a is None else a) for a, c in zip(step["move"], current))
+            if len(step["move"]) != len(pose):
+                raise ValueError(f"move {step['move']} needs {len(pose)} joint angles")
+            waypoints.append(Waypoint(target, step.get("speed", DEFAULT_SPEED), dwell=step.get("settle", 0.0)))
+            labels.append(label)
+            continue
+        flush_moves()
+        if kind == "servos":
+            angles = {int(channel): float(angle) for channel, angle in step["servos"].items()}
+            settle = float(step.get("settle", 0.0))
+            actions.append(Action(t, "servos", angles, settle, label))
+            t += settle
+        elif kind == "gpio":
+            actions.append(Action(t, "gpio", (int(step["gpio"]["pin"]), int(step["gpio"]["value"])), 0.0, label))
+        elif kind == "wait":
+            spec = step["wait"]
+            timeout, until = (float(spec), None) if not isinstance(spec, dict) else (float(spec["timeout"]),
+                                                                                     spec.get("until"))
+            actions.append(Action(t, "wait", until, timeout, label))
+            t += timeout
+        elif kind == "detect":
+            actions.append(Action(t, "detect", step["detect"], 0.0, label))
+        elif kind == "result":
+            actions.append(Action(t, "result", step["result"], 0.0, label))
+        elif kind == "branch":
+            # The rest of this routine runs after whichever case is taken
+            rest = steps[i + 1:]
+            cases = {_case_key(case): _compile(_expand(routines, case_steps) + rest, pose, limits, profile, routines)
+                     for case, case_steps in step["branch"]["cases"].items()}
+            actions.append(Action(t, "branch", (step["branch"]["detector"], cases), 0.0, label))
+            return Schedule(actions, t + max(c.duration for c in cases.values()), None)
+    flush_moves()
+    return Schedule(actions, t, pose)
+
+
+class Executor:
+    """Plays schedules: arm trajectories on a MotionPlanner, gate channels on a PCA9685, GPIO outputs.
+
+    conditions: name -> callable() -> bool for `wait: {until: name}`; a wait on an
+    unknown condition (no sensor fitted) runs to its timeout.
+    detectors: name -> callable() -> value; a failing detector takes the `default` case.
+    """
+
+    def __init__(self, planner=None, pca=None, gpio: Optional[Callable[[int, int], None]] = None,
+                 conditions: Optional[Dict[str, Callable[[], bool]]] = None, trace: Optional[Trace] = None,
+                 clock=None, sleep=None, poll: float = 0.02):
+        self.planner = planner
+        self.pca = pca
+        self.gpio = gpio
+        self.conditions = conditions or {}
+        self.trace = trace if trace is not None else Trace()
+        self._clock = clock
+        self._sleep = sleep
+        self.poll = poll
+        self.detected: Dict[str, Any] = {}
+        self.lateness: List[float] = []  # actual - scheduled start of each action, seconds
+        self._futures = {}
+
+    # One clock for everything: the planner's, so trajectories and actions share a timeline
+    def clock(self) -> float:
+        if self._clock is not None:
+            return self._clock()
+        return self.planner.clock() if self.planner is not None else time.perf_counter()
+
+    def sleep(self, seconds: float) -> None:
+        if self._sleep is not None:
+            self._sleep(seconds)
+        elif self.planner is not None:
+            self.planner.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def run(self, schedule: Schedule, detectors: Optional[Dict[str, Callable[[], Any]]] = None) -> Any:
+        """Execute a schedule; returns the value of its last `result` step (or None)"""
+        self._detectors = detectors or {}
+        self._futures = {}
+        self.lateness = []
+        return self._run(schedule, None)
+
+    def _sleep_until(self, when: float) -> None:
+        # In CHECK_INTERVAL steps, so a cancelled task does not sit out a long wait;
+        # the clock is read again after each step, so oversleeps do not add up
+        remaining = when - self.clock()
+        while remaining > 0:
+            check()
+            self.sleep(min(remaining, CHECK_INTERVAL))
+            remaining = when - self.clock()
+
+    def _run(self, schedule: Schedule, result: Any) -> Any:
+        base = self.clock()  # schedule time 0 on the clock
+        for action in schedule.actions:
+            self._sleep_until(base + action.t)
+            check()
+            self.lateness.append(self.clock() - (base + action.t))
+            kind = action.kind
+            if kind == "trajectory":
+                with self.trace.span(action.label):
+                    self.planner.run(action.args)
+            elif kind == "servos":
+                for channel, angle in action.args.items():
+                    self.pca.set_angle(channel, angle)
+                moved = self.pca.flush()
+                self.pca.persist()
+                if not moved:
+                    base -= action.duration  # nothing moved, no need to settle
+            elif kind == "gpio":
+                self.gpio(*action.args)
+            elif kind == "wait":
+                condition = self.conditions.get(action.args)
+                if condition is not None:
+                    with self.trace.span(action.label):
+                        deadline = base + action.t + action.duration
+                        while not condition() and self.clock() < deadline:
+                            check()
+                            self.sleep(min(self.poll, max(0.0, deadline - self.clock())))
+                        base -= max(0.0, deadline - self.clock())  # ended early
+                elif action.duration > 0:
+                    with self.trace.span(action.label):
+                        self._sleep_until(base + action.t + action.duration)
+            elif kind == "detect":
+                self._start(action.args)
+            elif kind == "result":
+                result = action.args
+            elif kind == "branch":
+                name, cases = action.args
+                with self.trace.span(f"wait for {name}"):
+                    value = self._result(name)
+                case = cases.get(_case_key(value), cases.get("default"))
+                if case is None:
+                    raise ValueError(f"No case for {name} = {value!r} and no default")
+                return self._run(case, result)
+        self._sleep_until(base + schedule.duration)
+        return result
+
+    def _start(self, name: str) -> None:
+        if name not in self._futures:
+            self._futures[name] = background(name, self._detectors[name], trace=self.trace)
+
+    def _result(self, name: str) -> Any:
+        self._start(name)
+        future = self._futures[name]
+        while not future.done():
+            check()
+            wait([future], timeout=CHECK_INTERVAL)
+        try:
+            value = future.result()
+        except Exception as e:
+            print(f"Detector {name} failed: {e}", file=sys.stderr)
+            value = None
+        self.detected[name] = value
+        return value
+
+
+def describe(schedule: Schedule, indent: str = "") -> str:
+    """Human-readable timeline of a schedule (branches indented)"""
+    lines = []
+    for action in schedule.actions:
+        args = action.args
+        if action.kind == "trajectory":
+            args = f"{tuple(round(a, 1) for a in args.start)} -> {tuple(round(a, 1) for a in args.end)}"
+        elif action.kind == "branch":
+            args = args[0]
+        lines.append(f"{indent}{action.t:7.2f}s {action.duration:6.2f}s  {action.kind:<10} {action.label}: {args}")
+        if action.kind == "branch":
+            for case, sub in action.args[1].items():
+                lines.append(f"{indent}  case {case} ({sub.duration:.2f} s, starts at {action.t:.2f} s):")
+                lines.append(describe(sub, indent + "    "))
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: motion_sequence.py <sequence file> [routine]")
+        sys.exit(1)
+    try:
+        from take_potato import ARM_LIMITS, HOME_POSE, MOTION_PROFILE
+    except ImportError as e:
+        print(f"({e}: timing with default JointLimits)")
+        ARM_LIMITS, HOME_POSE, MOTION_PROFILE = [JointLimits()] * 3, (180, 100, 180), "scurve"
+    routines = load_sequence(sys.argv[1])
+    routine = sys.argv[2] if len(sys.argv) > 2 else next(iter(routines))
+    print(describe(compile_routine(routines, routine, HOME_POSE, ARM_LIMITS, MOTION_PROFILE)))
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""Native-format camera capture: frames stay in the camera's pixel format and each
+detector takes the view it needs, instead of every frame going through BGR.
+
+    BGR   what cv2.VideoCapture returns: the driver's YUYV/MJPEG converted on every frame
+    I420  planar YUV 4:2:0 (picamera2 "YUV420"); the Y plane is a grayscale image
+    YUYV  packed YUV 4:2:2 (USB cameras, V4L2 with CAP_PROP_CONVERT_RGB off)
+    MJPG  JPEG bytes, decoded only as far as a view needs (gray only, or at half size)
+
+Views (to_view()): "gray" for the tag detector (the Y plane: no conversion
+for I420), "half" for the color detectors (BGR at half resolution, converted
+from a quarter of the pixels), "bgr" for everything else.
+
+open_native() tries picamera2 (CSI camera), then V4L2 through OpenCV with the
+profile's size, frame rate, pixel format and exposure negotiated, then plain
+cv2.VideoCapture (BGR). Video files and image directories are re-encoded to
+the profile's format by NativeFileSource, for testing without a camera.
+
+Exposure presets lock exposure, gain and white balance; their settle_frames
+are dropped after start while the locked controls take effect. Auto exposure
+drops none, as the tasks always did: the detectors vote over several frames
+anyway, and waiting for AE/AWB would delay every first detection.
+Profiles use auto exposure, the conditions the HSV thresholds were tuned in,
+unless $HOPE_EXPOSURE names another preset (HOPE_EXPOSURE=arena) or the
+profile sets one.
+
+    cap = NativeCapture(0, CaptureProfile(view="gray"))
+    ret, gray = cap.read_view()       # Y plane, no color conversion
+"""
+import os
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from camera_service import V4L2Source, open_source
+
+FORMATS = ("BGR", "I420", "YUYV", "MJPG")
+VIEWS = ("bgr", "gray", "half")
+
+
+class ExposurePreset(NamedTuple):
+    exposure_us: Optional[int] = None  # None: auto exposure
+    gain: float = 1.0
+    colour_gains: Optional[Tuple[float, float]] = None  # (red, blue) for picamera2; None: auto white balance
+    wb_kelvin: Optional[int] = None  # V4L2 white balance temperature; None: auto
+    settle_frames: int = 0  # frames dropped after start while the camera adjusts
+
+
+EXPOSURE_PRESETS = {
+    "auto": ExposurePreset(),
+    # Locked for the arena lighting. Not measured yet: opt-in only, and the color
+    # thresholds need re-checking against it at the venue
+    "arena": ExposurePreset(exposure_us=10000, gain=2.0, colour_gains=(1.8, 1.6), wb_kelvin=4600, settle_frames=1),
+}
+
+DEFAULT_EXPOSURE = os.environ.get("HOPE_EXPOSURE", "auto")
+if DEFAULT_EXPOSURE not in EXPOSURE_PRESETS:
+    raise ValueError(f"HOPE_EXPOSURE must be one of {tuple(EXPOSURE_PRESETS)}, not {DEFAULT_EXPOSURE!r}")
+
+
+class CaptureProfile(NamedTuple):
+    """What a detector needs from the camera"""
+    width: int = 640
+    height: int = 480
+    fps: float = 30.0
+    pixel_format: str = "auto"  # one of FORMATS, or "auto": the cheapest the camera offers
+    exposure: str = DEFAULT_EXPOSURE  # EXPOSURE_PRESETS key
+    view: str = "bgr"  # one of VIEWS
+
+
+# Conversions from a native frame to a view
+
+def _i420_planes(frame: np.ndarray):
+    height = frame.shape[0] * 2 // 3
+    width = frame.shape[1]
+    quarter = height // 4
+    y = frame[:height]
+    u = frame[height:height + quarter].reshape(height // 2, width // 2)
+    v = frame[height + quarter:height + 2 * quarter].reshape(height // 2, width // 2)
+    return y, u, v
+
+
+def to_gray(frame: np.ndarray, pixel_format: str) -> np.ndarray:
+    if pixel_format == "I420":
+        return _i420_planes(frame)[0]  # a view, no copy
+    if pixel_format == "YUYV":
+        return cv2.cvtColor(frame, cv2.COLOR_YUV2GRAY_YUYV)
+    if pixel_format == "MJPG":
+        return cv2.imdecode(frame, cv2.IMREAD_GRAYSCALE)  # luma only, chroma is not decoded
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def to_bgr(frame: np.ndarray, pixel_format: str) -> np.ndarray:
+    if pixel_format == "I420":
+        return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+    if pixel_format == "YUYV":
+        return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_YUYV)
+    if pixel_format == "MJPG":
+        return cv2.imdecode(frame, cv2.IMREAD_COLOR)
+    return frame
+
+
+def _half_i420(y: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    half = np.concatenate([y.reshape(-1), u.reshape(-1), v.reshape(-1)])
+    return cv2.cvtColor(half.reshape(-1, y.shape[1]), cv2.COLOR_YUV2BGR_I420)
+
+
+def to_half(frame: np.ndarray, pixel_format: str) -> np.ndarray:
+    """BGR at half width and height"""
+    if pixel_format == "I420":
+        # Half-size I420 from every other luma and chroma sample, then one small conversion
+        y, u, v = _i420_planes(frame)
+        return _half_i420(y[::2, ::2], u[::2, ::2], v[::2, ::2])
+    if pixel_format == "YUYV":
+        # Half-size I420 from the Y0 of every Y0-U-Y1-V macropixel on every other row,
+        # chroma from every other macropixel on every fourth row
+        return _half_i420(frame[::2, 0::2, 0], frame[::4, 0::4, 1], frame[::4, 1::4, 1])
+    if pixel_format == "MJPG":
+        return cv2.imdecode(frame, cv2.IMREAD_REDUCED_COLOR_2)  # scaled in the DCT domain
+    return cv2.resize(frame, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+
+
+_VIEWS = {"bgr": to_bgr, "gray": to_gray, "half": to_half}
+
+
+def to_view(frame: np.ndarray, pixel_format: str, view: str = "bgr") -> np.ndarray:
+    return _VIEWS[view](frame, pixel_format)
+
+
+def from_bgr(frame: np.ndarray, pixel_format: str) -> np.ndarray:
+    """Encode a BGR frame in a native format (file sources standing in for a camera)"""
+    if pixel_format == "I420":
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
+    if pixel_format == "YUYV":
+        y, u, v = _i420_planes(cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420))
+        packed = np.empty(frame.shape[:2] + (2,), np.uint8)
+        packed[:, :, 0] = y
+        packed[:, 0::2, 1] = np.repeat(u, 2, axis=0)
+        packed[:, 1::2, 1] = np.repeat(v, 2, axis=0)
+        return packed
+    if pixel_format == "MJPG":
+        return cv2.imencode(".jpg", frame)[1].reshape(-1)
+    return frame
+
+
+# Sources (open / read(out) / release, as in camera_service)
+
+class Picamera2Source:
+    """CSI camera through picamera2, YUV420 at the profile's size and rate"""
+
+    pixel_format = "I420"
+
+    def __init__(self, profile: CaptureProfile, camera_num: int = 0):
+        self.profile = profile
+        self.camera_num = camera_num
+        self.settle_frames = EXPOSURE_PRESETS[profile.exposure].settle_frames
+        self.camera = None
+
+    def controls(self) -> dict:
+        preset = EXPOSURE_PRESETS[self.profile.exposure]
+        controls = {"FrameRate": self.profile.fps} if self.profile.fps else {}
+        if preset.exposure_us is not None:
+            controls.update(AeEnable=False, ExposureTime=preset.exposure_us, AnalogueGain=preset.gain)
+        if preset.colour_gains is not None:
+            controls.update(AwbEnable=False, ColourGains=preset.colour_gains)
+        return controls
+
+    def open(self) -> bool:
+        try:
+            from picamera2 import Picamera2
+        except ImportError:
+            return False
+        try:
+            self.camera = Picamera2(self.camera_num)
+            size = (self.profile.width, self.profile.height)
+            self.camera.configure(self.camera.create_video_configuration(
+                main={"size": size, "format": "YUV420"}, controls=self.controls()))
+            self.camera.start()
+            return True
+        except Exception as exc:
+            print(f"picamera2 unavailable: {exc}")
+            self.release()
+            return False
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        frame = self.camera.capture_array("main")[:, :self.profile.width]  # drop row padding
+        if out is not None and out.shape == frame.shape:
+            np.copyto(out, frame)
+            return True, out
+        return True, frame
+
+    def release(self) -> None:
+        if self.camera is not None:
+            try:
+                self.camera.stop()
+                self.camera.close()
+            except Exception:
+                pass
+            self.camera = None
+
+
+class V4L2NativeSource:
+    """USB/V4L2 camera through OpenCV with format, size, rate and exposure negotiated, frames left raw"""
+
+    def __init__(self, index: int, profile: CaptureProfile):
+        self.index = index
+        self.profile = profile
+        self.pixel_format = "YUYV" if profile.pixel_format == "auto" else profile.pixel_format
+        self.settle_frames = EXPOSURE_PRESETS[profile.exposure].settle_frames
+        self.cap: Optional[cv2.VideoCapture] = None
+
+    def open(self) -> bool:
+        if self.pixel_format not in ("YUYV", "MJPG"):
+            return False
+        cap = cv2.VideoCapture(self.index, cv2.CAP_V4L2)
+        if not cap.isOpened():
+            return False
+        profile, preset = self.profile, EXPOSURE_PRESETS[self.profile.exposure]
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.pixel_format))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, profile.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, profile.height)
+        if profile.fps:
+            cap.set(cv2.CAP_PROP_FPS, profile.fps)
+        cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        if preset.exposure_us is not None:
+            cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1)  # V4L2 manual exposure
+            cap.set(cv2.CAP_PROP_EXPOSURE, preset.exposure_us / 100)  # exposure_time_absolute, 100 us units
+        if preset.wb_kelvin is not None:
+            cap.set(cv2.CAP_PROP_AUTO_WB, 0)
+            cap.set(cv2.CAP_PROP_WB_TEMPERATURE, preset.wb_kelvin)
+
+        # The driver may have picked another format, or ignored CONVERT_RGB: go by what arrives
+        ret, frame = cap.read()
+        if not ret:
+            cap.release()
+            return False
+        if frame.ndim == 3 and frame.shape[2] == 2:
+            self.pixel_format = "YUYV"
+        elif frame.ndim == 3:
+            self.pixel_format = "BGR"
+        else:
+            self.pixel_format = "MJPG"
+        self.cap = cap
+        return True
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.pixel_format == "MJPG" or out is None:
+            ret, frame = self.cap.read()
+        else:
+            ret, frame = self.cap.read(out)
+        if ret and self.pixel_format == "MJPG":
+            frame = frame.reshape(-1)
+        return ret, frame
+
+    def release(self) -> None:
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class NativeFileSource:
+    """Video file or image directory (camera_service.open_source) re-encoded to a native format"""
+
+    settle_frames = 0
+
+    def __init__(self, spec, pixel_format: str = "I420", fps: Optional[float] = 30.0):
+        self.source = open_source(spec, fps=fps)
+        self.pixel_format = pixel_format
+
+    def open(self) -> bool:
+        return self.source.open()
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        ret, frame = self.source.read()
+        if not ret:
+            return False, None
+        frame = from_bgr(frame, self.pixel_format)
+        if out is not None and out.shape == frame.shape:
+            np.copyto(out, frame)
+            return True, out
+        return True, frame
+
+    def release(self) -> None:
+        self.source.release()
+
+
+class FirstAvailable:
+    """Opens the first of several sources that works and reads from it"""
+
+    def __init__(self, *sources):
+        self.sources = sources
+        self.active = None
+
+    @property
+    def pixel_format(self) -> str:
+        return getattr(self.active, "pixel_format", "BGR")
+
+    @property
+    def settle_frames(self) -> int:
+        return getattr(self.active, "settle_frames", 2)
+
+    def open(self) -> bool:
+        for source in self.sources:
+            if source.open():
+                self.active = source
+                print(f"Camera: {type(source).__name__}, {self.pixel_format}")
+                return True
+        return False
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        return self.active.read(out)
+
+    def release(self) -> None:
+        if self.active is not None:
+            self.active.release()
+            self.active = None
+
+
+def open_native(spec=0, profile: CaptureProfile = CaptureProfile()):
+    """Frame source for a device index ("picamera": the CSI camera only), video file or image directory"""
+    if hasattr(spec, "read") and hasattr(spec, "open"):
+        return spec
+    if isinstance(spec, str) and spec != "picamera" and not spec.isdigit():
+        pixel_format = "I420" if profile.pixel_format == "auto" else profile.pixel_format
+        return NativeFileSource(spec, pixel_format, profile.fps)
+    if spec == "picamera":
+        return Picamera2Source(profile)
+    index = int(spec)
+    sources = [V4L2NativeSource(index, profile), V4L2Source(index, profile.width, profile.height)]
+    if index == 0 and profile.pixel_format in ("auto", "I420"):
+        sources.insert(0, Picamera2Source(profile))
+    return FirstAvailable(*sources)
+
+
+class NativeCapture:
+    """cv2.VideoCapture stand-in over a native source, for tasks that open the camera themselves.
+
+    read() returns BGR like cv2; read_view() returns the profile's view.
+    """
+
+    def __init__(self, spec=0, profile: CaptureProfile = CaptureProfile()):
+        self.profile = profile
+        self.source = open_native(spec, profile)
+        self.opened = self.source.open()
+        if self.opened:
+            for _ in range(getattr(self.source, "settle_frames", 0)):
+                self.source.read()
+
+    @property
+    def pixel_format(self) -> str:
+        return getattr(self.source, "pixel_format", "BGR")
+
+    def isOpened(self) -> bool:
+        return self.opened
+
+    def read_view(self, view: Optional[str] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        ret, frame = self.source.read()
+        if not ret or frame is None:
+            return False, None
+        return True, to_view(frame, self.pixel_format, view or self.profile.view)
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        return self.read_view("bgr")
+
+    def release(self) -> None:
+        self.source.release()
+        self.opened = False
+
+
+def read_view(cap, view: str) -> Tuple[bool, Optional[np.ndarray], bool]:
+    """(ret, frame, native): the view from a native-aware capture, else cap.read() BGR with native False"""
+    if hasattr(cap, "read_view"):
+        ret, frame = cap.read_view(view)
+        return ret, frame, True
+    ret, frame = cap.read()
+    return ret, frame, False
@@ -1,27 +1,30 @@
 #!/usr/bin/env python3
-import time
+import os
 import sys
-from adafruit_servokit import ServoKit
-import board
-import busio
+
+import hal
+from motion_sequence import Executor, compile_routine, load_sequence
+from pca9685 import PCA9685
+from servo_state import get_state
+
+# Gate angles and settle times
+SEQUENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sequences", "open_gate.yaml")
 
 class GateController:
-    def __init__(self):
+    def __init__(self, i2c=None):
         # Initialize I2C bus
-        i2c = busio.I2C(board.SCL, board.SDA)
-        
-        # Initialize the ServoKit
-        self.kit = ServoKit(channels=16)
+        if i2c is None:
+            i2c = hal.i2c()
         
-        # Configure servo parameters for channels 9 and 10
-        for channel in [5, 6]:
-            self.kit.servo[channel].set_pulse_width_range(500, 2400)
-            self.kit.servo[channel].actuation_range = 180
+        # Initialize the PCA9685; servo parameters for channels 5 and 6.
+        # Gate angles commanded by earlier runs are restored from the servo state.
+        self.pca = PCA9685(i2c, min_pulse=500, max_pulse=2400, actuation_range=180, state=get_state())
         
-        # Set initial positions (closed)
-        self.kit.servo[5].angle = 0    # Orange gate closed
-        self.kit.servo[6].angle = 0   # White gate closed
-        time.sleep(0.5)
+        # Set initial positions (closed); both gates go out in one I2C write,
+        # and nothing is sent (or waited for) if they are known to be closed
+        self.routines = load_sequence(SEQUENCE_FILE)
+        self.executor = Executor(pca=self.pca, clock=hal.clock, sleep=hal.sleep)
+        self.executor.run(compile_routine(self.routines, "close"))
         
         print("Gate Controller initialized")
 
@@ -36,39 +39,42 @@ class GateController:
             bool: True if successful, False otherwise
         """
         try:
-            if gate_type == 1:  # Orange
-                self.kit.servo[5].angle = 90   # Open orange gate
-                self.kit.servo[6].angle = 0    # Ensure white gate is closed
+            if gate_type == 1:  # Orange (white gate stays closed)
+                self.executor.run(compile_routine(self.routines, "open_orange"))
                 print("Orange gate opened")
-            elif gate_type == 0:  # White
-                self.kit.servo[6].angle = 90   # Open white gate
-                self.kit.servo[5].angle = 0      # Ensure orange gate is closed
+            elif gate_type == 0:  # White (orange gate stays closed)
+                self.executor.run(compile_routine(self.routines, "open_white"))
                 print("White gate opened")
             else:
                 print(f"Error: Invalid gate type {gate_type}")
                 return False
-            
-            time.sleep(0.5)
             return True
             
         except Exception as e:
             print(f"Error operating gate: {e}")
             return False
 
+def warm_up():
+    """Open the I2C bus and parse the gate routines (raspi.py start-up)"""
+    hal.i2c()
+    load_sequence(SEQUENCE_FILE)
+
+def run(gate_type):
+    """Open a gate from a command argument ("1"/"1.0" for orange, "0" for white)"""
+    gate_type = int(float(gate_type))
+    if gate_type not in [0, 1]:
+        raise ValueError(f"Invalid gate type {gate_type}")
+    
+    controller = GateController()
+    return "true" if controller.open_gate(gate_type) else "false"
+
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print("Usage: open_gate.py <gate_type> (1 for orange, 0 for white)")
         sys.exit(1)
     
     try:
-        gate_type = int(sys.argv[1])
-        if gate_type not in [0, 1]:
-            raise ValueError
-        
-        controller = GateController()
-        success = controller.open_gate(gate_type)
-        
-        if not success:
+        if run(sys.argv[1]) != "true":
             sys.exit(1)
             
     except ValueError:
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""PCA9685 servo output that sends each tick's channel updates as one I2C block write.
+
+adafruit_servokit turns every `kit.servo[n].angle = x` into its own I2C
+transaction. PCA9685 stages angle updates instead, and flush() writes all
+changed channels with the chip's register auto-increment: one transaction per
+run of adjacent channels (the arm's 13-15 and the gates' 5-6 are one write
+each). Channels whose 12-bit pulse count is unchanged are not written.
+
+With a servo_state.ServoState, commanded angles are recorded on every flush
+and restored on start-up; the first write of a move marks the device as
+moving in the snapshot until persist(). If the chip is still running with our prescaler
+(it kept power since the last process), it is not re-initialized, which
+would glitch every output, and restored channels are not re-sent.
+
+FakeI2C records transactions and decodes them into register contents, so bus
+traffic can be counted without hardware:
+
+    bus = FakeI2C()
+    arm = ServoGroup(PCA9685(bus), [13, 14, 15])
+    arm.write((60, 60, 13))
+    print(bus.writes, bus.bytes_written)
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import hal
+from servo_state import ServoState
+
+MODE1 = 0x00
+PRESCALE = 0xFE
+LED0_ON_L = 0x06  # each channel has ON_L, ON_H, OFF_L, OFF_H from here
+MODE1_RESTART = 0x80
+MODE1_AI = 0x20  # register auto-increment
+MODE1_SLEEP = 0x10
+FULL_OFF = 0x1000  # OFF_H bit 4: output held low (servo released)
+OSCILLATOR_HZ = 25000000
+CHANNELS = 16
+
+
+class PCA9685:
+    """16-channel servo driver with staged updates and batched flushes"""
+
+    def __init__(self, i2c, address: int = 0x40, frequency: float = 50, min_pulse: int = 500,
+                 max_pulse: int = 2400, actuation_range: float = 180, state: Optional[ServoState] = None):
+        self.i2c = i2c
+        self.address = address
+        self.state = state
+        self.pulse_range: List[Tuple[int, int]] = [(min_pulse, max_pulse)] * CHANNELS
+        self.actuation_range: List[float] = [actuation_range] * CHANNELS
+        self.angles: List[Optional[float]] = [None] * CHANNELS  # last requested angle per channel
+        self._pending: Dict[int, int] = {}  # channel -> OFF count waiting for flush()
+        self._written: List[Optional[int]] = [None] * CHANNELS  # OFF count on the chip
+
+        prescale = min(255, max(3, round(OSCILLATOR_HZ / (4096 * frequency)) - 1))
+        self.frequency = OSCILLATOR_HZ / 4096 / (prescale + 1)
+        # Awake with our prescaler: configured by an earlier process and powered since
+        self.configured = not self._read(MODE1) & MODE1_SLEEP and self._read(PRESCALE) == prescale
+        if self.configured:
+            if state is not None:
+                for channel, angle in state.angles(address).items():
+                    self.angles[channel] = angle
+                    self._written[channel] = self._count(channel, angle)
+            return
+        if state is not None:
+            state.forget(address)
+
+        # The prescaler can only be set while the oscillator sleeps
+        self._write(MODE1, [MODE1_SLEEP | MODE1_AI])
+        self._write(PRESCALE, [prescale])
+        self._write(MODE1, [MODE1_AI])
+        hal.sleep(0.005)  # oscillator start-up
+        self._write(MODE1, [MODE1_RESTART | MODE1_AI])
+
+    def set_pulse_width_range(self, channel: int, min_pulse: int, max_pulse: int) -> None:
+        self.pulse_range[channel] = (min_pulse, max_pulse)
+
+    def set_angle(self, channel: int, angle: float) -> None:
+        """Stage a servo angle; it is sent by the next flush()"""
+        if not 0 <= angle <= self.actuation_range[channel]:
+            raise ValueError(f"Angle {angle} out of range for channel {channel}")
+        self._pending[channel] = self._count(channel, angle)
+        self.angles[channel] = angle
+
+    def release(self, channel: int) -> None:
+        """Stage turning the channel's output off (servo goes limp)"""
+        self._pending[channel] = FULL_OFF
+        self.angles[channel] = None
+
+    def flush(self) -> int:
+        """Write staged channels whose pulse changed; returns the number of I2C writes"""
+        pending, self._pending = self._pending, {}
+        changed = sorted(ch for ch, count in pending.items() if count != self._written[ch])
+        writes = 0
+        start = 0
+        while start < len(changed):
+            # One auto-increment block per run of adjacent channels
+            end = start + 1
+            while end < len(changed) and changed[end] == changed[end - 1] + 1:
+                end += 1
+            data = []
+            for channel in changed[start:end]:
+                count = pending[channel]
+                data += [0, 0, count & 0xFF, count >> 8]
+                self._written[channel] = count
+            self._write(LED0_ON_L + 4 * changed[start], data)
+            writes += 1
+            start = end
+        if self.state is not None:
+            if changed:
+                self.state.begin_move(self.address)
+            for channel in pending:
+                self.state.update(self.address, channel, self.angles[channel])
+        return writes
+
+    def persist(self) -> None:
+        """Save the recorded angles (call once a move or command is complete)"""
+        if self.state is not None:
+            self.state.save()
+
+    def _count(self, channel: int, angle: float) -> int:
+        """12-bit OFF count for an angle"""
+        min_pulse, max_pulse = self.pulse_range[channel]
+        pulse_us = min_pulse + (max_pulse - min_pulse) * angle / self.actuation_range[channel]
+        return round(pulse_us * self.frequency * 4096 / 1e6)
+
+    def _read(self, register: int) -> int:
+        result = bytearray(1)
+        while not self.i2c.try_lock():
+            pass
+        try:
+            self.i2c.writeto_then_readfrom(self.address, bytes([register]), result)
+        finally:
+            self.i2c.unlock()
+        return result[0]
+
+    def _write(self, register: int, data: Sequence[int]) -> None:
+        buffer = bytes([register]) + bytes(data)
+        while not self.i2c.try_lock():
+            pass
+        try:
+            self.i2c.writeto(self.address, buffer)
+        finally:
+            self.i2c.unlock()
+
+
+class ServoGroup:
+    """Servo channels moved together (motion.MotionPlanner backend): one flush per write()"""
+
+    def __init__(self, pca: PCA9685, channels: Sequence[int]):
+        self.pca = pca
+        self.channels = list(channels)
+
+    def read(self) -> List[Optional[float]]:
+        return [self.pca.angles[channel] for channel in self.channels]
+
+    def write(self, pose: Sequence[float]) -> None:
+        for channel, angle in zip(self.channels, pose):
+            self.pca.set_angle(channel, angle)
+        self.pca.flush()
+
+    def settle(self) -> None:
+        """Called when a trajectory is complete"""
+        self.pca.persist()
+
+
+# Register contents after power-on: asleep, default prescaler, all outputs full off
+POWER_ON_REGISTERS = bytearray(256)
+POWER_ON_REGISTERS[MODE1] = 0x11
+POWER_ON_REGISTERS[PRESCALE] = 0x1E
+for _channel in range(CHANNELS):
+    POWER_ON_REGISTERS[LED0_ON_L + 4 * _channel + 3] = FULL_OFF >> 8
+
+
+class FakeI2C:
+    """busio.I2C stand-in that records writes and keeps a register image per device"""
+
+    def __init__(self):
+        self.transactions: List[Tuple[int, bytes]] = []  # (address, register byte + data)
+        self.registers: Dict[int, bytearray] = {}
+        self.reads = 0
+
+    def try_lock(self) -> bool:
+        return True
+
+    def unlock(self) -> None:
+        pass
+
+    def writeto(self, address: int, buffer, *, start: int = 0, end: Optional[int] = None) -> None:
+        data = bytes(buffer[start:end])
+        self.transactions.append((address, data))
+        registers = self.registers.setdefault(address, bytearray(POWER_ON_REGISTERS))
+        for i, value in enumerate(data[1:]):
+            registers[(data[0] + i) & 0xFF] = value
+
+    def writeto_then_readfrom(self, address: int, buffer_out, buffer_in, *, out_start: int = 0,
+                              out_end: Optional[int] = None, in_start: int = 0, in_end: Optional[int] = None) -> None:
+        self.reads += 1
+        register = bytes(buffer_out[out_start:out_end])[0]
+        registers = self.registers.get(address, POWER_ON_REGISTERS)
+        in_end = len(buffer_in) if in_end is None else in_end
+        for i in range(in_end - in_start):
+            buffer_in[in_start + i] = registers[(register + i) & 0xFF]
+
+    @property
+    def writes(self) -> int:
+        return len(self.transactions)
+
+    @property
+    def bytes_written(self) -> int:
+        """Bytes after the address byte (register pointer + data), summed over all writes"""
+        return sum(len(data) for _, data in self.transactions)
+
+    def clear(self) -> None:
+        """Reset the transaction log (register contents are kept)"""
+        self.transactions.clear()
+
+    def channel_off(self, channel: int, address: int = 0x40) -> int:
+        """OFF count the chip holds for a channel"""
+        registers = self.registers.get(address, POWER_ON_REGISTERS)
+        base = LED0_ON_L + 4 * channel
+        return registers[base + 2] | registers[base + 3] << 8
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""I2C traffic per motion: one write per servo assignment (ServoKit) vs. batched PCA9685 flushes.
+
+Both variants play the same take_potato_right + place_potato_orange
+trajectories (virtual clock, mocked GPIO) and the gate moves onto a FakeI2C
+bus. The ServoKit variant mirrors adafruit_servokit, where each changed
+`servo[n].angle = x` is one 5-byte write (register pointer + ON/OFF words).
+
+Exits with status 1 if a batched motion needs more writes than WRITE_BUDGET
+or than the ServoKit variant.
+
+Usage: python3 pca9685_benchmark.py
+"""
+import os
+import sys
+import time
+
+from motion_benchmark import VirtualClock
+from raspi_benchmark import install_mocks
+
+ADDRESS = 0x40
+
+# Batched I2C writes per motion, as measured when batching landed (the motions
+# run on a virtual clock, so the counts are exact)
+WRITE_BUDGET = {"arm cycle": 607, "2 gate moves": 2}
+
+
+class _BusServo:
+    def __init__(self, bus, channel):
+        self.bus = bus
+        self.channel = channel
+        self._angle = None
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, value):
+        from pca9685 import LED0_ON_L
+        self._angle = value
+        self.bus.writeto(ADDRESS, bytes([LED0_ON_L + 4 * self.channel, 0, 0, 0, 0]))
+
+
+class BusServoKit:
+    """ServoKit stand-in whose every angle assignment is its own I2C write"""
+
+    def __init__(self, bus):
+        self.servo = [_BusServo(bus, channel) for channel in range(16)]
+
+
+def arm_cycle(make_servos):
+    """(writes, bytes) for take_potato_right + place_potato_orange"""
+    from pca9685 import FakeI2C
+    from take_potato import HOME_POSE, PotatoServoController
+
+    bus = FakeI2C()
+    servos = make_servos(bus)
+    servos.write(HOME_POSE)
+    bus.clear()
+    vclock = VirtualClock()
+    time.sleep = vclock.sleep
+    controller = PotatoServoController(servos=servos)
+    controller.motion.clock, controller.motion.sleep = vclock.clock, vclock.sleep
+    controller.take_potato_right()
+    controller.place_potato_orange()
+    return bus.writes, bus.bytes_written
+
+
+def gate_moves(batched):
+    """(writes, bytes) for opening the orange gate, then the white one"""
+    from open_gate import GateController
+    from pca9685 import FakeI2C
+
+    bus = FakeI2C()
+    time.sleep = lambda seconds: None
+    if batched:
+        gate = GateController(i2c=bus)
+        bus.clear()
+        gate.open_gate(1)
+        gate.open_gate(0)
+    else:
+        kit = BusServoKit(bus)
+        for gate_type in (1, 0):
+            opened, closed = (5, 6) if gate_type == 1 else (6, 5)
+            kit.servo[opened].angle = 90
+            kit.servo[closed].angle = 0
+    return bus.writes, bus.bytes_written
+
+
+def main():
+    install_mocks()
+    sys.stdout = open(os.devnull, "w")  # silence the controller's prints
+    from motion import ServoKitServos
+    from pca9685 import PCA9685, ServoGroup
+
+    rows = [
+        ("arm cycle, ServoKit", arm_cycle(lambda bus: ServoKitServos(BusServoKit(bus), [13, 14, 15]))),
+        ("arm cycle, batched", arm_cycle(lambda bus: ServoGroup(PCA9685(bus), [13, 14, 15]))),
+        ("2 gate moves, ServoKit", gate_moves(batched=False)),
+        ("2 gate moves, batched", gate_moves(batched=True)),
+    ]
+
+    sys.stdout = sys.__stdout__
+    print(f"{'motion':<26}{'I2C writes':>12}{'bytes':>8}")
+    for name, (writes, nbytes) in rows:
+        print(f"{name:<26}{writes:>12}{nbytes:>8}")
+
+    writes = {name: count for name, (count, _) in rows}
+    failures = []
+    for motion, budget in WRITE_BUDGET.items():
+        batched, servokit = writes[f"{motion}, batched"], writes[f"{motion}, ServoKit"]
+        if batched > budget or batched >= servokit:
+            failures.append(f"{motion}: {batched} batched writes (budget {budget}, ServoKit {servokit})")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
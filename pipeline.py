@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Small helpers for running task steps concurrently and seeing where the time went.
+
+    trace = Trace()
+    color = background("detect", detect_ball_color, trace=trace)   # worker thread
+    with trace.span("approach"):
+        arm.position_arm(...)
+    result = color.result()                                          # only waits if still running
+    print(trace.report())
+
+wait_for() replaces fixed sleeps: it returns as soon as a condition holds
+and only waits the full timeout when there is nothing to check.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Optional
+
+import hal
+
+
+class Span(NamedTuple):
+    name: str
+    start: float  # seconds since the trace started
+    end: float
+    thread: str
+
+
+class Trace:
+    """Timing spans recorded from any thread"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.origin = clock()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str):
+        start = self.clock() - self.origin
+        try:
+            yield
+        finally:
+            span = Span(name, start, self.clock() - self.origin, threading.current_thread().name)
+            with self._lock:
+                self.spans.append(span)
+
+    def total(self) -> float:
+        return max((span.end for span in self.spans), default=0.0)
+
+    def report(self) -> str:
+        """One line per span in start order, then the cycle time"""
+        lines = [f"{'start s':>8}{'took s':>8}  {'thread':<12}step"]
+        for span in sorted(self.spans, key=lambda s: s.start):
+            lines.append(f"{span.start:>8.2f}{span.end - span.start:>8.2f}  {span.thread[:11]:<12}{span.name}")
+        lines.append(f"cycle {self.total():.2f} s")
+        return "\n".join(lines)
+
+
+def background(name: str, fn: Callable, *args, trace: Optional[Trace] = None) -> Future:
+    """Run fn(*args) in a daemon thread (traced as `name`); returns its Future.
+
+    The thread runs in a copy of the caller's context, so it sees the caller's
+    cancellation token (cancellation.py)."""
+    future: Future = Future()
+    context = contextvars.copy_context()
+
+    def worker():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            if trace is not None:
+                with trace.span(name):
+                    result = fn(*args)
+            else:
+                result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    threading.Thread(target=context.run, args=(worker,), name=name, daemon=True).start()
+    return future
+
+
+def wait_for(condition: Optional[Callable[[], bool]], timeout: float, poll: float = 0.02) -> bool:
+    """Wait until condition() is true (True) or timeout seconds pass (False).
+
+    With condition None there is nothing to check, so the full timeout is waited.
+    Waits on the HAL clock, so they take no wall time in simulation.
+    """
+    if condition is None:
+        hal.sleep(timeout)
+        return False
+    deadline = hal.clock() + timeout
+    while not condition():
+        remaining = deadline - hal.clock()
+        if remaining <= 0:
+            return False
+        hal.sleep(min(poll, remaining))
+    return True
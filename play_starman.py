@@ -1,10 +1,9 @@
-import RPi.GPIO as GPIO
-import time
+import hal
+from gpio_timeline import GpioTimeline, pattern_edges
 
-BUZZER_PIN = 15  # BCM pin 15
+GPIO = hal.gpio()
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(BUZZER_PIN, GPIO.OUT)
+BUZZER_PIN = 15  # BCM pin 15
 
 # Define rhythm pattern (on duration, off duration)
 # Based on the chorus: "There's a starman waiting in the sky..."
@@ -23,17 +22,35 @@ pattern = [
     
 ]
 
+# One timeline per process, so a new PLAY_STARMAN replaces a chorus that is still playing
+_timeline = None
+
 def play_buzz_rhythm():
+    """Start the chorus on a background thread and return at once; the Future gives its JitterStats"""
+    global _timeline
     print("?? Buzzer playing: Starman Chorus")
-    for on_time, off_time in pattern:
-        GPIO.output(BUZZER_PIN, GPIO.HIGH)
-        time.sleep(on_time)
-        GPIO.output(BUZZER_PIN, GPIO.LOW)
-        time.sleep(off_time)
-
-try:
-    play_buzz_rhythm()
-finally:
-    GPIO.cleanup()
-    print("All done folks! ??")
+    if _timeline is None:
+        # Simulated time has no real deadlines to wait for
+        _timeline = GpioTimeline(GPIO.output, clock=hal.clock, sleep=hal.sleep if hal.simulated() else None)
+    return _timeline.play(pattern_edges(pattern, BUZZER_PIN), name="starman", done=release_buzzer)
+
+def release_buzzer(stats):
+    """Release the buzzer pin once the chorus has ended and report its timing"""
+    # Only the buzzer pin: other tasks in this process may still hold theirs
+    GPIO.cleanup(BUZZER_PIN)
+    print(f"All done folks! ?? ({stats.edges} edges, jitter mean {stats.mean_ms:.2f} ms, "
+          f"p95 {stats.p95_ms:.2f} ms, max {stats.max_ms:.2f} ms)")
+
+def run(wait=False):
+    """Set up the buzzer pin and start the chorus; returns before it ends unless wait is set"""
+    if _timeline is not None:
+        _timeline.stop()  # its pin release runs now, before the pin is set up again
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(BUZZER_PIN, GPIO.OUT)
+    chorus = play_buzz_rhythm()
+    if wait:
+        chorus.result()
+    return "true"
 
+if __name__ == '__main__':
+    run(wait=True)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Framed serial protocol with sequence numbers and CRC.
+
+A framed line looks like
+
+    #<seq>,<len>,<payload>*<crc>\\n
+
+seq     request id chosen by the ESP32 (0-65535), echoed in the reply
+len     payload length in bytes
+payload the command text (e.g. "OPEN_GATE:1"), or "!" + base64 for binary data
+crc     CRC-16/CCITT-FALSE of "<seq>,<len>,<payload>" as 4 hex digits
+
+Lines that do not start with "#" are plain-text commands from older firmware
+and are answered in plain text, so both can share the same port.
+"""
+import base64
+from typing import NamedTuple, Optional, Union
+
+FRAME_START = "#"
+BINARY_MARKER = "!"
+MAX_SEQ = 0xFFFF
+
+
+class FrameError(ValueError):
+    """Malformed frame, length mismatch or CRC failure"""
+
+    def __init__(self, message: str, seq: Optional[int] = None):
+        super().__init__(message)
+        self.seq = seq
+
+
+class Request(NamedTuple):
+    """One incoming command; seq is None for plain-text lines"""
+    seq: Optional[int]
+    payload: Union[str, bytes]
+
+    @property
+    def framed(self) -> bool:
+        return self.seq is not None
+
+
+def _crc16_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16(data: bytes, crc: int = 0xFFFF) -> int:
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), easy to match on the ESP32"""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+
+def encode_frame(seq: int, payload: Union[str, bytes]) -> str:
+    """Build one framed line (without the trailing newline)"""
+    if isinstance(payload, bytes):
+        payload = BINARY_MARKER + base64.b64encode(payload).decode('ascii')
+    body = f"{seq & MAX_SEQ},{len(payload.encode())},{payload}"
+    return f"{FRAME_START}{body}*{crc16(body.encode()):04X}"
+
+
+def decode_frame(line: str) -> Request:
+    """Parse a framed line; raise FrameError if it is malformed or corrupted"""
+    body, star, crc_text = line[len(FRAME_START):].rpartition("*")
+    seq_text, _, rest = body.partition(",")
+    seq = int(seq_text) if seq_text.isdigit() else None
+    if not star:
+        raise FrameError("Missing CRC", seq)
+
+    length_text, comma, payload = rest.partition(",")
+    if seq is None or not comma or not length_text.isdigit():
+        raise FrameError("Malformed frame", seq)
+    try:
+        crc = int(crc_text, 16)
+    except ValueError:
+        raise FrameError("Malformed CRC", seq) from None
+    if crc != crc16(body.encode()):
+        raise FrameError("CRC mismatch", seq)
+    if int(length_text) != len(payload.encode()):
+        raise FrameError("Length mismatch", seq)
+
+    if payload.startswith(BINARY_MARKER):
+        try:
+            return Request(seq, base64.b64decode(payload[1:], validate=True))
+        except ValueError:
+            raise FrameError("Bad binary payload", seq) from None
+    return Request(seq, payload)
+
+
+def parse_line(line: str) -> Request:
+    """Framed or plain-text command line -> Request"""
+    if line.startswith(FRAME_START):
+        return decode_frame(line)
+    return Request(None, line)
+
+
+def format_reply(request: Request, message: Union[str, bytes]) -> str:
+    """Reply in the same mode as the request: framed with its seq, or plain text"""
+    if request.framed:
+        return encode_frame(request.seq, message)
+    return message.decode('ascii', 'replace') if isinstance(message, bytes) else message
@@ -1,18 +1,203 @@
 #!/usr/bin/env python3
+import argparse
+import importlib
+import os
 import serial
-import serial.tools.list_ports
 import subprocess
+import threading
 import time
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Optional, Any, List
+from typing import TYPE_CHECKING, Optional, Any, Callable, Dict, List, Tuple
+
+import hal
+from cancellation import Cancelled, CancelToken, current as current_token, run_with_deadline
+from pipeline import background
+from protocol import FrameError, Request, format_reply, parse_line
+from serial_link import SerialLink
+from speculation import Speculator, get_cache
+from telemetry import MAX_LOG_BYTES, configure as configure_telemetry, get_telemetry
+
+if TYPE_CHECKING:
+    from camera_service import CameraService  # imported when a camera is started (pulls in cv2)
+
+# Task scripts that can be run in-process: script name -> (module, entry function, uses camera).
+# Scripts not listed here (or whose import fails) still run as a subprocess. A module's
+# optional warm_up() is called once after loading (open buses, parse files, first-call setup).
+TASK_MODULES: Dict[str, tuple] = {
+    "take_potato.py": ("take_potato", "run", True),
+    "is_red_good.py": ("is_red_good", "run", True),
+    "find_box_color.py": ("find_box_color", "run", True),
+    "open_gate.py": ("open_gate", "run", False),
+    "play_starman.py": ("play_starman", "run", False),
+}
+
+# Command table: name -> (task script, argument parser, reply type).
+# Commands with an argument parser are sent as NAME:<arg>. Reply type "ok"
+# answers OK, "result" answers RESULT:<task output>.
+COMMANDS: Dict[str, tuple] = {
+    "TAKE_POTATO": ("take_potato.py", None, "ok"),
+    "IS_RED_GOOD": ("is_red_good.py", None, "result"),
+    "FIND_BOX_COLOR": ("find_box_color.py", None, "result"),
+    "OPEN_GATE": ("open_gate.py", float, "ok"),
+    "TAKE_RIGHT_BOX": ("take_right_box.py", None, "ok"),
+    "TAKE_FRONT_BOX": ("take_front_box.py", None, "ok"),
+    "PLACE_RIGHT_BOX": ("play_right_box.py", None, "ok"),
+    "PLACE_FRONT_BOX": ("play_front_box.py", None, "ok"),
+    "DETECT_DRY_POT": ("detect_dry_pot.py", None, "result"),
+    "TAKE_WATER": ("take_water.py", None, "ok"),
+    "WATER_POT": ("water_pot.py", None, "ok"),
+    "PLAY_STARMAN": ("play_starman.py", None, "ok"),
+}
+
+# Seconds a command's task may run before it is cancelled (DEFAULT_DEADLINE if not
+# listed). A cancelled task has cancellation.CANCEL_GRACE s to return its partial
+# result: "result" commands then answer RESULT:<best guess>, "ok" commands ERROR:
+# timeout. ABORT cancels the running task the same way, with ERROR: abort. A task
+# that does not return in the grace period is abandoned; until its thread exits,
+# STATUS answers BUSY:<its command> and task commands ERROR: busy.
+DEFAULT_DEADLINE = 30.0
+TASK_DEADLINES: Dict[str, float] = {
+    "TAKE_POTATO": 45.0,
+    "IS_RED_GOOD": 10.0,
+    "FIND_BOX_COLOR": 8.0,
+    "OPEN_GATE": 5.0,
+    "PLAY_STARMAN": 15.0,  # returns at once in-process; the subprocess plays the whole chorus
+}
+
+# With --speculate: the vision command expected after each command (the match
+# order of simulate.py). Its detector starts on the shared camera as soon as the
+# command is done, as HINT:<command> does, so the answer is cached when asked.
+SPECULATE_NEXT: Dict[str, str] = {
+    "TAKE_POTATO": "FIND_BOX_COLOR",
+    "FIND_BOX_COLOR": "IS_RED_GOOD",
+}
 
 class RaspberryPiController:
-    def __init__(self, serial_port: Optional[str] = None, baud_rate: int = 115200):
+    _stamp_second = -1
+    _stamp = ""
+    
+    def __init__(self, serial_port: Optional[str] = None, baud_rate: int = 115200,
+                 use_subprocess: bool = False, connect: bool = True,
+                 camera_source: Optional[str] = None, heartbeat_interval: float = 0.0,
+                 prewarm: bool = False, speculate: bool = False):
+        """prewarm: load the tasks and open the camera on a background thread while the
+        serial connection is set up; task commands wait for it, PING/STATUS do not.
+        speculate: run vision detectors ahead of their commands (speculation.py)"""
         self.serial_port = serial_port
         self.baud_rate = baud_rate
+        self.use_subprocess = use_subprocess
+        self.heartbeat_interval = heartbeat_interval
+        self.tasks: Dict[str, Callable[..., Any]] = {}
+        self.camera_tasks: set = set()
+        self.camera: Optional["CameraService"] = None
         self.ser: Optional[serial.Serial] = None
-        self.initialize_serial()
+        self.link: Optional[SerialLink] = None
+        self.current_command: Optional[str] = None
+        self.deadlines: Dict[str, float] = dict(TASK_DEADLINES)
+        self.speculate = speculate
+        self.speculator: Optional[Speculator] = None
+        self._token: Optional[CancelToken] = None  # the running task's
+        self._abandoned: Optional[Tuple[str, Future]] = None  # a cancelled task still running
+        self._stopping = threading.Event()
+        self.telemetry = get_telemetry()
+        self.startup: Dict[str, float] = {}  # start-up phase -> ms
+        self._created = time.perf_counter()
+        self._warm: Optional[Future] = None
+        if not self.use_subprocess:
+            if prewarm:
+                self._warm = background("prewarm", self.warm_up, camera_source)
+            else:
+                self.warm_up(camera_source)
+        if connect:
+            self.initialize_serial()
+    
+    def _timed(self, phase: str, fn: Callable, *args) -> Any:
+        """Run fn(*args) and record its duration under `phase` in self.startup"""
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.startup[phase] = (time.perf_counter() - start) * 1000
+    
+    def warm_up(self, camera_source: Optional[str] = None) -> None:
+        """Load the in-process tasks, start the shared camera and run the tasks' warm_up() hooks"""
+        hooks = self.load_tasks()
+        if camera_source is not None:
+            try:
+                self._timed("camera", self.start_camera, camera_source)
+            except Exception as exc:
+                print(f"{self.timestamp()} - Shared camera failed on {camera_source} ({exc}), "
+                      f"tasks will open the camera themselves")
+        if self.speculate:
+            if self.camera is not None:
+                self.speculator = Speculator(self.camera)
+                get_cache().enabled = True
+            else:
+                print(f"{self.timestamp()} - Speculative detection needs the shared camera, disabled")
+        for module_name, hook in hooks.items():
+            try:
+                self._timed(f"warm_up {module_name}", hook)
+            except Exception as exc:
+                print(f"{self.timestamp()} - Warm-up of {module_name} failed: {exc}")
+        print(f"{self.timestamp()} - Tasks ready {self.since_start():.0f} ms after start "
+              f"({self.startup_report()})")
+    
+    def wait_until_warm(self) -> None:
+        """Block until a background warm-up has finished; if it failed, tasks that did not
+        load run as scripts and vision tasks open the camera themselves"""
+        if self._warm is not None:
+            try:
+                self._warm.result()
+            except Exception as exc:
+                print(f"{self.timestamp()} - Warm-up failed ({exc}), continuing without it")
+    
+    def since_start(self) -> float:
+        """ms since the controller was created"""
+        return (time.perf_counter() - self._created) * 1000
+    
+    def startup_report(self) -> str:
+        """Start-up phases, slowest first"""
+        phases = sorted(self.startup.items(), key=lambda item: -item[1])
+        return ", ".join(f"{phase} {ms:.0f} ms" for phase, ms in phases)
+    
+    def load_tasks(self) -> Dict[str, Callable[[], Any]]:
+        """Import task modules once so commands skip interpreter and library start-up.
         
+        Returns the modules' warm_up() hooks, {module name: hook}."""
+        hooks = {}
+        for script_name, (module_name, func_name, uses_camera) in TASK_MODULES.items():
+            try:
+                module = self._timed(f"import {module_name}", importlib.import_module, module_name)
+                self.tasks[script_name] = getattr(module, func_name)
+                if uses_camera:
+                    self.camera_tasks.add(script_name)
+                if hasattr(module, "warm_up"):
+                    hooks[module_name] = module.warm_up
+            except Exception as exc:
+                print(f"{self.timestamp()} - Could not load {module_name} in-process ({exc}), using subprocess")
+        print(f"{self.timestamp()} - Loaded {len(self.tasks)} in-process tasks")
+        return hooks
+    
+    def start_camera(self, source: str) -> None:
+        """Open the shared camera once; vision tasks read from its frame ring"""
+        from camera_service import CameraService
+        camera = CameraService(hal.camera(source))
+        if camera.start():
+            self.camera = camera
+            print(f"{self.timestamp()} - Shared camera running on {source}")
+        else:
+            print(f"{self.timestamp()} - Shared camera unavailable, tasks will open the camera themselves")
+    
+    def stop_camera(self) -> None:
+        """Stop the shared camera thread if it is running"""
+        if self.speculator is not None:
+            self.speculator.stop()
+            self.speculator = None
+        if self.camera is not None:
+            self.camera.stop()
+            self.camera = None
+    
     def initialize_serial(self) -> None:
         """Initialize or reinitialize serial connection"""
         while True:
@@ -21,36 +206,48 @@ class RaspberryPiController:
                     self.serial_port = self.detect_esp_port()
                     if self.serial_port is None:
                         print(f"{self.timestamp()} - Waiting for ESP32 device...")
-                        time.sleep(2)
+                        hal.sleep(2)
                         continue
                 
                 print(f"{self.timestamp()} - Attempting to connect to {self.serial_port} at {self.baud_rate} baud...")
-                self.ser = serial.Serial(self.serial_port, self.baud_rate, timeout=1)
-                time.sleep(2)  # Wait for connection to establish
+                self.ser = hal.serial_port(self.serial_port, self.baud_rate, timeout=1)
+                hal.sleep(2)  # Wait for connection to establish
                 
                 # Clear any existing input buffer
                 if self.ser.is_open:
                     self.ser.reset_input_buffer()
-                    print(f"{self.timestamp()} - Serial connection established with {self.serial_port}")
+                    self.attach_serial(self.ser)
+                    print(f"{self.timestamp()} - Serial connection established with {self.serial_port} "
+                          f"({self.since_start():.0f} ms after start)")
                     print(f"{self.timestamp()} - Ready to receive commands...")
                     return
                 
                 print(f"{self.timestamp()} - Connection failed. Retrying...")
                 self.close_serial()
-                time.sleep(2)
+                hal.sleep(2)
                     
             except serial.SerialException as ser_exc:
                 print(f"{self.timestamp()} - Serial error: {ser_exc}")
                 print(f"{self.timestamp()} - Retrying in 2 seconds...")
                 self.close_serial()
-                time.sleep(2)
+                hal.sleep(2)
             except Exception as exc:
                 print(f"{self.timestamp()} - Unexpected error: {exc}")
                 self.close_serial()
-                time.sleep(2)
+                hal.sleep(2)
+    
+    def attach_serial(self, ser: serial.Serial) -> None:
+        """Start the reader thread on an open port"""
+        self.ser = ser
+        self.link = SerialLink(ser, on_line=self.handle_immediate, status=self.heartbeat_status,
+                               heartbeat_interval=self.heartbeat_interval)
+        self.link.start()
     
     def close_serial(self) -> None:
         """Safely close serial connection"""
+        if self.link is not None:
+            self.link.stop()
+            self.link = None
         if self.ser is not None and self.ser.is_open:
             try:
                 self.ser.close()
@@ -60,7 +257,7 @@ class RaspberryPiController:
     
     def detect_esp_port(self) -> Optional[str]:
         """Try to automatically detect ESP32 serial port"""
-        ports = serial.tools.list_ports.comports()
+        ports = hal.serial_ports()
         for port in ports:
             if 'USB' in port.description or 'Serial' in port.description or 'ESP' in port.description:
                 print(f"{self.timestamp()} - Found potential ESP32 at {port.device}")
@@ -68,30 +265,24 @@ class RaspberryPiController:
         return None
     
     def process_commands(self) -> None:
-        """Main loop to process incoming commands"""
-        while True:
+        """Main loop: run queued commands as soon as the reader thread delivers them"""
+        while not self._stopping.is_set():
             try:
-                if self.ser is None or not self.ser.is_open:
+                if self.ser is None or not self.ser.is_open or self.link is None or not self.link.alive:
+                    if self.link is not None and self.link.error is not None:
+                        print(f"{self.timestamp()} - Serial error while reading, connection may be lost")
                     print(f"{self.timestamp()} - Serial connection not active, attempting to reconnect...")
+                    self.close_serial()
                     self.initialize_serial()
                     continue
                 
-                # Read all available data from serial
-                try:
-                    if self.ser.in_waiting > 0:  # type: ignore[union-attr]
-                        line = self.ser.readline().decode('utf-8').strip()  # type: ignore[union-attr]
-                        if line:  # Only process non-empty lines
-                            self.process_line(line)
-                except UnicodeDecodeError:
-                    print(f"{self.timestamp()} - Received malformed data")
-                except serial.SerialException:
-                    print(f"{self.timestamp()} - Serial error while reading, connection may be lost")
-                    self.close_serial()
-                except Exception as exc:
-                    print(f"{self.timestamp()} - Error processing data: {exc}")
-                
-                # Small delay to prevent CPU overload
-                time.sleep(0.1)
+                # Blocks until a command arrives; the timeout only bounds link health checks
+                line = self.link.get_line(timeout=0.5)
+                if line:
+                    try:
+                        self.process_line(line, self.link.received_at)
+                    except Exception as exc:
+                        print(f"{self.timestamp()} - Error processing data: {exc}")
                 
             except KeyboardInterrupt:
                 print("\nUser interrupted. Exiting...")
@@ -100,91 +291,204 @@ class RaspberryPiController:
                 print(f"\nUnexpected error: {exc}")
                 time.sleep(1)  # Prevent tight error loop
     
-    def process_line(self, line: str) -> None:
-        """Process a single line of input from serial"""
+    def stop(self) -> None:
+        """Ask process_commands() to return after the current command"""
+        self._stopping.set()
+    
+    def handle_immediate(self, line: str) -> bool:
+        """Answer status commands on the reader thread, even while a task is running"""
+        start = self.telemetry.clock()
+        try:
+            request = parse_line(line)
+        except FrameError:
+            return False  # process_line() reports it
+        reply = self.immediate_reply(request.payload)
+        if reply is None:
+            return False
+        self.send_response(format_reply(request, reply))
+        self.telemetry.record("command", start, self.telemetry.clock(), command=str(request.payload))
+        return True
+    
+    def immediate_reply(self, command: Any) -> Optional[str]:
+        """Reply for commands that never wait behind a task, None for everything else"""
+        if command == "PING":
+            return "PONG"
+        if command == "STATUS":
+            current = self.current_command or self.abandoned_task()
+            return f"BUSY:{current}" if current else "IDLE"
+        if command == "ABORT":
+            token = self._token
+            return "OK" if token is not None and token.cancel("abort") else "IDLE"
+        if command in ("STATS", "STATS:PHASES"):
+            # Latency per command (or per phase), ms: n, mean, p50/p95 bucket bounds, max
+            return f"STATS:{self.telemetry.stats('phases' if command.endswith('PHASES') else 'commands')}"
+        if command == "STATS:CACHE":
+            # Speculative result cache: fresh hits, misses, stale entries
+            return f"STATS:{get_cache().stats()}"
+        if isinstance(command, str) and command.startswith("HINT:"):
+            # Start detecting for a command that is coming (--speculate); OFF without speculation
+            speculator = self.speculator
+            if speculator is None:
+                return "OFF"
+            target = command[len("HINT:"):]
+            return "OK" if speculator.start(target) else f"ERROR: No speculative detection for {target}"
+        return None
+    
+    def heartbeat_status(self) -> Optional[str]:
+        """Heartbeat message sent while a task runs (None when idle)"""
+        command = self.current_command
+        return f"BUSY:{command}" if command else None
+    
+    def process_line(self, line: str, received_at: Optional[float] = None) -> None:
+        """Process a single line of input from serial (plain text or framed).
+        
+        received_at: telemetry clock time the line arrived (default: now)"""
+        telemetry = self.telemetry
+        start = telemetry.clock() if received_at is None else received_at
         print(f"{self.timestamp()} - ESP32: {line}")
         
         try:
-            if line == "TAKE_POTATO":
-                self._run_python_script("take_potato.py")
-                self.send_response("OK")
-                
-            elif line == "IS_RED_GOOD":
-                result = str(self._run_python_script("is_red_good.py"))
-                self.send_response(f"RESULT:{result}")
-                
-            elif line == "FIND_BOX_COLOR":
-                result = self._run_python_script("find_box_color.py")
-                self.send_response(f"RESULT:{result}")
-                
-            elif line.startswith("OPEN_GATE:"):
-                value = float(line.split(':')[1])
-                self._run_python_script("open_gate.py", str(value))
-                self.send_response("OK")
-
-            elif line == "TAKE_RIGHT_BOX":
-                self._run_python_script("take_right_box.py")
-                self.send_response("OK")
-
-            elif line == "TAKE_FRONT_BOX":
-                self._run_python_script("take_front_box.py")
-                self.send_response("OK")
-
-            elif line == "PLACE_RIGHT_BOX":
-                self._run_python_script("play_right_box.py")
-                self.send_response("OK")
-
-            elif line == "PLACE_FRONT_BOX":
-                self._run_python_script("play_front_box.py")
-                self.send_response("OK")
-                
-            elif line == "DETECT_DRY_POT":
-                result = self._run_python_script("detect_dry_pot.py")
-                self.send_response(f"RESULT:{result}")
-                
-            elif line == "TAKE_WATER":
-                self._run_python_script("take_water.py")
-                self.send_response("OK")
-                
-            elif line == "WATER_POT":
-                self._run_python_script("water_pot.py")
-                self.send_response("OK")
-                
-            elif line == "PLAY_STARMAN":
-                self._run_python_script("play_starman.py")
-                self.send_response("OK")
-                
-            elif line:  # Only send error for non-empty lines
-                self.send_response("ERROR: Unknown command")
-                
+            request = parse_line(line)
+        except FrameError as exc:
+            print(f"{self.timestamp()} - Bad frame: {exc}")
+            error_request = Request(exc.seq, "")
+            self.send_response(format_reply(error_request, f"ERROR: {exc}"))
+            return
+        
+        self.current_command = str(request.payload)
+        telemetry.begin(self.current_command.partition(':')[0])
+        telemetry.record("receive", start, telemetry.clock())
+        try:
+            with telemetry.span("dispatch"):
+                reply = self.execute(request.payload)
         except Exception as exc:
             print(f"{self.timestamp()} - Error processing command: {exc}")
-            self.send_response(f"ERROR: {str(exc)}")
+            reply = f"ERROR: {str(exc)}"
+        finally:
+            self.current_command = None
+        
+        if reply is not None:
+            self.send_response(format_reply(request, reply))
+        telemetry.end(start)
+    
+    def execute(self, command: Any) -> Optional[str]:
+        """Run one command from the command table and return its reply"""
+        if isinstance(command, bytes):
+            raise ValueError("Binary payload is not a command")
+        if not command:
+            return None
+        immediate = self.immediate_reply(command)
+        if immediate is not None:
+            return immediate
+        
+        name, has_arg, arg = command.partition(':')
+        spec = COMMANDS.get(name)
+        if spec is None or (has_arg and spec[1] is None):
+            return "ERROR: Unknown command"
+        
+        script_name, parse_arg, reply_type = spec
+        args: List[str] = []
+        if parse_arg is not None:
+            if not has_arg:
+                raise ValueError(f"{name} needs an argument")
+            args.append(str(parse_arg(arg)))
+        
+        # An abandoned task may still drive the arm, suction or camera: no second one alongside it
+        abandoned = self.abandoned_task()
+        if abandoned is not None:
+            print(f"{self.timestamp()} - {name} refused, abandoned {abandoned} is still running")
+            return "ERROR: busy"
+        
+        # The task looks up the speculative cache itself; stop detecting for it in the background
+        speculator = self.speculator
+        if speculator is not None:
+            speculator.stop(name)
+        
+        deadline = self.deadlines.get(name, DEFAULT_DEADLINE)
+        token = CancelToken()
+        self._token = token
+        try:
+            future = run_with_deadline(f"task {name}", self._run_task, deadline, token, script_name, *args)
+        finally:
+            self._token = None
+        if speculator is not None and name in SPECULATE_NEXT:
+            speculator.start(SPECULATE_NEXT[name])
+        
+        if token.cancelled:
+            partial = future.result() if future.done() and future.exception() is None else None
+            state = "returned" if future.done() else "abandoned (still running)"
+            if not future.done():
+                self._abandoned = (name, future)
+            print(f"{self.timestamp()} - {name} cancelled ({token.reason}, deadline {deadline:g} s), "
+                  f"task {state}, partial result {partial}")
+            if reply_type == "result" and partial is not None:
+                return f"RESULT:{partial}"
+            return f"ERROR: {token.reason}"
+        
+        result = future.result()
+        return f"RESULT:{result}" if reply_type == "result" else "OK"
+    
+    def abandoned_task(self) -> Optional[str]:
+        """Command of a cancelled task whose thread has not exited yet, else None"""
+        abandoned = self._abandoned
+        if abandoned is None:
+            return None
+        if abandoned[1].done():
+            self._abandoned = None
+            return None
+        return abandoned[0]
     
     def send_response(self, message: str) -> None:
         """Helper method to send responses with newline"""
-        if self.ser is not None and self.ser.is_open:
+        link = self.link
+        if link is not None and self.ser is not None and self.ser.is_open:
             try:
-                self.ser.write(f"{message}\n".encode())  # type: ignore[union-attr]
+                with self.telemetry.span("reply"):
+                    link.write(message)
             except Exception as exc:
                 print(f"{self.timestamp()} - Failed to send response: {exc}")
-                self.close_serial()
+                link.error = exc  # process_commands() reconnects
         else:
             print(f"{self.timestamp()} - Cannot send response, serial connection not available")
     
+    def _run_task(self, script_name: str, *args: str) -> str:
+        """Run a task in-process if it is registered, otherwise as a python script"""
+        self.wait_until_warm()
+        task = self.tasks.get(script_name)
+        if task is None:
+            return self._run_python_script(script_name, *args)
+        
+        try:
+            if script_name in self.camera_tasks and self.camera is not None:
+                result = task(*args, camera=self.camera)
+            else:
+                result = task(*args)
+            return str(result).strip() if result is not None else "true"
+        except Cancelled:
+            raise
+        except Exception as exc:
+            print(f"{self.timestamp()} - Task {script_name} failed with error: {exc}")
+            return "false"
+    
     def _run_python_script(self, script_name: str, *args: str) -> str:
-        """Run a python script and return its output"""
+        """Run a python script and return its output; the script is killed if the task is cancelled"""
+        token = current_token()
         try:
             cmd: List[str] = ["python3", script_name] + list(args)
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+                token.on_cancel(process.kill)
+                stdout, stderr = process.communicate()
+            token.check()
             
-            if result.returncode != 0:
+            if process.returncode != 0:
                 print(f"{self.timestamp()} - Script {script_name} failed with error:")
-                print(result.stderr)
+                print(stderr)
                 return "false"
                 
-            return result.stdout.strip() or "true"
+            return stdout.strip() or "true"
             
+        except Cancelled:
+            raise
         except FileNotFoundError:
             print(f"{self.timestamp()} - Script not found: {script_name}")
             return "false"
@@ -193,18 +497,49 @@ class RaspberryPiController:
             return "false"
     
     def timestamp(self) -> str:
-        """Return formatted timestamp"""
-        return datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
+        """Return formatted timestamp (formatted once per second, not per log line)"""
+        now = int(time.time())
+        if now != self._stamp_second:
+            self._stamp = datetime.fromtimestamp(now).strftime("[%Y-%m-%d %H:%M:%S]")
+            self._stamp_second = now
+        return self._stamp
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Raspberry Pi command controller for the navigation ESP32")
+    parser.add_argument("--port", help="Serial port (auto-detected if omitted)")
+    parser.add_argument("--baud", type=int, default=115200, help="Serial baud rate")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Run every task as a separate python3 process (legacy mode)")
+    parser.add_argument("--camera", default="0",
+                        help="Shared camera source: device index, video file or image directory ('none' to disable)")
+    parser.add_argument("--heartbeat", type=float, default=0.0,
+                        help="Send BUSY:<command> every N seconds while a task runs (0 = off)")
+    parser.add_argument("--telemetry", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           "telemetry.jsonl"),
+                        help="JSONL log of command phase timings ('none' for histograms only, see STATS)")
+    parser.add_argument("--telemetry-max-mb", type=float, default=MAX_LOG_BYTES / 2 ** 20,
+                        help="Rotate the telemetry log to <file>.1 past this size (0 = never)")
+    parser.add_argument("--no-prewarm", action="store_true",
+                        help="Load tasks and open the camera before connecting instead of during the handshake")
+    parser.add_argument("--speculate", action="store_true",
+                        help="Detect ahead of vision commands (HINT:<command>, SPECULATE_NEXT) and answer from a cache")
+    args = parser.parse_args()
+    
     print("Starting Raspberry Pi Controller...")
-    controller = RaspberryPiController()
+    configure_telemetry(None if args.telemetry.lower() == "none" else args.telemetry,
+                        max_bytes=int(args.telemetry_max_mb * 2 ** 20))
+    camera_source = None if args.camera.lower() == "none" else args.camera
+    controller = RaspberryPiController(args.port, args.baud, use_subprocess=args.subprocess,
+                                       camera_source=camera_source, heartbeat_interval=args.heartbeat,
+                                       prewarm=not args.no_prewarm, speculate=args.speculate)
     try:
         controller.process_commands()
     except Exception as exc:
         print(f"Fatal error: {exc}")
     finally:
+        controller.stop_camera()
         controller.close_serial()
+        get_telemetry().stop()
         print("Program terminated")
 
 
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Compare per-command latency of in-process tasks against the legacy subprocess mode.
+
+Hardware modules (board, busio, RPi.GPIO, adafruit_servokit) are replaced by
+mocks and the camera reports itself unavailable, so this runs on any Linux box.
+time.sleep is patched out and the HAL clock skips ahead by every HAL sleep, so
+the numbers show dispatch overhead, not arm motion or gate settling.
+
+Usage: python3 raspi_benchmark.py [repeats]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Mock hardware modules, written to a temp dir that is put on sys.path here
+# and on PYTHONPATH for child interpreters in subprocess mode.
+MOCK_MODULES = {
+    "board.py": "SCL = 3\nSDA = 2\n",
+    "busio.py": (
+        "class I2C:\n"
+        "    def __init__(self, scl, sda):\n"
+        "        self.scl, self.sda = scl, sda\n"
+        "    def try_lock(self): return True\n"
+        "    def unlock(self): pass\n"
+        "    def writeto(self, address, buffer, *, start=0, end=None): pass\n"
+        "    def writeto_then_readfrom(self, address, buffer_out, buffer_in, **kwargs): pass\n"
+    ),
+    "RPi/__init__.py": "",
+    "RPi/GPIO.py": (
+        "BCM = 11\nOUT = 0\nIN = 1\nLOW = 0\nHIGH = 1\n"
+        "def setmode(mode): pass\n"
+        "def setup(pin, mode): pass\n"
+        "def output(pin, value): pass\n"
+        "def cleanup(channel=None): pass\n"
+    ),
+    "adafruit_servokit.py": (
+        "class _Servo:\n"
+        "    def __init__(self):\n"
+        "        self.angle = None\n"
+        "        self.actuation_range = 180\n"
+        "    def set_pulse_width_range(self, min_pulse, max_pulse): pass\n"
+        "class ServoKit:\n"
+        "    def __init__(self, channels, i2c=None):\n"
+        "        self.servo = [_Servo() for _ in range(channels)]\n"
+    ),
+    # Loaded automatically by every interpreter that has the mock dir on its path
+    "sitecustomize.py": (
+        "import os\n"
+        "import time\n"
+        "if os.environ.get('HOPE_MOCK_SKIP_WAITS') == '1':\n"
+        "    time.sleep = lambda seconds: None\n"
+        "    try:\n"
+        "        import hal.pi\n"
+        "        _skipped = [0.0]\n"
+        "        def _skip(seconds):\n"
+        "            _skipped[0] += max(0.0, seconds)\n"
+        "        hal.pi.clock = lambda: time.perf_counter() + _skipped[0]\n"
+        "        hal.pi.sleep = _skip\n"
+        "    except ImportError:\n"
+        "        pass\n"
+        "try:\n"
+        "    import cv2\n"
+        "    class _NoCamera:\n"
+        "        def __init__(self, *args): pass\n"
+        "        def isOpened(self): return False\n"
+        "        def read(self): return False, None\n"
+        "        def release(self): pass\n"
+        "    cv2.VideoCapture = _NoCamera\n"
+        "except ImportError:\n"
+        "    pass\n"
+    ),
+}
+
+COMMANDS = ["FIND_BOX_COLOR", "IS_RED_GOOD", "OPEN_GATE:1", "TAKE_POTATO", "PLAY_STARMAN"]
+
+
+def install_mocks(skip_waits=True):
+    """Write the mock modules and make them importable here and in child processes
+    (skip_waits: time.sleep returns at once and HAL sleeps only advance the HAL clock)"""
+    mock_dir = tempfile.mkdtemp(prefix="raspi_mocks_")
+    for rel_path, source in MOCK_MODULES.items():
+        path = os.path.join(mock_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(source)
+    sys.path.insert(0, mock_dir)
+    # Keep the servo state snapshot out of the working tree
+    os.environ["SERVO_STATE_FILE"] = os.path.join(mock_dir, "servo_state.json")
+    os.environ["HOPE_MOCK_SKIP_WAITS"] = "1" if skip_waits else "0"
+    # The repo too, so the children's sitecustomize can reach hal.pi
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [mock_dir, repo_dir, os.environ.get("PYTHONPATH")]))
+    import sitecustomize  # noqa: F401  (apply the patches in this process too)
+    return mock_dir
+
+
+def bench(controller, repeats):
+    """Return {command: [latency_ms, ...]} for every benchmark command"""
+    replies = []
+    controller.send_response = replies.append
+    timings = {}
+    for command in COMMANDS:
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            controller.process_line(command)
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[command] = samples
+    return timings, replies
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    install_mocks()
+
+    # Silence task output (stdout and stderr) so it doesn't dominate the console
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = open(os.devnull, "w")
+    try:
+        from raspi import RaspberryPiController
+        load_start = time.perf_counter()
+        in_process = RaspberryPiController(use_subprocess=False, connect=False)
+        load_ms = (time.perf_counter() - load_start) * 1000
+        subprocess_mode = RaspberryPiController(use_subprocess=True, connect=False)
+
+        fast, fast_replies = bench(in_process, repeats)
+        slow, slow_replies = bench(subprocess_mode, repeats)
+    finally:
+        sys.stdout.close()
+        sys.stdout, sys.stderr = real_stdout, real_stderr
+
+    print(f"One-time task import at startup: {load_ms:.1f} ms")
+    print(f"{'command':<16}{'subprocess ms':>16}{'in-process ms':>16}{'speedup':>10}")
+    for command in COMMANDS:
+        slow_ms = statistics.median(slow[command])
+        fast_ms = statistics.median(fast[command])
+        print(f"{command:<16}{slow_ms:>16.2f}{fast_ms:>16.3f}{slow_ms / max(fast_ms, 1e-6):>9.0f}x")
+    print(f"Replies identical in both modes: {fast_replies == slow_replies}")
+
+
+if __name__ == '__main__':
+    main()
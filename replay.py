@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Offline replay of recorded frames through the vision tasks, with a JSON report.
+
+Each case in a manifest names a task, a recording (video, image directory or
+single image, relative to the manifest) and the expected answer:
+
+    {"cases": [
+        {"task": "boxes", "source": "rec/red_box.mp4", "expected": 1},
+        {"task": "ball",  "source": "rec/white_ball/", "expected": "white"},
+        {"task": "tag",   "source": "rec/tag_4/",      "expected": "true"}
+    ]}
+
+Frames are served by ReplayCapture on a virtual 30 fps clock (the last frame
+is held once a recording runs out), so decisions and frames-to-decision are
+the same as live, independent of how fast this machine is. Per-frame
+processing time is measured between consecutive reads. The report has per
+case and per task accuracy, frames and virtual ms to decision, p50/p95/p99 ms
+per frame, the change gate's counts (detector runs skipped, CPU ms saved;
+--no-gate runs every detector on every frame) and the peak RSS of the process.
+
+Without a manifest the built-in synthetic cases are replayed. With
+--baseline the run fails (exit status 1) if any task's accuracy drops, it has
+more failed cases, or its p95 ms/frame grows by more than --tolerance. The
+tasks run on the simulated HAL unless $HOPE_HAL says otherwise.
+
+Usage: python3 replay.py [manifest.json] [--out report.json] [--baseline old.json] [--tolerance 0.2] [--no-gate]
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+os.environ.setdefault("HOPE_HAL", "sim")  # take_potato opens GPIO at import
+
+FPS = 30.0
+TASKS = ("boxes", "ball", "tag")
+
+
+class ReplayCapture:
+    """cv2.VideoCapture stand-in that plays a frame list and advances a virtual clock"""
+
+    def __init__(self, frames, fps=FPS):
+        self.frames = frames
+        self.fps = fps
+        self.now = 0.0
+        self.index = 0
+        self.read_times: List[float] = []  # perf_counter at each read
+
+    def clock(self):
+        return self.now
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        self.read_times.append(time.perf_counter())
+        frame = self.frames[min(self.index, len(self.frames) - 1)]
+        self.index += 1
+        self.now += 1.0 / self.fps
+        return True, frame
+
+    def release(self):
+        pass
+
+    def frame_ms(self) -> List[float]:
+        """Processing time of each frame (time until the next read, or until now for the last)"""
+        times = self.read_times + [time.perf_counter()]
+        return [(b - a) * 1000 for a, b in zip(times, times[1:])]
+
+
+def run_boxes(cap):
+    from find_box_color import decide_boxes
+    return decide_boxes(cap, clock=cap.clock).value
+
+
+def run_ball(cap):
+    from take_potato import decide_ball_color
+    return decide_ball_color(cap, clock=cap.clock).value
+
+
+def run_tag(cap):
+    from is_red_good import is_red_good
+    return is_red_good(cap=cap, clock=cap.clock, save_debug=False)
+
+
+RUNNERS = {"boxes": run_boxes, "ball": run_ball, "tag": run_tag}
+
+
+def percentiles(values) -> Dict[str, float]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "mean": round(float(np.mean(values)), 3)}
+
+
+def peak_rss_kb() -> int:
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_case(task, name, frames, expected) -> Dict:
+    """Replay one recording through a task; errors (e.g. missing hardware modules) are recorded, not raised"""
+    result = {"task": task, "source": name, "expected": expected, "value": None, "correct": False,
+              "frames": 0, "decision_ms": None, "ms_per_frame": percentiles([]), "error": None}
+    if not frames:
+        result["error"] = "no frames"
+        return result
+    cap = ReplayCapture(frames)
+    try:
+        value = RUNNERS[task](cap)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+    frame_ms = cap.frame_ms()
+    result.update(value=value, correct=value == expected, frames=cap.index,
+                  decision_ms=round(cap.now * 1000, 1), ms_per_frame=percentiles(frame_ms))
+    result["_frame_ms"] = frame_ms
+    return result
+
+
+def summarize(cases) -> Dict:
+    summary = {}
+    for task in TASKS:
+        ran = [c for c in cases if c["task"] == task and c["error"] is None]
+        errors = sum(1 for c in cases if c["task"] == task and c["error"] is not None)
+        if not ran and not errors:
+            continue
+        frame_ms = [ms for c in ran for ms in c["_frame_ms"]]
+        summary[task] = {
+            "cases": len(ran),
+            "errors": errors,
+            "accuracy": round(sum(c["correct"] for c in ran) / len(ran), 4) if ran else None,
+            "mean_frames_to_decision": round(float(np.mean([c["frames"] for c in ran])), 2) if ran else None,
+            "mean_decision_ms": round(float(np.mean([c["decision_ms"] for c in ran])), 1) if ran else None,
+            "ms_per_frame": percentiles(frame_ms),
+        }
+    return summary
+
+
+def load_manifest(path):
+    """[(task, source name, frames, expected)] from a JSON manifest"""
+    from segmentation_benchmark import load_frames
+
+    with open(path) as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    cases = []
+    for entry in manifest["cases"]:
+        if entry["task"] not in TASKS:
+            raise ValueError(f"Unknown task {entry['task']!r} (expected one of {TASKS})")
+        source = os.path.join(base, entry["source"])
+        cases.append((entry["task"], entry["source"], load_frames(source), entry["expected"]))
+    return cases
+
+
+def synthetic_cases():
+    """Built-in cases: steady, empty and late-appearing targets for every task"""
+    from decision_benchmark import sequence
+    from tag_benchmark import tag_frame
+
+    tag_4, tag_7 = tag_frame(4), tag_frame(7)
+    return [
+        ("boxes", "synthetic: red box", sequence(("red", 90)), 1),
+        ("boxes", "synthetic: blue box", sequence(("blue", 90)), 0),
+        ("boxes", "synthetic: no box", sequence((None, 90)), -1),
+        ("boxes", "synthetic: red at 0.5 s", sequence((None, 15), ("red", 75)), 1),
+        ("ball", "synthetic: orange ball", sequence(("orange", 90)), "orange"),
+        ("ball", "synthetic: white ball", sequence(("white", 90)), "white"),
+        ("tag", "synthetic: tag 4", [tag_4] * 30, "true"),
+        ("tag", "synthetic: tag 7", [tag_7] * 30, "false"),
+        ("tag", "synthetic: no tag", sequence((None, 30)), "false"),
+    ]
+
+
+def compare(report, baseline, tolerance) -> List[str]:
+    """Regressions of report vs. baseline: accuracy drops and p95 ms/frame growth beyond tolerance"""
+    problems = []
+    for task, old in baseline.get("summary", {}).items():
+        new = report["summary"].get(task)
+        if old["accuracy"] is None:
+            continue
+        if new is None or new["accuracy"] is None:
+            problems.append(f"{task}: not run")
+            continue
+        if new["errors"] > old.get("errors", 0):
+            problems.append(f"{task}: errors {old.get('errors', 0)} -> {new['errors']}")
+        if new["accuracy"] < old["accuracy"]:
+            problems.append(f"{task}: accuracy {old['accuracy']} -> {new['accuracy']}")
+        old_p95, new_p95 = old["ms_per_frame"]["p95"], new["ms_per_frame"]["p95"]
+        if old_p95 and new_p95 > old_p95 * (1 + tolerance):
+            problems.append(f"{task}: p95 ms/frame {old_p95} -> {new_p95}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded frames through the vision tasks")
+    parser.add_argument("manifest", nargs="?", help="JSON manifest (default: built-in synthetic cases)")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout only)")
+    parser.add_argument("--baseline", help="earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 ms/frame growth (0.2 = 20%%)")
+    parser.add_argument("--no-gate", action="store_true", help="run the detectors on every frame (no change gating)")
+    args = parser.parse_args()
+
+    import change_gate
+    change_gate.ENABLED = not args.no_gate
+
+    inputs = load_manifest(args.manifest) if args.manifest else synthetic_cases()
+    cases = [run_case(*case) for case in inputs]
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "manifest": args.manifest,
+        "fps": FPS,
+        "summary": summarize(cases),
+        "gate": {name: vars(stats) for name, stats in change_gate.GATE_STATS.items()},
+        "peak_rss_kb": peak_rss_kb(),
+        "cases": [{k: v for k, v in c.items() if not k.startswith("_")} for c in cases],
+    }
+
+    print(f"{'case':<34}{'value':>8}{'ok':>4}{'frames':>8}{'p50 ms':>9}{'p95 ms':>9}", file=sys.stderr)
+    for c in report["cases"]:
+        if c["error"]:
+            print(f"{c['source'][:33]:<34}  ERROR {c['error']}", file=sys.stderr)
+            continue
+        print(f"{c['source'][:33]:<34}{str(c['value']):>8}{'yes' if c['correct'] else 'NO':>4}{c['frames']:>8}"
+              f"{c['ms_per_frame']['p50']:>9.2f}{c['ms_per_frame']['p95']:>9.2f}", file=sys.stderr)
+    print(change_gate.report(), file=sys.stderr)
+    print(f"peak RSS {report['peak_rss_kb'] / 1024:.0f} MB", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Region-of-interest and coarse-to-fine processing for the vision detectors.
+
+Each task declares a ProcessingMode:
+
+    roi     (x0, y0, x1, y1) as fractions of the frame, or None for all of it
+    scale   downscale factor for the coarse pass (1.0 = full resolution)
+    refine  re-check coarse candidates at full resolution, inside a window
+            around the candidate only
+
+Area thresholds are given for REFERENCE_SIZE (640x480) and are scaled to the
+actual frame and pass resolution, so the same MIN_BOX_AREA works at 320x240
+or in a 0.5x coarse pass.
+"""
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from segmentation import Blob, Segmenter
+
+REFERENCE_SIZE = (640, 480)  # resolution the area thresholds were tuned at
+
+
+class ProcessingMode(NamedTuple):
+    roi: Optional[Tuple[float, float, float, float]] = None
+    scale: float = 1.0
+    refine: bool = True
+    coarse_slack: float = 0.8  # coarse pass keeps candidates down to this share of min_area
+    margin: float = 0.15  # refine window padding, as a fraction of the candidate size
+
+
+FULL_FRAME = ProcessingMode()
+
+
+def area_scale(shape: Sequence[int], reference: Tuple[int, int] = REFERENCE_SIZE) -> float:
+    """Factor turning a pixel area at `reference` resolution into one at `shape` (h, w, ...)"""
+    return (shape[0] * shape[1]) / float(reference[0] * reference[1])
+
+
+def roi_bounds(shape: Sequence[int], roi: Optional[Tuple[float, float, float, float]]) -> Tuple[int, int, int, int]:
+    """Pixel bounds (x0, y0, x1, y1) of a fractional ROI"""
+    height, width = shape[:2]
+    if roi is None:
+        return 0, 0, width, height
+    x0, y0, x1, y1 = roi
+    return (int(round(x0 * width)), int(round(y0 * height)),
+            int(round(x1 * width)), int(round(y1 * height)))
+
+
+def intersect(a: Optional[Tuple[float, float, float, float]],
+              b: Optional[Tuple[float, float, float, float]]) -> Optional[Tuple[float, float, float, float]]:
+    """Overlap of two fractional ROIs (None = the whole frame)"""
+    if a is None or b is None:
+        return b if a is None else a
+    return max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+
+
+def crop(frame: np.ndarray, roi: Optional[Tuple[float, float, float, float]]) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """View of the ROI (no copy) and its (x, y) offset in the frame"""
+    x0, y0, x1, y1 = roi_bounds(frame.shape, roi)
+    return frame[y0:y1, x0:x1], (x0, y0)
+
+
+def crosses_edge(segmenter: Segmenter, frame: np.ndarray, roi: Optional[Tuple[float, float, float, float]],
+                 names: Sequence[str]) -> bool:
+    """Whether any class has pixels on an ROI edge inside the frame: a blob there may go on
+    outside the ROI, and measured in the crop alone it would come out too small"""
+    height, width = frame.shape[:2]
+    x0, y0, x1, y1 = roi_bounds(frame.shape, roi)
+    strips = []
+    if y0 > 0:
+        strips.append(frame[y0, x0:x1])
+    if y1 < height:
+        strips.append(frame[y1 - 1, x0:x1])
+    if x0 > 0:
+        strips.append(frame[y0:y1, x0])
+    if x1 < width:
+        strips.append(frame[y0:y1, x1 - 1])
+    if not strips:
+        return False
+    edge = segmenter.segment(np.concatenate(strips)[np.newaxis])
+    return any(edge.count(name) for name in names)
+
+
+def _shift(blob: Blob, dx: float, dy: float, factor: float = 1.0) -> Blob:
+    """Map a blob from a scaled, cropped image back to frame coordinates"""
+    x, y, w, h = blob.bbox
+    bbox = (int(x * factor + dx), int(y * factor + dy), int(round(w * factor)), int(round(h * factor)))
+    centroid = (blob.centroid[0] * factor + dx, blob.centroid[1] * factor + dy)
+    contour = None
+    if blob.contour is not None:
+        contour = (blob.contour * factor + np.array([dx, dy])).astype(np.int32)
+    return Blob(blob.area * factor * factor, bbox, centroid, contour)
+
+
+def first_pass(frame: np.ndarray, mode: ProcessingMode = FULL_FRAME) -> np.ndarray:
+    """BGR image the first segmentation pass of detect_blobs() runs on: the ROI, downscaled"""
+    region, _ = crop(frame, mode.roi)
+    if mode.scale >= 1.0:
+        return region
+    return cv2.resize(region, None, fx=mode.scale, fy=mode.scale, interpolation=cv2.INTER_AREA)
+
+
+def first_pass_hsv(frame: np.ndarray, mode: ProcessingMode = FULL_FRAME) -> np.ndarray:
+    """HSV of first_pass(); computed ahead (e.g. in another process) and passed to detect_blobs()"""
+    return cv2.cvtColor(first_pass(frame, mode), cv2.COLOR_BGR2HSV)
+
+
+def detect_blobs(segmenter: Segmenter, frame: np.ndarray, names: Sequence[str],
+                 min_area: float, max_area: float, mode: ProcessingMode = FULL_FRAME,
+                 first_match: bool = False, hsv: Optional[np.ndarray] = None) -> Dict[str, Optional[Blob]]:
+    """Largest blob per class within the (reference-resolution) area limits, in frame coordinates.
+
+    With first_match, classes are checked in order and the search stops at the
+    first one found (later classes map to None). `hsv` is first_pass_hsv() of
+    the frame if it was already computed.
+    """
+    region, (ox, oy) = crop(frame, mode.roi)
+    full_scale = area_scale(frame.shape)
+    results: Dict[str, Optional[Blob]] = {name: None for name in names}
+    if hsv is not None:
+        segmentation = segmenter.segment(hsv, is_hsv=True)
+    else:
+        segmentation = segmenter.segment(first_pass(frame, mode))
+
+    if mode.scale >= 1.0:
+        for name in names:
+            blob = segmentation.largest(name, min_area * full_scale, max_area * full_scale)
+            if blob is not None:
+                results[name] = _shift(blob, ox, oy)
+                if first_match:
+                    break
+        return results
+
+    coarse_scale = full_scale * mode.scale * mode.scale
+    for name in names:
+        slack = mode.coarse_slack if mode.refine else 1.0
+        candidates = segmentation.blobs(name, min_area * coarse_scale * slack, max_area * coarse_scale / slack)
+        blob = None
+        if not mode.refine:
+            blob = _shift(candidates[0], ox, oy, 1.0 / mode.scale) if candidates else None
+        else:
+            for candidate in candidates[:3]:
+                blob = _refine(segmenter, region, candidate, name, mode,
+                               min_area * full_scale, max_area * full_scale)
+                if blob is not None:
+                    blob = _shift(blob, ox, oy)
+                    break
+        if blob is not None:
+            results[name] = blob
+            if first_match:
+                break
+    return results
+
+
+def _refine(segmenter: Segmenter, region: np.ndarray, candidate: Blob, name: str,
+            mode: ProcessingMode, min_area: float, max_area: float) -> Optional[Blob]:
+    """Re-segment a full-resolution window around a coarse candidate"""
+    factor = 1.0 / mode.scale
+    x, y, w, h = candidate.bbox
+    pad_x, pad_y = w * mode.margin + 2, h * mode.margin + 2
+    height, width = region.shape[:2]
+    x0 = max(0, int((x - pad_x) * factor))
+    y0 = max(0, int((y - pad_y) * factor))
+    x1 = min(width, int((x + w + pad_x) * factor) + 1)
+    y1 = min(height, int((y + h + pad_y) * factor) + 1)
+
+    blob = segmenter.segment(region[y0:y1, x0:x1]).largest(name, min_area, max_area)
+    return _shift(blob, x0, y0) if blob is not None else None
+
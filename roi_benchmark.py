@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""CPU cost per frame of the ROI / downscaled / coarse-to-fine processing modes.
+
+Box detection runs over synthetic 640x480 scenes (red, blue and no box) plus
+any stored frames given on the command line; every mode's decision is checked
+against the full-resolution result. Tag preprocessing (gray, blur, CLAHE,
+detectMarkers) is timed on the whole frame and on an ROI.
+
+Usage: python3 roi_benchmark.py [image_dir|image ...]
+"""
+import sys
+import time
+
+import cv2
+
+from decision_benchmark import synthetic_frame
+from find_box_color import box_label
+from roi import FULL_FRAME, ProcessingMode, crop
+from segmentation_benchmark import load_frames
+
+BOX_MODES = [
+    ("full frame", FULL_FRAME),
+    ("ROI (center 60%)", ProcessingMode(roi=(0.2, 0.2, 0.8, 0.8))),
+    ("0.5x, no refine", ProcessingMode(scale=0.5, refine=False)),
+    ("0.5x + refine", ProcessingMode(scale=0.5, refine=True)),
+    ("0.25x + refine", ProcessingMode(scale=0.25, refine=True)),
+    ("ROI + 0.5x + refine", ProcessingMode(roi=(0.2, 0.2, 0.8, 0.8), scale=0.5, refine=True)),
+]
+TAG_ROIS = [("full frame", None), ("ROI (center 60%)", (0.2, 0.2, 0.8, 0.8))]
+
+
+def cpu_ms_per_frame(fn, frames, repeats):
+    start = time.process_time()
+    results = []
+    for _ in range(repeats):
+        results = [fn(frame) for frame in frames]
+    return (time.process_time() - start) * 1000 / (repeats * len(frames)), results
+
+
+def tag_pass(frame, roi, detector, clahe):
+    region, _ = crop(frame, roi)
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    return detector.detectMarkers(clahe.apply(gray))[1] is not None
+
+
+def main():
+    repeats = 20
+    frames = [synthetic_frame(color, seed) for seed, color in enumerate(["red", "blue", None] * 3)]
+    for spec in sys.argv[1:]:
+        frames += load_frames(spec)
+
+    print(f"Box detection, {len(frames)} frames")
+    print(f"{'mode':<22}{'CPU ms/frame':>14}{'same as full':>14}")
+    reference = None
+    for name, mode in BOX_MODES:
+        ms, labels = cpu_ms_per_frame(lambda f: box_label(f, mode), frames, repeats)
+        reference = labels if reference is None else reference
+        print(f"{name:<22}{ms:>14.3f}{str(labels == reference):>14}")
+
+    params = cv2.aruco.DetectorParameters()
+    detector = cv2.aruco.ArucoDetector(cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_16h5), params)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    print("\nTag preprocessing + detectMarkers")
+    print(f"{'mode':<22}{'CPU ms/frame':>14}")
+    for name, roi in TAG_ROIS:
+        ms, _ = cpu_ms_per_frame(lambda f: tag_pass(f, roi, detector, clahe), frames, repeats)
+        print(f"{name:<22}{ms:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Multi-color HSV segmentation shared by the vision detectors.
+
+Every configured color class is a union of HSV boxes (lower/upper, inclusive,
+as for cv2.inRange). The HSV -> class table is precomputed once per Segmenter
+as three 256-entry bit tables, one per channel: bit i of lut_h[h] & lut_s[s]
+& lut_v[v] is set when pixel (h, s, v) lies inside range i. That is the same
+table as a full 3D HSV -> label lookup, but 768 bytes instead of ~12 MB, and it
+is applied with cv2.LUT. One pass therefore classifies the frame against all
+ranges at once. Per-class masks, pixel counts and blobs are derived lazily
+from that bit image.
+
+Blobs are the external contours of a class mask (findContours +
+contourArea), which is cheapest for the usual few solid regions. A
+fragmented mask (thousands of specks: more than FRAGMENTED_RUNS runs per row
+on average) goes through one cv2.connectedComponentsWithStats call instead:
+areas, bounding boxes and centroids arrive as arrays and are filtered with
+NumPy, with no Python work per speck. Holes are filled first and the area is
+the outer contour polygon's (Pick's theorem: pixels - boundary pixels / 2 - 1),
+so both paths measure the same area and MIN_*_AREA means the same either way.
+method="contours" / "components" forces one path ("auto" picks per mask);
+`cleanup` opens each mask with a cleanup x cleanup ellipse first to drop
+speckle.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+MAX_RANGES = 8  # one bit per HSV box in a uint8 image
+METHODS = ("auto", "contours", "components")
+FRAGMENTED_RUNS = 8  # "auto": mean mask runs per row from which labelling beats tracing contours
+_CROSS = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+
+
+class ColorClass(NamedTuple):
+    """A named color: one or more (lower, upper) HSV boxes"""
+    name: str
+    ranges: Sequence[Tuple[Sequence[int], Sequence[int]]]
+
+
+class Blob(NamedTuple):
+    """One connected region of a class mask"""
+    area: float  # area inside the outer contour, holes included
+    bbox: Tuple[int, int, int, int]  # x, y, w, h
+    centroid: Tuple[float, float]
+    contour: Optional[np.ndarray] = None  # None for blobs from connected components
+
+
+class Segmenter:
+    """Classifies frames against a fixed set of color classes"""
+
+    def __init__(self, classes: Sequence[ColorClass], method: str = "auto", cleanup: int = 0):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}")
+        self.method = method
+        self.cleanup_kernel = (cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (cleanup, cleanup))
+                               if cleanup > 1 else None)
+        self.classes = list(classes)
+        self.names = [color.name for color in self.classes]
+        self.class_bits: Dict[str, int] = {}
+        self.lut_h = np.zeros(256, dtype=np.uint8)
+        self.lut_s = np.zeros(256, dtype=np.uint8)
+        self.lut_v = np.zeros(256, dtype=np.uint8)
+
+        bit = 0
+        for color in self.classes:
+            mask_bits = 0
+            for lower, upper in color.ranges:
+                if bit >= MAX_RANGES:
+                    raise ValueError(f"At most {MAX_RANGES} HSV ranges per Segmenter")
+                for lut, lo, hi in zip((self.lut_h, self.lut_s, self.lut_v), lower, upper):
+                    lut[int(lo):int(hi) + 1] |= 1 << bit
+                mask_bits |= 1 << bit
+                bit += 1
+            self.class_bits[color.name] = mask_bits
+
+        # bits -> 1-based label of the first matching class (0 = background)
+        self.label_lut = np.zeros(256, dtype=np.uint8)
+        for bits in range(255, 0, -1):
+            for label, name in enumerate(self.names, start=1):
+                if bits & self.class_bits[name]:
+                    self.label_lut[bits] = label
+                    break
+
+    def segment(self, frame: np.ndarray, hsv: Optional[np.ndarray] = None,
+                is_hsv: bool = False) -> "Segmentation":
+        """Classify a BGR frame (or an HSV frame if `is_hsv`; pass `hsv` to reuse a conversion)"""
+        if hsv is None:
+            hsv = frame if is_hsv else cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        h, s, v = cv2.split(hsv)
+        bits = cv2.LUT(h, self.lut_h)
+        cv2.bitwise_and(bits, cv2.LUT(s, self.lut_s), dst=bits)
+        cv2.bitwise_and(bits, cv2.LUT(v, self.lut_v), dst=bits)
+        return Segmentation(self, bits, hsv)
+
+
+class Segmentation:
+    """Result of one Segmenter pass; masks, counts and blobs are computed on demand"""
+
+    def __init__(self, segmenter: Segmenter, bits: np.ndarray, hsv: np.ndarray):
+        self.segmenter = segmenter
+        self.bits = bits
+        self.hsv = hsv
+        self._masks: Dict[str, np.ndarray] = {}
+        self._contours: Dict[str, list] = {}
+        self._components: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._blob_masks: Dict[str, np.ndarray] = {}
+        self._methods: Dict[str, str] = {}
+
+    @property
+    def labels(self) -> np.ndarray:
+        """Per-pixel 1-based class label (first configured class wins overlaps)"""
+        return cv2.LUT(self.bits, self.segmenter.label_lut)
+
+    def mask(self, name: str) -> np.ndarray:
+        """0/255 mask of one class, identical to OR-ing cv2.inRange over its ranges"""
+        mask = self._masks.get(name)
+        if mask is None:
+            class_bits = self.segmenter.class_bits[name]
+            mask = cv2.compare(cv2.bitwise_and(self.bits, class_bits), 0, cv2.CMP_GT)
+            self._masks[name] = mask
+        return mask
+
+    def blob_mask(self, name: str) -> np.ndarray:
+        """Class mask the blobs are taken from (after the Segmenter's cleanup, if any)"""
+        kernel = self.segmenter.cleanup_kernel
+        if kernel is None:
+            return self.mask(name)
+        mask = self._blob_masks.get(name)
+        if mask is None:
+            mask = cv2.morphologyEx(self.mask(name), cv2.MORPH_OPEN, kernel)
+            self._blob_masks[name] = mask
+        return mask
+
+    def method(self, name: str) -> str:
+        """"contours" or "components" for one class ("auto": components only for a fragmented mask)"""
+        method = self.segmenter.method
+        if method == "auto":
+            method = self._methods.get(name)
+            if method is None:
+                method = "components" if _fragmented(self.blob_mask(name)) else "contours"
+                self._methods[name] = method
+        return method
+
+    def count(self, name: str) -> int:
+        """Number of pixels in a class"""
+        return cv2.countNonZero(self.mask(name))
+
+    def counts(self) -> Dict[str, int]:
+        """Pixel counts for every class"""
+        return {name: self.count(name) for name in self.segmenter.names}
+
+    def contours(self, name: str) -> list:
+        """External contours of a class mask"""
+        contours = self._contours.get(name)
+        if contours is None:
+            contours, _ = cv2.findContours(self.blob_mask(name), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            self._contours[name] = contours
+        return contours
+
+    def components(self, name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(areas, bboxes as x/y/w/h rows, centroids) of the 8-connected regions of a class mask,
+        holes filled; areas as contourArea() gives them for the outer contours"""
+        components = self._components.get(name)
+        if components is None:
+            mask = self.blob_mask(name)
+            if not cv2.countNonZero(mask):  # labelling costs a pass over every pixel; skip empty masks
+                components = (np.zeros(0), np.zeros((0, 4), np.int32), np.zeros((0, 2)))
+            else:
+                filled = _fill_holes(mask)
+                count, labels, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+                    filled, 8, cv2.CV_32S, cv2.CCL_GRANA)
+                # Pixels with a 4-neighbour outside the region lie on its outer contour
+                inner = cv2.erode(filled, _CROSS, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+                edge = np.bincount(labels[cv2.compare(filled, inner, cv2.CMP_GT) > 0], minlength=count)
+                areas = np.maximum(stats[:, cv2.CC_STAT_AREA] - edge / 2.0 - 1, 0)
+                # Row 0 is the background
+                components = (areas[1:], stats[1:, :cv2.CC_STAT_AREA], centroids[1:])
+            self._components[name] = components
+        return components
+
+    def areas(self, name: str) -> List[float]:
+        """Area of every blob in a class"""
+        if self.method(name) == "contours":
+            return [cv2.contourArea(c) for c in self.contours(name)]
+        return self.components(name)[0].tolist()
+
+    def blobs(self, name: str, min_area: float = 0, max_area: float = float("inf")) -> List[Blob]:
+        """Blobs with min_area < area < max_area, largest first"""
+        if self.method(name) == "contours":
+            found = []
+            for c in self.contours(name):
+                area = cv2.contourArea(c)
+                if min_area < area < max_area:
+                    found.append(_blob(c, area))
+            found.sort(key=lambda blob: blob.area, reverse=True)
+            return found
+        areas, bboxes, centroids = self.components(name)
+        keep = np.flatnonzero((areas > min_area) & (areas < max_area))
+        keep = keep[np.argsort(-areas[keep], kind="stable")]
+        return [_component(areas, bboxes, centroids, i) for i in keep]
+
+    def largest(self, name: str, min_area: float = 0, max_area: float = float("inf")) -> Optional[Blob]:
+        """Largest blob within the area limits, or None"""
+        if self.method(name) == "contours":
+            found = self.blobs(name, min_area, max_area)
+            return found[0] if found else None
+        areas, bboxes, centroids = self.components(name)
+        qualifying = np.where((areas > min_area) & (areas < max_area), areas, -1)
+        if not len(qualifying):
+            return None
+        i = int(np.argmax(qualifying))
+        return _component(areas, bboxes, centroids, i) if qualifying[i] >= 0 else None
+
+
+def _fragmented(mask: np.ndarray) -> bool:
+    """Whether a mask has more than FRAGMENTED_RUNS runs per row on average (two edges per run)"""
+    edges = cv2.countNonZero(cv2.compare(mask[:, 1:], mask[:, :-1], cv2.CMP_NE))
+    return edges > 2 * FRAGMENTED_RUNS * mask.shape[0]
+
+
+def _fill_holes(mask: np.ndarray) -> np.ndarray:
+    """The mask with every background region not connected to the image border set"""
+    outside = np.zeros((mask.shape[0] + 2, mask.shape[1] + 2), np.uint8)
+    outside[1:-1, 1:-1] = mask
+    cv2.floodFill(outside, None, (0, 0), 255)  # 4-connected, as holes are for 8-connected regions
+    return cv2.bitwise_or(mask, cv2.bitwise_not(outside[1:-1, 1:-1]))
+
+
+def _component(areas: np.ndarray, bboxes: np.ndarray, centroids: np.ndarray, i: int) -> Blob:
+    x, y, w, h = (int(v) for v in bboxes[i])
+    return Blob(float(areas[i]), (x, y, w, h), (float(centroids[i][0]), float(centroids[i][1])))
+
+
+def _blob(contour: np.ndarray, area: float) -> Blob:
+    x, y, w, h = cv2.boundingRect(contour)
+    m = cv2.moments(contour)
+    if m["m00"]:
+        centroid = (m["m10"] / m["m00"], m["m01"] / m["m00"])
+    else:
+        centroid = (x + w / 2.0, y + h / 2.0)
+    return Blob(area, (x, y, w, h), centroid, contour)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""ms/frame of the shared Segmenter vs. the per-detector inRange/findContours code.
+
+Runs on stored frames (debug_1.jpg by default, or an image directory / video
+given on the command line) at 640x480 and 320x240, and checks that both
+paths reach the same box and ball decisions on every frame.
+
+Usage: python3 segmentation_benchmark.py [image_dir|video|image] [repeats]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("HOPE_HAL", "sim")  # take_potato opens GPIO at import
+
+import cv2
+import numpy as np
+
+from camera_service import IMAGE_EXTENSIONS
+from find_box_color import (BLUE_LOWER, BLUE_UPPER, BOX_SEGMENTER, MAX_BOX_AREA, MIN_BOX_AREA,
+                            RED_LOWER1, RED_LOWER2, RED_UPPER1, RED_UPPER2)
+from segmentation import Segmenter
+from take_potato import BALL_SEGMENTER, MAX_BALL_AREA, MIN_BALL_AREA, ORANGE_LOWER, ORANGE_UPPER
+
+RESOLUTIONS = [(640, 480), (320, 240)]
+
+
+def load_frames(spec):
+    """Stored frames from an image, an image directory or a video"""
+    if os.path.isdir(spec):
+        paths = sorted(os.path.join(spec, n) for n in os.listdir(spec) if n.lower().endswith(IMAGE_EXTENSIONS))
+        return [f for f in (cv2.imread(p) for p in paths) if f is not None]
+    if spec.lower().endswith(IMAGE_EXTENSIONS):
+        return [cv2.imread(spec)]
+    cap = cv2.VideoCapture(spec)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def any_contour_in(mask, min_area, max_area):
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for c in contours:
+        if min_area < cv2.contourArea(c) < max_area:
+            return True
+    return False
+
+
+def legacy_frame(frame, min_box, min_ball):
+    """Box and ball decisions the way detect_boxes / detect_ball_color did them"""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    red_mask = cv2.inRange(hsv, RED_LOWER1, RED_UPPER1) | cv2.inRange(hsv, RED_LOWER2, RED_UPPER2)
+    blue_mask = cv2.inRange(hsv, BLUE_LOWER, BLUE_UPPER)
+    red = any_contour_in(red_mask, min_box, MAX_BOX_AREA)
+    blue = any_contour_in(blue_mask, min_box, MAX_BOX_AREA)
+
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)  # detect_ball_color converts again
+    orange_mask = cv2.inRange(hsv, np.array(ORANGE_LOWER), np.array(ORANGE_UPPER))
+    orange = any_contour_in(orange_mask, min_ball, MAX_BALL_AREA)
+    return red, blue, orange
+
+
+def engine_frame(frame, segmenter, min_box, min_ball):
+    """Same decisions from a single Segmenter pass"""
+    segmentation = segmenter.segment(frame)
+    return (segmentation.largest("red", min_box, MAX_BOX_AREA) is not None,
+            segmentation.largest("blue", min_box, MAX_BOX_AREA) is not None,
+            segmentation.largest("orange", min_ball, MAX_BALL_AREA) is not None)
+
+
+def time_per_frame(fn, frames, repeats):
+    start = time.perf_counter()
+    results = []
+    for _ in range(repeats):
+        results = [fn(frame) for frame in frames]
+    return (time.perf_counter() - start) * 1000 / (repeats * len(frames)), results
+
+
+def main():
+    spec = sys.argv[1] if len(sys.argv) > 1 else "debug_1.jpg"
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    frames = load_frames(spec)
+    if not frames:
+        print(f"No frames in {spec}")
+        sys.exit(1)
+
+    # All classes the vision tasks use, classified together
+    segmenter = Segmenter(BOX_SEGMENTER.classes + BALL_SEGMENTER.classes)
+
+    print(f"{len(frames)} frame(s) from {spec}")
+    print(f"{'resolution':<12}{'legacy ms':>12}{'engine ms':>12}{'same result':>14}")
+    for width, height in RESOLUTIONS:
+        scaled = [cv2.resize(f, (width, height), interpolation=cv2.INTER_AREA) for f in frames]
+        # Area limits are in pixels, so scale them with the frame
+        scale = (width * height) / (640 * 480)
+        min_box, min_ball = MIN_BOX_AREA * scale, MIN_BALL_AREA * scale
+        legacy_ms, legacy = time_per_frame(lambda f: legacy_frame(f, min_box, min_ball), scaled, repeats)
+        engine_ms, engine = time_per_frame(lambda f: engine_frame(f, segmenter, min_box, min_ball), scaled, repeats)
+        print(f"{width}x{height:<8}{legacy_ms:>12.3f}{engine_ms:>12.3f}{str(legacy == engine):>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Command latency and throughput over a virtual serial pair (pty), no ESP32 needed.
+
+Compares the reader-thread loop in raspi.py with the old in_waiting + 100 ms
+sleep poll, checks that STATUS is answered while a long task is running, and
+measures plain-text vs. framed commands, including a pipelined batch of
+framed commands sent in a single write. Tasks are stubbed so only the serial
+path is measured.
+
+Usage: python3 serial_benchmark.py [commands]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+import tty
+
+import serial
+
+from protocol import decode_frame, encode_frame
+from raspi import RaspberryPiController
+
+
+class LegacyPollController(RaspberryPiController):
+    """The pre-reader-thread loop: poll in_waiting, then sleep 100 ms"""
+
+    def attach_serial(self, ser):
+        self.ser = ser
+
+    def send_response(self, message):
+        self.ser.write(f"{message}\n".encode())
+
+    def process_commands(self):
+        while not self._stopping.is_set():
+            if self.ser.in_waiting > 0:
+                line = self.ser.readline().decode('utf-8').strip()
+                if line:
+                    self.process_line(line)
+            time.sleep(0.1)
+
+
+def open_pty_pair():
+    """Return (esp_fd, controller_port): the ESP32 end as a raw fd and a pyserial port"""
+    esp_fd, ctrl_fd = os.openpty()
+    tty.setraw(esp_fd)
+    tty.setraw(ctrl_fd)
+    port = serial.Serial(os.ttyname(ctrl_fd), 115200, timeout=1)
+    return esp_fd, port
+
+
+def read_reply(fd, buffer):
+    """Read from the ESP32 end until one full line is available"""
+    while b"\n" not in buffer:
+        buffer += os.read(fd, 256)
+    line, _, rest = buffer.partition(b"\n")
+    return line.decode(), rest
+
+
+def start_controller(cls, tasks):
+    esp_fd, port = open_pty_pair()
+    controller = cls(use_subprocess=True, connect=False)
+    controller.tasks = tasks
+    controller.attach_serial(port)
+    thread = threading.Thread(target=controller.process_commands, daemon=True)
+    thread.start()
+    return controller, esp_fd, thread
+
+
+def round_trips(cls, command, count, tasks):
+    """Latency in ms from writing `command` to reading its reply"""
+    controller, esp_fd, thread = start_controller(cls, tasks)
+    buffer = b""
+    samples = []
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            os.write(esp_fd, f"{command}\n".encode())
+            _, buffer = read_reply(esp_fd, buffer)
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        controller.stop()
+        thread.join(timeout=2)
+        controller.close_serial()
+        os.close(esp_fd)
+    return samples
+
+
+def framed_pipeline(count, tasks):
+    """Send `count` framed commands in one write; return (total ms, replies matched by seq)"""
+    controller, esp_fd, thread = start_controller(RaspberryPiController, tasks)
+    buffer = b""
+    batch = "".join(encode_frame(seq, "FIND_BOX_COLOR") + "\n" for seq in range(count))
+    matched = 0
+    try:
+        start = time.perf_counter()
+        os.write(esp_fd, batch.encode())
+        for expected_seq in range(count):
+            reply, buffer = read_reply(esp_fd, buffer)
+            request = decode_frame(reply)  # raises on CRC errors
+            matched += request.seq == expected_seq and request.payload == "RESULT:1"
+        total_ms = (time.perf_counter() - start) * 1000
+    finally:
+        controller.stop()
+        thread.join(timeout=2)
+        controller.close_serial()
+        os.close(esp_fd)
+    return total_ms, matched
+
+
+def status_during_task(task_seconds=1.0):
+    """Send a long command, then STATUS; return (status reply, its latency ms)"""
+    tasks = {"take_potato.py": lambda: time.sleep(task_seconds)}
+    controller, esp_fd, thread = start_controller(RaspberryPiController, tasks)
+    buffer = b""
+    try:
+        os.write(esp_fd, b"TAKE_POTATO\n")
+        time.sleep(0.1)
+        start = time.perf_counter()
+        os.write(esp_fd, b"STATUS\n")
+        reply, buffer = read_reply(esp_fd, buffer)
+        latency = (time.perf_counter() - start) * 1000
+        read_reply(esp_fd, buffer)  # the task's own OK
+    finally:
+        controller.stop()
+        thread.join(timeout=2)
+        controller.close_serial()
+        os.close(esp_fd)
+    return reply, latency
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tasks = {"find_box_color.py": lambda: "1"}
+
+    # Keep the controller's per-command logging out of the report
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        legacy = round_trips(LegacyPollController, "FIND_BOX_COLOR", count, tasks)
+        threaded = round_trips(RaspberryPiController, "FIND_BOX_COLOR", count, tasks)
+        framed = round_trips(RaspberryPiController, encode_frame(1, "FIND_BOX_COLOR"), count, tasks)
+        pipeline_ms, matched = framed_pipeline(count, tasks)
+        status_reply, status_ms = status_during_task()
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    print(f"{'mode':<22}{'p50 ms':>10}{'max ms':>10}{'cmds/s':>10}")
+    for name, samples in (("poll + sleep", legacy), ("reader thread, plain", threaded),
+                          ("reader thread, framed", framed)):
+        rate = 1000 * len(samples) / sum(samples)
+        print(f"{name:<22}{statistics.median(samples):>10.2f}{max(samples):>10.2f}{rate:>10.0f}")
+    print(f"{'framed, pipelined':<22}{pipeline_ms / count:>10.2f}{'':>10}{1000 * count / pipeline_ms:>10.0f}"
+          f"  ({matched}/{count} replies matched by seq)")
+    print(f"STATUS during a running task: {status_reply!r} in {status_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
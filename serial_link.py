@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Event-driven serial link to the ESP32.
+
+A reader thread blocks in readline() and hands each line over the moment it
+arrives, so the controller never sleeps between polls and can keep talking to
+the ESP32 (status pings, heartbeats) while a task is running on another thread.
+"""
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import serial
+
+
+class SerialLink:
+    """Reader thread + write lock around an open serial.Serial.
+
+    on_line(line) is called on the reader thread for every line; returning True
+    marks the line as handled (e.g. a status ping) and keeps it out of the
+    command queue. Everything else is queued for get_line().
+    """
+
+    def __init__(self, ser: serial.Serial, on_line: Optional[Callable[[str], bool]] = None,
+                 status: Optional[Callable[[], Optional[str]]] = None,
+                 heartbeat_interval: float = 0.0):
+        self.ser = ser
+        self.on_line = on_line
+        self.status = status
+        self.heartbeat_interval = heartbeat_interval
+        self.lines: "queue.Queue[Tuple[str, float]]" = queue.Queue()  # (line, perf_counter at arrival)
+        self.received_at = 0.0  # arrival time of the line last returned by get_line()
+        self.error: Optional[Exception] = None
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        """Start the reader (and heartbeat, if enabled) threads"""
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._read_loop, name="serial-reader", daemon=True)]
+        if self.heartbeat_interval > 0 and self.status is not None:
+            self._threads.append(threading.Thread(target=self._heartbeat_loop, name="serial-heartbeat", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop the threads; readline() returns within the port timeout"""
+        self._stop.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2.0)
+        self._threads = []
+
+    @property
+    def alive(self) -> bool:
+        return self.error is None and bool(self._threads) and self._threads[0].is_alive()
+
+    def get_line(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Next queued command line, or None if none arrives within `timeout`"""
+        try:
+            line, self.received_at = self.lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return line
+
+    def write(self, message: str) -> None:
+        """Send one newline-terminated message; safe to call from any thread"""
+        with self._write_lock:
+            self.ser.write(f"{message}\n".encode())
+
+    def _read_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                raw = self.ser.readline()
+            except (serial.SerialException, OSError, TypeError) as exc:
+                # TypeError: pyserial's readline on a port closed from another thread
+                if not self._stop.is_set():
+                    self.error = exc
+                return
+            if not raw:
+                continue  # read timeout, check for stop
+            received_at = time.perf_counter()
+
+            try:
+                line = raw.decode('utf-8').strip()
+            except UnicodeDecodeError:
+                print("Received malformed data", file=sys.stderr)
+                continue
+            if not line:
+                continue
+
+            try:
+                handled = self.on_line is not None and self.on_line(line)
+            except Exception as exc:
+                print(f"Error handling {line!r}: {exc}", file=sys.stderr)
+                handled = False
+            if not handled:
+                self.lines.put((line, received_at))
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval):
+            message = self.status()
+            if message is None:
+                continue
+            try:
+                self.write(message)
+            except Exception as exc:
+                self.error = exc
+                return
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Last commanded servo angles, kept in memory and in a small JSON snapshot.
+
+The PCA9685 has no position feedback, so a fresh process used to start every
+move from 0 and re-command the gates on every run. PCA9685 seeds its angles
+from this store and records every flush here; the snapshot is written when a
+move or gate command completes, so it survives task and process restarts:
+
+    {"saved": 1760000000.0, "devices": {"64": {"13": 60.0, "14": 7.0, "15": 13.0}}, "moving": []}
+
+The snapshot is only trusted while the chip keeps its configuration (see
+PCA9685.configured); after a power cycle the device's entry is dropped. A
+device is listed under "moving" (and saved at once) from its first write of a
+move until the move completes, so if the process dies mid-move its angles are
+not trusted on the next start: they load as unknown and the arm homes slowly.
+"""
+import json
+import os
+import time
+from typing import Dict, Optional, Set
+
+STATE_FILE = os.environ.get("SERVO_STATE_FILE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "servo_state.json"))
+
+
+class ServoState:
+    """Commanded angle per (I2C address, channel), persisted on save()"""
+
+    def __init__(self, path: Optional[str] = STATE_FILE):
+        self.path = path
+        self.devices: Dict[int, Dict[int, float]] = {}
+        self.moving: Set[int] = set()  # addresses with a move under way
+        self._dirty = False
+        self.load()
+
+    def load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+            self.devices = {int(address): {int(ch): float(angle) for ch, angle in channels.items()}
+                            for address, channels in snapshot.get("devices", {}).items()}
+            for address in snapshot.get("moving", []):
+                if self.devices.pop(int(address), None):
+                    print(f"Servo state of device {address} was saved mid-move, position unknown")
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            print(f"Ignoring unreadable servo state {self.path}: {e}")
+            self.devices = {}
+
+    def angles(self, address: int) -> Dict[int, float]:
+        """Known angles of one device, {channel: angle}"""
+        return dict(self.devices.get(address, {}))
+
+    def update(self, address: int, channel: int, angle: Optional[float]) -> None:
+        """Record a commanded angle (None: released, position unknown)"""
+        channels = self.devices.setdefault(address, {})
+        if angle is None:
+            if channels.pop(channel, None) is not None:
+                self._dirty = True
+        elif channels.get(channel) != angle:
+            channels[channel] = angle
+            self._dirty = True
+
+    def begin_move(self, address: int) -> None:
+        """Mark a device as moving and save that at once (its angles are stale until save())"""
+        if address not in self.moving:
+            self.moving.add(address)
+            self._write()
+
+    def forget(self, address: int) -> None:
+        """Drop everything known about a device (e.g. it lost power)"""
+        if self.devices.pop(address, None):
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the snapshot if anything changed (atomic replace); moves are complete"""
+        if self.moving:
+            self.moving.clear()
+            self._dirty = True
+        if self._dirty:
+            self._write()
+
+    def _write(self) -> None:
+        if self.path is None:
+            return
+        snapshot = {"saved": time.time(),
+                    "devices": {str(address): {str(ch): angle for ch, angle in sorted(channels.items())}
+                                for address, channels in self.devices.items()},
+                    "moving": sorted(self.moving)}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Could not save servo state to {self.path}: {e}")
+
+
+_STATE: Optional[ServoState] = None
+
+
+def get_state() -> ServoState:
+    """The process-wide ServoState, loaded from STATE_FILE on first use"""
+    global _STATE
+    if _STATE is None:
+        _STATE = ServoState()
+    return _STATE
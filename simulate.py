@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Run the whole command loop of raspi.py on the simulated HAL, faster than real time.
+
+The controller connects to the simulated ESP32 port, loads the tasks
+in-process and answers commands sent through the other end of the link. Arm
+moves, suction and gate waits run on the virtual clock; vision runs for real
+on a recorded camera source (--camera), or on no camera at all. For every
+command this prints the reply, the virtual (robot) time and the wall time.
+
+Usage: python3 simulate.py [--camera video|image_dir] [--repeat N] [COMMAND ...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Keep the simulated servo angles out of the real snapshot; servo_state reads this at import
+os.environ.setdefault("SERVO_STATE_FILE", os.path.join(tempfile.mkdtemp(prefix="hope_sim_"), "servo_state.json"))
+
+import hal
+from hal import sim
+
+DEFAULT_COMMANDS = ["PING", "OPEN_GATE:1", "TAKE_POTATO", "OPEN_GATE:0", "FIND_BOX_COLOR", "IS_RED_GOOD",
+                    "PLAY_STARMAN", "STATUS"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("commands", nargs="*", default=DEFAULT_COMMANDS)
+    parser.add_argument("--camera", help="Recorded video file or image directory for the shared camera")
+    parser.add_argument("--repeat", type=int, default=1, help="Send the command list this many times")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Wall seconds to wait for each reply")
+    parser.add_argument("--verbose", action="store_true", help="Show the controller's and tasks' output")
+    args = parser.parse_args()
+
+    hal.use("sim")
+    from raspi import RaspberryPiController
+
+    real_stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+    try:
+        controller = RaspberryPiController(camera_source=args.camera)
+        loop = threading.Thread(target=controller.process_commands, name="command-loop", daemon=True)
+        loop.start()
+        esp = sim.esp()
+
+        rows = []
+        for _ in range(args.repeat):
+            for command in args.commands:
+                virtual, wall = hal.clock(), time.perf_counter()
+                esp.write(f"{command}\n".encode())
+                reply = esp.readline(timeout=args.timeout).decode().strip() or "(no reply)"
+                while reply.startswith("BUSY:"):  # heartbeats
+                    reply = esp.readline(timeout=args.timeout).decode().strip() or "(no reply)"
+                rows.append((command, reply, hal.clock() - virtual, time.perf_counter() - wall))
+        controller.stop()
+        loop.join(timeout=5.0)
+        controller.stop_camera()
+        controller.close_serial()
+    finally:
+        if sys.stdout is not real_stdout:
+            sys.stdout.close()
+            sys.stdout, sys.stderr = real_stdout, sys.__stderr__
+
+    print(f"{'command':<16}{'reply':<22}{'robot s':>9}{'wall ms':>10}")
+    for command, reply, virtual, wall in rows:
+        print(f"{command:<16}{reply[:21]:<22}{virtual:>9.2f}{wall * 1000:>10.1f}")
+    robot = sum(row[2] for row in rows)
+    wall = sum(row[3] for row in rows)
+    print(f"total: {robot:.2f} robot s in {wall:.2f} wall s ({robot / max(wall, 1e-9):.0f}x real time)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Speculative detection: run a command's detector on the shared camera before the
+ESP32 asks, and keep its answers in a freshness-bounded cache.
+
+With raspi.py --speculate the controller starts a Speculator for a command
+when the ESP32 sends HINT:<command>, or when the command before it in
+raspi.SPECULATE_NEXT is done. The speculator votes on the shared camera's
+frames with the task's own policy and label function and caches every
+settled decision with its time and confidence. When the command arrives
+its task asks the cache first: an entry younger than the target's TTL is
+the answer, anything else falls back to detecting on demand.
+
+    hit = get_cache().lookup("box")   # Hit(decision, age) or None
+    print(get_cache().stats())        # what STATS:CACHE answers
+"""
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from cancellation import CancelToken, active
+from decision import Decision, DecisionPolicy
+from pipeline import background
+from telemetry import attributed
+
+SPECULATE_FOR = 20.0  # s a speculator runs after its hint unless the command arrives first
+STOP_WAIT = 1.0  # s stop() waits for the worker to finish its frame
+
+# label(frame, native) -> label, or None when the frame says nothing (not voted)
+Labeler = Callable[[Any, bool], Any]
+
+
+class Target(NamedTuple):
+    """What to detect in the background for one command"""
+    key: str  # cache key the task looks up
+    ttl: float  # s a settled decision stays a valid answer
+    setup: Callable[[], Tuple[DecisionPolicy, str, Labeler]]  # -> (policy, camera view, labeler)
+    cache_absent: bool  # whether the policy's "nothing seen" label is an answer too
+
+
+def _box():
+    from find_box_color import BOX_CAPTURE, BOX_HALF_MODE, BOX_POLICY, box_label
+    return BOX_POLICY, BOX_CAPTURE.view, lambda frame, native: box_label(frame, BOX_HALF_MODE if native else None)
+
+
+def _ball():
+    from take_potato import BALL_CAPTURE, BALL_HALF_MODE, BALL_POLICY, ball_label
+    return BALL_POLICY, BALL_CAPTURE.view, lambda frame, native: ball_label(frame, BALL_HALF_MODE if native else None)
+
+
+def _tag():
+    from is_red_good import TAG_CAPTURE, TAG_POLICY, TAG_ROI, TAG_SCALES, TAG_SWEEP, tag_value
+    from roi import crop
+    from tag_detector import detect
+    from temporal import TemporalFilter
+    denoise = TemporalFilter(depth=3, mode="median")
+
+    def label(frame, native):
+        gray = denoise(crop(frame, TAG_ROI)[0])
+        if gray is None:
+            return None
+        tags = detect(gray, scales=TAG_SCALES, sweep=TAG_SWEEP)
+        return tag_value(tags[0]) if tags else None
+    return TAG_POLICY, TAG_CAPTURE.view, label
+
+
+# Command -> background detection. "No box" is not cached: the box may still come
+# into view; "white" (no orange) is the ball's answer and is.
+TARGETS: Dict[str, Target] = {
+    "FIND_BOX_COLOR": Target("box", 2.0, _box, False),
+    "TAKE_POTATO": Target("ball", 2.0, _ball, True),
+    "IS_RED_GOOD": Target("tag", 2.0, _tag, False),
+}
+
+
+class Hit(NamedTuple):
+    decision: Decision
+    age: float  # s since the decision settled
+
+
+class ResultCache:
+    """Newest settled decision per key, served while younger than the key's TTL"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.enabled = False  # lookups return None (uncounted) until the controller enables speculation
+        self.ttl: Dict[str, float] = {target.key: target.ttl for target in TARGETS.values()}
+        self.entries: Dict[str, Tuple[Decision, float]] = {}
+        self.hits = 0
+        self.misses = 0  # nothing cached
+        self.stale = 0  # cached, but older than the TTL
+        self.puts = 0
+        self._lock = threading.Lock()
+
+    def put(self, key: str, decision: Decision) -> None:
+        with self._lock:
+            self.entries[key] = (decision, self.clock())
+            self.puts += 1
+
+    def lookup(self, key: str) -> Optional[Hit]:
+        """The cached decision if it is fresh enough, None to detect on demand"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            decision, at = entry
+            age = self.clock() - at
+            if age > self.ttl.get(key, 0.0):
+                self.stale += 1
+                return None
+            self.hits += 1
+            return Hit(decision, age)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one key's entry (all with None)"""
+        with self._lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses + self.stale
+        rate = self.hits / lookups if lookups else 0.0
+        return f"hits={self.hits} misses={self.misses} stale={self.stale} hit_rate={rate:.2f} cached={self.puts}"
+
+
+_CACHE = ResultCache()
+
+
+def get_cache() -> ResultCache:
+    """The process-wide cache the tasks look up"""
+    return _CACHE
+
+
+class Speculator:
+    """Background detection for one command at a time on the shared camera"""
+
+    def __init__(self, camera, cache: Optional[ResultCache] = None, duration: float = SPECULATE_FOR,
+                 clock=time.monotonic):
+        self.camera = camera
+        self.cache = cache if cache is not None else get_cache()
+        self.duration = duration
+        self.clock = clock
+        self.command: Optional[str] = None
+        self.until = 0.0
+        self.rounds = 0  # votes finished, settled or not
+        self._token: Optional[CancelToken] = None
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        future = self._future
+        return future is not None and not future.done()
+
+    def start(self, command: str) -> bool:
+        """Speculate for `command` (replacing any other); False if it has no background detector"""
+        target = TARGETS.get(command)
+        if target is None or self.camera is None:
+            return False
+        with self._lock:
+            self.until = self.clock() + self.duration
+            if self.command == command and self.running:
+                return True  # already on it: the hint only extends the time
+            if self._token is not None:
+                self._token.cancel("replaced")
+            self.command = command
+            self._token = CancelToken()
+            self._future = background(f"speculate {command}", self._run, target, self._token)
+        return True
+
+    def stop(self, command: Optional[str] = None, timeout: float = STOP_WAIT) -> None:
+        """Stop speculating (only if it is for `command`, when given) and wait up to `timeout` s
+        for the worker to leave its detector, which the foreground task is about to use"""
+        with self._lock:
+            if self._token is None or (command is not None and command != self.command):
+                return
+            self._token.cancel("stop")
+            self._token = None
+            self.command = None
+            future = self._future
+        if future is not None and not wait([future], timeout=timeout).done:
+            print(f"Speculative detection did not stop within {timeout:g} s")
+
+    def _run(self, target: Target, token: CancelToken) -> None:
+        from native_capture import read_view
+        with active(token), attributed("SPECULATE"):
+            try:
+                policy, view, label = target.setup()
+                cap = self.camera.capture()
+                vote = policy.start(self.clock)
+                while not token.cancelled and self.clock() < self.until:
+                    ret, frame, native = read_view(cap, view)
+                    if not ret:
+                        continue
+                    value = label(frame, native)
+                    if value is not None:
+                        vote.add(value)
+                    if vote.done:
+                        decision = vote.decision()
+                        if decision.settled and (target.cache_absent or decision.value != policy.absent):
+                            self.cache.put(target.key, decision)
+                        self.rounds += 1
+                        vote = policy.start(self.clock)
+            except Exception as exc:
+                print(f"Speculative {target.key} detection failed: {exc}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Reply latency of the vision commands with and without speculative detection,
+on the simulated HAL with a recorded camera.
+
+Runs raspi.py's controller in-process with --speculate on frames showing a
+red box and an AprilTag, and times FIND_BOX_COLOR and IS_RED_GOOD:
+
+  on demand   no hint: the task detects when asked (cache miss)
+  hinted      HINT:<command> --lead s before the command (cache hit)
+  next        IS_RED_GOOD started by SPECULATE_NEXT when FIND_BOX_COLOR is done
+  stale       speculation moved on to another command TTL + 0.5 s before (stale entry)
+
+Replies must be the same in every mode. Ends with the STATS:CACHE counters.
+
+Usage: python3 speculation_benchmark.py [--lead S] [--repeat N] [--verbose]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Keep the simulated servo angles out of the real snapshot; servo_state reads this at import
+WORK = tempfile.mkdtemp(prefix="hope_speculate_")
+os.environ.setdefault("SERVO_STATE_FILE", os.path.join(WORK, "servo_state.json"))
+
+import hal
+from hal import sim
+
+
+def make_frames(directory, count=5):
+    """A red box on gray with an even-ID (good) AprilTag 16h5 in the corner"""
+    tag = cv2.aruco.generateImageMarker(cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_16h5), 4, 120)
+    tag = cv2.copyMakeBorder(tag, 20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+    for i in range(count):
+        frame = np.full((480, 640, 3), 110, np.uint8)
+        cv2.rectangle(frame, (60 + 2 * i, 160), (320 + 2 * i, 400), (30, 30, 200), -1)
+        frame[20:20 + tag.shape[0], 460:460 + tag.shape[1]] = tag[:, :, None]
+        cv2.imwrite(os.path.join(directory, f"{i:03d}.png"), frame)
+
+
+def send(esp, command, timeout=30.0):
+    """Write a command; returns (reply, ms), skipping heartbeats"""
+    start = time.perf_counter()
+    esp.write(f"{command}\n".encode())
+    reply = ""
+    while not reply or reply.startswith("BUSY:"):
+        reply = esp.readline(timeout=timeout).decode().strip()
+        if not reply:
+            return "(no reply)", (time.perf_counter() - start) * 1000
+    return reply, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lead", type=float, default=0.5, help="Seconds between a hint and its command")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true", help="Show the controller's and tasks' output")
+    args = parser.parse_args()
+
+    hal.use("sim")
+    sim.clock, sim.sleep = time.perf_counter, time.sleep  # the camera plays in real time
+    frames = os.path.join(WORK, "frames")
+    os.makedirs(frames)
+    make_frames(frames)
+    os.chdir(WORK)  # is_red_good's debug images
+
+    from speculation import TARGETS
+    from raspi import RaspberryPiController
+
+    real_stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+    rows = {}
+    try:
+        controller = RaspberryPiController(camera_source=frames, speculate=True)
+        threading.Thread(target=controller.process_commands, name="command-loop", daemon=True).start()
+        esp = sim.esp()
+
+        def timed(mode, command):
+            rows.setdefault((mode, command), []).append(send(esp, command))
+
+        for _ in range(args.repeat):
+            controller.speculator.stop()
+            time.sleep(max(target.ttl for target in TARGETS.values()) + 0.5)  # let earlier entries go stale
+            send(esp, "HINT:PLAY_STARMAN")  # nothing to speculate: leaves the cache alone
+            timed("on demand", "FIND_BOX_COLOR")
+            controller.speculator.stop()
+            timed("on demand", "IS_RED_GOOD")
+
+            send(esp, "HINT:FIND_BOX_COLOR")
+            time.sleep(args.lead)
+            timed("hinted", "FIND_BOX_COLOR")
+            time.sleep(args.lead)  # IS_RED_GOOD speculated via SPECULATE_NEXT
+            timed("next", "IS_RED_GOOD")
+
+            send(esp, "HINT:FIND_BOX_COLOR")
+            time.sleep(args.lead)
+            send(esp, "HINT:IS_RED_GOOD")  # replaces the box speculation
+            time.sleep(TARGETS["FIND_BOX_COLOR"].ttl + 0.5)
+            timed("stale", "FIND_BOX_COLOR")
+        stats, _ = send(esp, "STATS:CACHE")
+
+        controller.stop()
+        controller.stop_camera()
+        controller.close_serial()
+    finally:
+        if sys.stdout is not real_stdout:
+            sys.stdout.close()
+            sys.stdout, sys.stderr = real_stdout, sys.__stderr__
+
+    print(f"{'mode':<11}{'command':<16}{'replies':<16}{'p50 ms':>9}{'max ms':>9}")
+    replies = {}
+    for (mode, command), results in rows.items():
+        seen = sorted({reply for reply, _ in results})
+        replies.setdefault(command, set()).update(seen)
+        times = [ms for _, ms in results]
+        print(f"{mode:<11}{command:<16}{','.join(seen)[:15]:<16}{statistics.median(times):>9.1f}{max(times):>9.1f}")
+    print("replies identical in every mode: " + str(all(len(seen) == 1 for seen in replies.values())))
+    print(stats)
+
+
+if __name__ == '__main__':
+    main()
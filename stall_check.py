@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Worst-case reply latency of raspi.py when tasks hang, on the simulated HAL.
+
+Runs the controller in-process on hal/sim.py with real time and short
+command deadlines, injects stalls through the simulated hardware
+(sim.stall(): a camera whose reads hang, an I2C bus whose writes hang) and
+a subprocess script that never exits, and checks that every command is
+still answered within its deadline plus cancellation.CANCEL_GRACE, with the
+expected (partial) reply. Also checks ABORT, that PING is answered while
+a task is stuck, and that no task starts until an abandoned one has exited. Exits with status 1 if any check fails.
+
+Usage: python3 stall_check.py [--deadline S] [--verbose]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Keep the simulated servo angles out of the real snapshot; servo_state reads this at import
+WORK = tempfile.mkdtemp(prefix="hope_stall_")
+os.environ.setdefault("SERVO_STATE_FILE", os.path.join(WORK, "servo_state.json"))
+
+import hal
+from hal import sim
+
+SLACK = 0.3  # s on top of each bound: thread wake-ups, serial and log output
+
+
+def make_frames(directory):
+    """A few plain frames: no ball, no box, no tag"""
+    for i in range(3):
+        cv2.imwrite(os.path.join(directory, f"{i:03d}.png"), np.full((480, 640, 3), 128, np.uint8))
+
+
+def send(esp, command, timeout):
+    """Write a command; returns (reply, seconds), skipping heartbeats"""
+    start = time.perf_counter()
+    esp.write(f"{command}\n".encode())
+    return read(esp, timeout, start)
+
+
+def read(esp, timeout, start):
+    reply = ""
+    while not reply or reply.startswith("BUSY:"):
+        reply = esp.readline(timeout=timeout).decode().strip()
+        if not reply:
+            return "(no reply)", time.perf_counter() - start
+    return reply, time.perf_counter() - start
+
+
+def status(esp, timeout=5.0):
+    """STATUS reply as is (read() would skip a BUSY:<command> answer)"""
+    esp.write(b"STATUS\n")
+    return esp.readline(timeout=timeout).decode().strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--deadline", type=float, default=2.0, help="Deadline of every command under test, s")
+    parser.add_argument("--verbose", action="store_true", help="Show the controller's and tasks' output")
+    args = parser.parse_args()
+
+    hal.use("sim")
+    sim.clock, sim.sleep = time.perf_counter, time.sleep  # real time: deadlines are wall seconds
+    frames = os.path.join(WORK, "frames")
+    os.makedirs(frames)
+    make_frames(frames)
+    with open(os.path.join(WORK, "take_water.py"), "w") as f:
+        f.write("import time\ntime.sleep(600)\n")  # a script that never finishes
+
+    from cancellation import CANCEL_GRACE
+    from raspi import RaspberryPiController
+
+    real_stdout = sys.stdout
+    if not args.verbose:
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+    rows = []
+    try:
+        controller = RaspberryPiController(camera_source=frames)
+        for name in controller.deadlines:
+            controller.deadlines[name] = args.deadline
+        controller.deadlines["TAKE_WATER"] = args.deadline
+        threading.Thread(target=controller.process_commands, name="command-loop", daemon=True).start()
+        esp = sim.esp()
+        bound = args.deadline + CANCEL_GRACE + SLACK
+
+        def check(scenario, command, expect, limit=bound, timeout=30.0):
+            reply, seconds = send(esp, command, timeout)
+            rows.append((scenario, command, reply, seconds, limit, reply.startswith(expect) and seconds <= limit))
+
+        # ABORT while the arm is moving: the task stops at its next check
+        esp.write(b"TAKE_POTATO\n")
+        time.sleep(0.5)
+        abort_sent = time.perf_counter()
+        esp.write(b"ABORT\n")
+        replies = [read(esp, 30.0, abort_sent) for _ in range(2)]
+        ack = next((r for r in replies if r[0] == "OK"), ("(no reply)", 0.0))
+        task = next((r for r in replies if r[0] != "OK"), ("(no reply)", 0.0))
+        rows.append(("abort, ack", "ABORT", ack[0], ack[1], SLACK, ack[0] == "OK" and ack[1] <= SLACK))
+        rows.append(("abort, task reply", "TAKE_POTATO", task[0], task[1], CANCEL_GRACE + SLACK,
+                     task[0] == "ERROR: abort" and task[1] <= CANCEL_GRACE + SLACK))
+        check("abort while idle", "ABORT", "IDLE", SLACK)
+
+        # A cycle longer than its deadline (no stall): cancelled mid-move
+        check("slow task", "TAKE_POTATO", "ERROR: timeout")
+
+        # Camera reads hang: the vision loops give up at the deadline with their best guess
+        sim.stall("camera", 3 * args.deadline)
+        check("camera stalled", "FIND_BOX_COLOR", "RESULT:-1")
+        check("camera stalled", "IS_RED_GOOD", "RESULT:false")
+        sim.stall("camera", 0)
+
+        # A script that never exits is killed
+        cwd = os.getcwd()
+        os.chdir(WORK)
+        try:
+            check("script hangs", "TAKE_WATER", "ERROR: timeout")
+        finally:
+            os.chdir(cwd)
+
+        # I2C writes hang inside a driver call: the task is abandoned, PING still answers
+        sim.stall("i2c", 4 * args.deadline)
+        sent = time.perf_counter()
+        esp.write(b"TAKE_POTATO\n")
+        time.sleep(0.5)
+        ping, ping_s = send(esp, "PING", 5.0)
+        rows.append(("i2c stalled, PING", "PING", ping, ping_s, SLACK, ping == "PONG" and ping_s <= SLACK))
+        reply, seconds = read(esp, 30.0, sent)
+        rows.append(("i2c stalled", "TAKE_POTATO", reply, seconds, bound, reply == "ERROR: timeout" and seconds <= bound))
+        sim.stall("i2c", 0)
+        # The abandoned task is still inside its write: no second task on the hardware until it exits
+        check("task abandoned", "OPEN_GATE:1", "ERROR: busy", SLACK)
+        start = time.perf_counter()
+        busy = status(esp)
+        rows.append(("task abandoned", "STATUS", busy, time.perf_counter() - start, SLACK,
+                     busy == "BUSY:TAKE_POTATO" and time.perf_counter() - start <= SLACK))
+        released = time.perf_counter() + 4 * args.deadline + SLACK
+        while status(esp) != "IDLE" and time.perf_counter() < released:
+            time.sleep(0.1)
+        check("task exited", "OPEN_GATE:1", "OK")
+
+        controller.stop()
+        controller.stop_camera()
+        controller.close_serial()
+    finally:
+        if sys.stdout is not real_stdout:
+            sys.stdout.close()
+            sys.stdout, sys.stderr = real_stdout, sys.__stderr__
+
+    print(f"deadline {args.deadline:g} s, grace {CANCEL_GRACE:g} s")
+    print(f"{'scenario':<20}{'command':<16}{'reply':<18}{'reply s':>9}{'bound s':>9}  ok")
+    for scenario, command, reply, seconds, limit, ok in rows:
+        print(f"{scenario:<20}{command:<16}{reply[:17]:<18}{seconds:>9.2f}{limit:>9.2f}  {'yes' if ok else 'NO'}")
+    worst = max(row[3] for row in rows)
+    print(f"worst-case reply latency {worst:.2f} s")
+    sys.exit(0 if all(row[5] for row in rows) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Start-up profile of raspi.py: import-time breakdown and time to first command.
+
+1. Imports: `python3 -X importtime` of raspi.py and the in-process task
+   modules in a fresh interpreter; cumulative ms of each of them and of the
+   heavy libraries, counted where they are first pulled in.
+2. Boot: fresh interpreters start a RaspberryPiController on the simulated
+   HAL (hal/sim.py) with real time, so the 2 s serial handshake wait is
+   real, and the simulated ESP32 sends PING and then FIND_BOX_COLOR. Ms from
+   process spawn to connection, PING reply and first task reply, with and
+   without the pre-warm phase, plus the controller's own start-up phases.
+
+Usage: python3 startup_profile.py [--runs N] [--camera video|image_dir]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TASKS = ["raspi", "take_potato", "is_red_good", "find_box_color", "open_gate", "play_starman"]
+LIBRARIES = ["cv2", "numpy", "yaml", "serial"]
+
+
+def import_breakdown(env):
+    """{module: cumulative ms} for TASKS and LIBRARIES, where each is first imported"""
+    code = "import " + ", ".join(TASKS)
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                            capture_output=True, text=True).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        module = name.strip()
+        if module in TASKS + LIBRARIES and module not in times:
+            times[module] = int(cumulative) / 1000
+    return times
+
+
+def child(spawned, camera, prewarm):
+    """Runs in the profiled interpreter: boot the controller, time PING and the first task"""
+    import threading
+    import hal
+    from hal import sim
+    hal.use("sim")
+    sim.clock, sim.sleep = time.perf_counter, time.sleep  # real time: the handshake wait is what pre-warm hides
+    devnull = open(os.devnull, "w")
+    real_stdout, sys.stdout, sys.stderr = sys.stdout, devnull, devnull
+    from raspi import RaspberryPiController
+
+    controller = RaspberryPiController(camera_source=camera, prewarm=prewarm)
+    marks = {"connected": time.time() - spawned}
+    threading.Thread(target=controller.process_commands, daemon=True).start()
+    esp = sim.esp()
+    for mark, command in (("ping", "PING"), ("first task", "FIND_BOX_COLOR")):
+        esp.write(f"{command}\n".encode())
+        esp.readline(timeout=60)
+        marks[mark] = time.time() - spawned
+    controller.wait_until_warm()
+    controller.stop()
+    controller.stop_camera()
+    real_stdout.write(json.dumps({"marks": marks, "startup": controller.startup}) + "\n")
+    real_stdout.flush()
+    os._exit(0)  # don't wait for daemon threads
+
+
+def boot(env, camera, prewarm):
+    spawned = time.time()
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", str(spawned), "--prewarm", str(int(prewarm))]
+    if camera:
+        cmd += ["--camera", camera]
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=120).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--camera", help="Recorded video or image directory for the shared camera")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--prewarm", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        child(args.child, args.camera, bool(args.prewarm))
+        return
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, HOPE_HAL="sim", PYTHONDONTWRITEBYTECODE="1")
+    env.setdefault("SERVO_STATE_FILE", os.path.join(tempfile.mkdtemp(prefix="hope_profile_"), "servo_state.json"))
+
+    times = import_breakdown(env)
+    print("Import time, cumulative ms (fresh interpreter)")
+    for module, ms in sorted(times.items(), key=lambda item: -item[1]):
+        print(f"  {module:<28}{ms:>8.1f}")
+
+    print(f"\nTime to first command, median of {args.runs} boots (ms from process spawn)")
+    print(f"{'mode':<14}{'connected':>11}{'PING':>9}{'1st task':>10}  slowest start-up phases")
+    for prewarm in (False, True):
+        runs = [boot(env, args.camera, prewarm) for _ in range(args.runs)]
+        marks = {mark: statistics.median(run["marks"][mark] for run in runs) * 1000
+                 for mark in ("connected", "ping", "first task")}
+        phases = sorted(runs[-1]["startup"].items(), key=lambda item: -item[1])[:3]
+        print(f"{'pre-warm' if prewarm else 'sequential':<14}{marks['connected']:>11.0f}{marks['ping']:>9.0f}"
+              f"{marks['first task']:>10.0f}  " + ", ".join(f"{phase} {ms:.0f}" for phase, ms in phases))
+
+
+if __name__ == '__main__':
+    main()
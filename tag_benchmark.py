@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Per-detection cost of building the tag detector per call vs. the cached TagDetector.
+
+Old: every is_red_good attempt created DetectorParameters, the dictionary,
+ArucoDetector and CLAHE, then ran gray/blur/CLAHE into fresh arrays.
+New: tag_detector.detect() with the process-wide detector and reused buffers.
+Also reports the cost of a full SWEEP on a frame with no tag (the worst case)
+and on a frame where the base pass succeeds (early cutoff).
+
+Usage: python3 tag_benchmark.py [image_dir|image ...]
+"""
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from segmentation_benchmark import load_frames
+from tag_detector import SWEEP, TagDetector, detect
+
+TAG_SIZE = 160
+
+
+def tag_frame(tag_id=4, seed=0):
+    """640x480 gray-noise frame with one 16h5 tag (with quiet zone) near the center"""
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(90, 140, (480, 640, 3), dtype=np.uint8)
+    dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_16h5)
+    marker = cv2.aruco.generateImageMarker(dictionary, tag_id, TAG_SIZE)
+    x, y = 240, 160
+    frame[y - 20:y + TAG_SIZE + 20, x - 20:x + TAG_SIZE + 20] = 255
+    frame[y:y + TAG_SIZE, x:x + TAG_SIZE] = marker[:, :, None]
+    return frame
+
+
+def old_detect(frame):
+    params = cv2.aruco.DetectorParameters()
+    params.adaptiveThreshWinSizeMin = 3
+    params.adaptiveThreshWinSizeMax = 23
+    params.adaptiveThreshWinSizeStep = 10
+    params.adaptiveThreshConstant = 7
+    params.cornerRefinementMethod = cv2.aruco.CORNER_REFINE_SUBPIX
+    params.cornerRefinementWinSize = 5
+    params.cornerRefinementMaxIterations = 30
+    params.polygonalApproxAccuracyRate = 0.05
+    detector = cv2.aruco.ArucoDetector(cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_16h5), params)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    corners, ids, _ = detector.detectMarkers(clahe.apply(gray))
+    return [] if ids is None else [int(i[0]) for i in ids]
+
+
+def ms_per_frame(fn, frames, repeats):
+    fn(frames[0])
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for frame in frames:
+            fn(frame)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(frames))
+
+
+def main():
+    repeats = 20
+    frames = [tag_frame(tag_id, seed) for seed, tag_id in enumerate([4, 7, 10])]
+    for spec in sys.argv[1:]:
+        frames += load_frames(spec)
+    empty = [np.random.default_rng(9).integers(90, 140, (480, 640, 3), dtype=np.uint8)]
+
+    same = all(old_detect(f) == [t.id for t in detect(f)] for f in frames)
+    print(f"{len(frames)} frames, same ids as per-call detector: {same}")
+    print(f"{'':<34}{'ms/frame':>10}")
+    print(f"{'construction only':<34}{ms_per_frame(lambda f: TagDetector(), frames, repeats):>10.2f}")
+    print(f"{'per-call construction':<34}{ms_per_frame(old_detect, frames, repeats):>10.2f}")
+    print(f"{'cached detect()':<34}{ms_per_frame(detect, frames, repeats):>10.2f}")
+    print(f"{'cached + SWEEP, tag found':<34}"
+          f"{ms_per_frame(lambda f: detect(f, sweep=SWEEP), frames, repeats):>10.2f}")
+    print(f"{'cached + SWEEP, no tag':<34}"
+          f"{ms_per_frame(lambda f: detect(f, sweep=SWEEP), empty, repeats):>10.2f}")
+    print(f"{'cached + 2 scales + SWEEP, no tag':<34}"
+          f"{ms_per_frame(lambda f: detect(f, scales=(1.0, 1.5), sweep=SWEEP), empty, repeats):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
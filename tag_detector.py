@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""AprilTag 16h5 detection with detector objects built once per process.
+
+DetectorParameters, the dictionary, ArucoDetector and CLAHE are created once
+per TagConfig and cached; gray/blur/CLAHE buffers are allocated once per
+frame size and reused. is_red_good and is_red_good_debugger share
+DEFAULT_CONFIG, so the debugger shows exactly what the task sees.
+
+    tags = detect(frame)                                  # one pass
+    tags = detect(frame, scales=(1.0, 1.5), sweep=SWEEP)  # hard lighting
+
+Multi-scale and parameter-sweep passes stop at the first pass that finds a
+valid (quadrilateral) tag.
+"""
+import time
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+class TagConfig(NamedTuple):
+    dictionary: int = cv2.aruco.DICT_APRILTAG_16h5
+    adaptive_win_min: int = 3
+    adaptive_win_max: int = 23
+    adaptive_win_step: int = 10
+    adaptive_constant: float = 7.0
+    corner_refinement: int = cv2.aruco.CORNER_REFINE_SUBPIX
+    corner_win_size: int = 5
+    corner_max_iterations: int = 30
+    polygonal_approx_accuracy: float = 0.05  # more tolerant to distortion
+    blur_ksize: int = 3  # 0 disables the Gaussian blur
+    clahe_clip: float = 2.0  # 0 disables CLAHE
+    clahe_grid: int = 8
+
+
+DEFAULT_CONFIG = TagConfig()
+
+# Fallback variants for hard lighting, tried in order after DEFAULT_CONFIG
+SWEEP: Tuple[Dict, ...] = (
+    {"clahe_clip": 4.0},
+    {"adaptive_constant": 3.0, "adaptive_win_max": 53},
+    {"clahe_clip": 0.0, "blur_ksize": 0},
+)
+
+
+class Tag(NamedTuple):
+    id: int
+    corners: np.ndarray  # (4, 2) float32, frame coordinates
+    center: Tuple[float, float]
+    elapsed_ms: float  # total time spent until this tag was found
+    scale: float  # scale of the pass that found it
+    variant: int  # 0 = base config, n = SWEEP[n - 1]
+
+
+class TagDetector:
+    """One configured ArucoDetector plus reusable preprocessing buffers"""
+
+    def __init__(self, config: TagConfig = DEFAULT_CONFIG):
+        self.config = config
+        params = cv2.aruco.DetectorParameters()
+        params.adaptiveThreshWinSizeMin = config.adaptive_win_min
+        params.adaptiveThreshWinSizeMax = config.adaptive_win_max
+        params.adaptiveThreshWinSizeStep = config.adaptive_win_step
+        params.adaptiveThreshConstant = config.adaptive_constant
+        params.cornerRefinementMethod = config.corner_refinement
+        params.cornerRefinementWinSize = config.corner_win_size
+        params.cornerRefinementMaxIterations = config.corner_max_iterations
+        params.polygonalApproxAccuracyRate = config.polygonal_approx_accuracy
+        dictionary = cv2.aruco.getPredefinedDictionary(config.dictionary)
+        self.detector = cv2.aruco.ArucoDetector(dictionary, params)
+        self.clahe = cv2.createCLAHE(clipLimit=config.clahe_clip,
+                                     tileGridSize=(config.clahe_grid, config.clahe_grid)) if config.clahe_clip > 0 else None
+        self._buffers: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self.enhanced: np.ndarray = None  # last preprocessed image, for debugging
+        self.last_timing: Dict[str, float] = {}
+
+    def _buffers_for(self, shape: Tuple[int, int]):
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            buffers = tuple(np.empty(shape, dtype=np.uint8) for _ in range(3))
+            self._buffers[shape] = buffers
+        return buffers
+
+    def preprocess(self, frame: np.ndarray) -> np.ndarray:
+        """Gray -> blur -> CLAHE into reused buffers; returns the enhanced image"""
+        gray, blurred, enhanced = self._buffers_for(frame.shape[:2])
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        else:
+            gray = frame
+        k = self.config.blur_ksize
+        if k:
+            cv2.GaussianBlur(gray, (k, k), 0, dst=blurred)
+        else:
+            blurred = gray
+        if self.clahe is not None:
+            self.clahe.apply(blurred, dst=enhanced)
+        else:
+            enhanced = blurred
+        self.enhanced = enhanced
+        return enhanced
+
+    def detect_markers(self, frame: np.ndarray, scale: float = 1.0):
+        """Raw (corners, ids) at one scale, corners mapped back to frame coordinates"""
+        start = time.perf_counter()
+        if scale != 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale,
+                               interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR)
+        enhanced = self.preprocess(frame)
+        preprocessed = time.perf_counter()
+        corners, ids, _ = self.detector.detectMarkers(enhanced)
+        done = time.perf_counter()
+        self.last_timing = {"preprocess_ms": (preprocessed - start) * 1000,
+                            "detect_ms": (done - preprocessed) * 1000}
+        if scale != 1.0:
+            corners = [c / scale for c in corners]
+        return corners, ids
+
+
+def valid_tags(corners, ids) -> List[Tuple[int, np.ndarray]]:
+    """(id, (4, 2) corners) for detections whose outline is a clean quadrilateral"""
+    found = []
+    if ids is None:
+        return found
+    for i, tag_id in enumerate(ids):
+        quad = corners[i][0]
+        peri = cv2.arcLength(quad, True)
+        approx = cv2.approxPolyDP(quad, 0.04 * peri, True)
+        if len(approx) == 4:  # Only accept quadrilateral markers
+            found.append((int(tag_id[0]), quad))
+    return found
+
+
+_DETECTORS: Dict[TagConfig, TagDetector] = {}
+
+
+def get_detector(config: TagConfig = DEFAULT_CONFIG) -> TagDetector:
+    """The process-wide TagDetector for a config, built on first use"""
+    detector = _DETECTORS.get(config)
+    if detector is None:
+        detector = _DETECTORS[config] = TagDetector(config)
+    return detector
+
+
+def detect(frame: np.ndarray, config: TagConfig = DEFAULT_CONFIG, scales: Sequence[float] = (1.0,),
+           sweep: Sequence[Dict] = ()) -> List[Tag]:
+    """Valid tags in a BGR or grayscale frame, from the first pass that finds any.
+
+    Passes run over every scale for the base config, then for each sweep
+    variant (config overrides), stopping as soon as one succeeds.
+    """
+    start = time.perf_counter()
+    variants = [config] + [config._replace(**override) for override in sweep]
+    for variant_index, variant in enumerate(variants):
+        detector = get_detector(variant)
+        for scale in scales:
+            corners, ids = detector.detect_markers(frame, scale)
+            found = valid_tags(corners, ids)
+            if found:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                return [Tag(tag_id, quad, (float(quad[:, 0].mean()), float(quad[:, 1].mean())),
+                            elapsed_ms, scale, variant_index) for tag_id, quad in found]
+    return []
+
+
+def draw_tags(image: np.ndarray, tags: Sequence[Tag], color=(0, 255, 0)) -> None:
+    """Outline and label tags on a BGR image (debug output)"""
+    if not tags:
+        return
+    corners = [tag.corners.reshape(1, 4, 2) for tag in tags]
+    ids = np.array([[tag.id] for tag in tags], dtype=np.int32)
+    cv2.aruco.drawDetectedMarkers(image, corners, ids, borderColor=color)
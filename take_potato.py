@@ -1,83 +1,175 @@
 #!/usr/bin/env python3
-import cv2
 import numpy as np
+import os
 import sys
 import time
-from adafruit_servokit import ServoKit
-import board
-import busio
-import RPi.GPIO as GPIO
 
+import hal
+from cancellation import cancelled
+from change_gate import ChangeGate, GateConfig
+from decision import Decision, DecisionPolicy
+from motion import JointLimits, MotionPlanner, Waypoint
+from motion_sequence import Executor, compile_routine, load_sequence
+from native_capture import CaptureProfile, read_view
+from pca9685 import PCA9685, ServoGroup
+from pipeline import Trace
+from servo_state import get_state
+from roi import ProcessingMode, crosses_edge, detect_blobs, intersect
+from segmentation import ColorClass, Segmenter
+from speculation import get_cache
+from telemetry import span
 
+GPIO = hal.gpio()
 
-def detect_ball_color():
-    # Initialize camera
-    cap = cv2.VideoCapture(0)
+# Orange ball HSV range and size limits (areas at 640x480, scaled to the actual resolution)
+ORANGE_LOWER = np.array([5, 100, 100])
+ORANGE_UPPER = np.array([15, 255, 255])
+MIN_BALL_AREA = 10000
+MAX_BALL_AREA = 50000000
+
+BALL_SEGMENTER = Segmenter([ColorClass("orange", [(ORANGE_LOWER, ORANGE_UPPER)])])
+
+# Coarse pass at half resolution, candidates confirmed at full resolution
+BALL_MODE = ProcessingMode(roi=None, scale=0.5, refine=True)
+
+# Native cameras hand over half-resolution BGR, searched whole (see find_box_color)
+BALL_CAPTURE = CaptureProfile(view="half")
+BALL_HALF_MODE = BALL_MODE._replace(scale=1.0, refine=False)
+
+# Orange needs 3 of the last 5 frames. "white" (no orange) only at the full 3 s,
+# as before: a ball can come into view late (arm still moving), and a wrong
+# placement costs more than the wait
+BALL_POLICY = DecisionPolicy(window=5, votes=3, min_confidence=0.6, max_dwell=3.0,
+                             absent="white")
+
+# Frames that did not change since the detector last ran reuse its label
+BALL_GATE = GateConfig()
+
+
+def ball_label(frame, mode=None, hsv=None):
+    """Return the ball color seen in one frame ("orange" or "white")
+    (hsv: roi.first_pass_hsv() of the frame, if already computed)"""
+    blobs = detect_blobs(BALL_SEGMENTER, frame, ["orange"], MIN_BALL_AREA, MAX_BALL_AREA,
+                         BALL_MODE if mode is None else mode, hsv=hsv)
+    return "orange" if blobs["orange"] is not None else "white"
+
+
+def ball_region(frame, roi, previous, mode=BALL_MODE):
+    """Change gate region check: if no orange was seen, it can only appear where the image changed"""
+    if previous != "white":
+        return None
+    roi = intersect(mode.roi, roi)
+    if crosses_edge(BALL_SEGMENTER, frame, roi, ["orange"]):
+        return None  # may be part of a larger region outside the crop: check the whole frame
+    return ball_label(frame, mode._replace(roi=roi))
+
+
+def decide_ball_color(cap=None, policy=BALL_POLICY, clock=time.monotonic):
+    """Vote on ball_label() per frame until the policy settles; returns a Decision"""
+    # Initialize camera (or use the controller's shared camera)
+    owns_camera = cap is None
+    if owns_camera:
+        cap = hal.capture(0, BALL_CAPTURE)
     if not cap.isOpened():
         print("ERROR: Camera not accessible", file=sys.stderr)
-        return "error"
+        return Decision("error", 0.0, 0, 0.0, False)
     
+    vote = policy.start(clock)
+    gate = ChangeGate("ball", BALL_GATE)
     try:
-        start_time = time.time()
-        orange_detected = False
-        
-        while time.time() - start_time < 3:  # Run for 3 seconds
-            ret, frame = cap.read()
+        # On cancellation (deadline, ABORT) the best guess so far is the result
+        while not vote.done and not cancelled():
+            with span("camera"):
+                ret, frame, native = read_view(cap, BALL_CAPTURE.view)
             if not ret:
                 continue
-            
-            # Convert to HSV and create orange mask
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            lower_orange = np.array([5, 100, 100])
-            upper_orange = np.array([15, 255, 255])
-            mask_orange = cv2.inRange(hsv, lower_orange, upper_orange)
-            
-            # Find contours
-            contours, _ = cv2.findContours(mask_orange, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Check for orange balls of appropriate size
-            min_ball_area = 10000
-            max_ball_area = 50000000
-            
-            for c in contours:
-                area = cv2.contourArea(c)
-                if min_ball_area < area < max_ball_area:
-                    orange_detected = True
-                    break  # Found orange, no need to check further
-            
-            if orange_detected:
-                break  # Exit early if orange detected
+            mode = BALL_HALF_MODE if native else BALL_MODE
+            with span("detect"):
+                label = gate(frame, lambda f: ball_label(f, mode),
+                             lambda f, roi, previous: ball_region(f, roi, previous, mode))
+            vote.add(label)
         
-        return "orange" if orange_detected else "white"
+        return vote.decision()
     
     finally:
-        cap.release()
+        if owns_camera:
+            cap.release()
+
+
+def detect_ball_color(cap=None, policy=BALL_POLICY):
+    # A fresh answer from speculative detection (raspi.py --speculate) saves the wait
+    hit = get_cache().lookup("ball")
+    if hit is not None:
+        print(f"Ball decision {hit.decision.value} from the speculative cache "
+              f"({hit.age * 1000:.0f} ms old, confidence {hit.decision.confidence:.2f})")
+        return hit.decision.value
+    decision = decide_ball_color(cap, policy)
+    print(f"Ball decision {decision.value} after {decision.frames} frames, "
+          f"{decision.elapsed_ms:.0f} ms (confidence {decision.confidence:.2f})")
+    return decision.value
+
+
+# Arm joints in (base, shoulder, elbow) order. speed=1.0 runs at these limits;
+# the shoulder carries the most load, so it gets the lowest ones.
+ARM_LIMITS = (
+    JointLimits(max_velocity=120.0, max_acceleration=400.0),  # base
+    JointLimits(max_velocity=90.0, max_acceleration=300.0),   # shoulder
+    JointLimits(max_velocity=120.0, max_acceleration=400.0),  # elbow
+)
+HOME_POSE = (180, 100, 180)
+MOTION_PROFILE = "scurve"
+
+# Poses, suction and waits of every arm routine
+SEQUENCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sequences", "take_potato.yaml")
+
+SUCKER_PIN = 17  # suction pump (BCM)
+
+# With a vacuum switch on VACUUM_SENSOR_PIN (HIGH while the cup holds), the grip
+# and release waits end as soon as it changes; without one they run to their timeout
+VACUUM_SENSOR_PIN = None
+
 
 class PotatoServoController:
-    def __init__(self):
+    def __init__(self, servos=None, trace=None):
+        """servos: arm joint backend (e.g. motion.SimulatedServos); default is the PCA9685 over I2C.
+        trace: pipeline.Trace that records the timing of each step"""
+        self.trace = trace if trace is not None else Trace()
         try:
             print("Initializing Potato Servo Controller...")
             
-            # Initialize I2C bus
-            self.i2c = busio.I2C(board.SCL, board.SDA)
-            
-            # Initialize ServoKit with I2C
-            self.kit = ServoKit(channels=16, i2c=self.i2c)
-            
-            # Configure servos
-            for channel in range(16):
-                self.kit.servo[channel].set_pulse_width_range(500, 2400)
-                self.kit.servo[channel].actuation_range = 180
-            
             # Define servo channels
             self.base_servo = 13    # Base rotation
             self.shoulder_servo = 14  # Shoulder joint
             self.elbow_servo = 15    # Elbow joint
+            self.arm_channels = [self.base_servo, self.shoulder_servo, self.elbow_servo]
             
-            # Setup GPIO for suction
-            self.sucker_pin = 17
+            if servos is None:
+                # Initialize I2C bus
+                self.i2c = hal.i2c()
+                
+                # PCA9685 with all channels at 500-2400 us / 180 degrees; each
+                # trajectory tick updates the arm in one I2C block write. Angles
+                # commanded by earlier runs are restored from the servo state.
+                self.pca = PCA9685(self.i2c, min_pulse=500, max_pulse=2400, actuation_range=180,
+                                   state=get_state())
+                servos = ServoGroup(self.pca, self.arm_channels)
+            
+            # All arm joints move together on one fixed-rate trajectory
+            self.motion = MotionPlanner(servos, ARM_LIMITS, MOTION_PROFILE, home=HOME_POSE,
+                                        clock=hal.clock, sleep=hal.sleep)
+            self.routines = load_sequence(SEQUENCE_FILE)
+            
+            # Setup GPIO for suction (run() releases the pin again after each in-process run)
+            self.sucker_pin = SUCKER_PIN
+            GPIO.setmode(GPIO.BCM)
             GPIO.setup(self.sucker_pin, GPIO.OUT)
             GPIO.output(self.sucker_pin, GPIO.LOW)
+            conditions = {}
+            if VACUUM_SENSOR_PIN is not None:
+                GPIO.setup(VACUUM_SENSOR_PIN, GPIO.IN)
+                conditions = {"vacuum": lambda: GPIO.input(VACUUM_SENSOR_PIN) == GPIO.HIGH,
+                              "no_vacuum": lambda: GPIO.input(VACUUM_SENSOR_PIN) == GPIO.LOW}
+            self.executor = Executor(self.motion, gpio=GPIO.output, conditions=conditions, trace=self.trace)
             
             print("Potato Servo Controller initialized successfully")
             
@@ -95,7 +187,9 @@ class PotatoServoController:
             return False
             
         try:
-            self.kit.servo[channel].angle = angle
+            self.pca.set_angle(channel, angle)
+            self.pca.flush()
+            self.pca.persist()
             print(f"Servo {channel} set to {angle}°")
             return True
         except Exception as e:
@@ -103,21 +197,11 @@ class PotatoServoController:
             return False
 
     def turn_servo_to_angle_with_speed(self, channel, target_angle, speed=0.5):
-        """Move servo smoothly to target angle"""
+        """Move one arm joint smoothly to target angle"""
         try:
-            current_angle = self.kit.servo[channel].angle or 0
-            step = max(1, int(3 * speed))
-            
-            if current_angle < target_angle:
-                for angle in range(int(current_angle), int(target_angle) + 1, step):
-                    self.kit.servo[channel].angle = angle
-                    time.sleep(0.03 / speed)
-            else:
-                for angle in range(int(current_angle), int(target_angle) - 1, -step):
-                    self.kit.servo[channel].angle = angle
-                    time.sleep(0.03 / speed)
-                    
-            self.kit.servo[channel].angle = target_angle
+            pose = list(self.motion.pose())
+            pose[self.arm_channels.index(channel)] = target_angle
+            self.motion.move([Waypoint(tuple(pose), speed)])
             return True
         except Exception as e:
             print(f"Error moving servo: {e}")
@@ -126,52 +210,39 @@ class PotatoServoController:
     def sucker_on(self):
         """Activate suction"""
         GPIO.output(self.sucker_pin, GPIO.HIGH)
-        time.sleep(0.5)
 
     def sucker_off(self):
         """Deactivate suction"""
         GPIO.output(self.sucker_pin, GPIO.LOW)
 
-    def move_to_home_position(self, speed=0.6):
+    def run_routine(self, name, detectors=None):
+        """Compile a routine from SEQUENCE_FILE for the current arm pose and run it"""
+        schedule = compile_routine(self.routines, name, self.motion.pose(), self.motion.limits,
+                                   self.motion.profile)
+        return self.executor.run(schedule, detectors)
+
+    def move_to_home_position(self):
         """Return arm to home position"""
-        self.turn_servo_to_angle_with_speed(self.elbow_servo, 180, speed)
-        self.turn_servo_to_angle_with_speed(self.shoulder_servo, 100, speed)
-        self.turn_servo_to_angle_with_speed(self.base_servo, 180, speed)
+        self.run_routine("home")
 
-    def position_arm(self, base_angle, shoulder_angle, elbow_angle, speed=0.6):
-        """Position all arm servos"""
-        self.turn_servo_to_angle_with_speed(self.base_servo, base_angle, speed)
-        self.turn_servo_to_angle_with_speed(self.shoulder_servo, shoulder_angle, speed)
-        self.turn_servo_to_angle_with_speed(self.elbow_servo, elbow_angle, speed)
+    def position_arm(self, base_angle, shoulder_angle, elbow_angle, speed=0.6, settle=0.0):
+        """Move all arm servos together to the given angles, then hold for `settle` seconds"""
+        self.motion.move([Waypoint((base_angle, shoulder_angle, elbow_angle), speed, dwell=settle)])
 
     def take_potato_right(self):
         """Pick up potato from right position"""
         print("\n----- TAKING POTATO FROM RIGHT -----")
-        self.position_arm(base_angle=60, shoulder_angle=60, elbow_angle=13, speed=0.7)
-        time.sleep(0.2)
-        self.position_arm(base_angle=60, shoulder_angle=7, elbow_angle=13, speed=0.6)
-        time.sleep(0.2)
-        self.sucker_on()
-        time.sleep(3)
-        self.position_arm(base_angle=60, shoulder_angle=60, elbow_angle=13, speed=0.7)
+        self.run_routine("take_right")
 
     def place_potato_orange(self):
         """Place potato in orange container"""
         print("\n----- PLACING POTATO IN ORANGE CONTAINER -----")
-        self.position_arm(base_angle=5, shoulder_angle=126, elbow_angle=0, speed=0.6)
-        time.sleep(0.2)
-        self.sucker_off()
-        time.sleep(3)
-        self.move_to_home_position()
+        self.run_routine("place_orange")
 
     def place_potato_white(self):
         """Place potato in white container"""
         print("\n----- PLACING POTATO IN WHITE CONTAINER -----")
-        self.position_arm(base_angle=150, shoulder_angle=85, elbow_angle=180, speed=0.6)
-        time.sleep(0.2)
-        self.sucker_off()
-        time.sleep(3)
-        self.move_to_home_position()
+        self.run_routine("place_white")
 
     def cleanup(self):
         """Clean up resources"""
@@ -181,36 +252,43 @@ class PotatoServoController:
         except:
             pass
 
-if __name__ == '__main__':
+def warm_up():
+    """Open the I2C bus, parse the arm routines and run the ball detector once (raspi.py start-up)"""
+    hal.i2c()
+    load_sequence(SEQUENCE_FILE)
+    ball_label(np.zeros((480, 640, 3), np.uint8))
+
+def run(camera=None):
+    """Pick the potato while the ball color is detected, then place it in the matching container"""
+    trace = Trace()
+    controller = None
     try:
-       
+        with trace.span("arm init"):
+            controller = PotatoServoController(trace=trace)
         
-        # Detect ball color
-        result = detect_ball_color()
+        # The "main" routine detects the ball color in a worker while the arm
+        # picks the potato; the result is only needed at the place step
+        cap = camera.capture() if camera is not None else None
+        controller.run_routine("main", {"ball_color": lambda: detect_ball_color(cap)})
+        result = controller.executor.detected.get("ball_color") or "error"
         print(f"Detected color: {result}")
+        return result
+    
+    finally:
+        if controller is not None:
+            controller.cleanup()
         
-        controller = PotatoServoController()
-        
-        if result == "orange":
-            
-            controller.take_potato_right()
-            
-            time.sleep(0.5)
-            controller.place_potato_orange()
-        else:
-            
-            controller.take_potato_right()
-            
-            time.sleep(0.5)
-            controller.place_potato_white()
-            
+        # Only this task's pins: play_starman's chorus may still be driving the buzzer
+        for pin in (SUCKER_PIN, VACUUM_SENSOR_PIN):
+            if pin is not None:
+                GPIO.cleanup(pin)
+        print("Program ended")
+        print(trace.report(), file=sys.stderr)
+
+if __name__ == '__main__':
+    try:
+        run()
     except KeyboardInterrupt:
         print("\nProgram interrupted by user")
     except Exception as e:
-        print(f"Error: {e}")
-    finally:
-        if 'controller' in locals():
-            controller.cleanup()
-        
-        GPIO.cleanup()
-        print("Program ended")
\ No newline at end of file
+        print(f"Error: {e}")
\ No newline at end of file
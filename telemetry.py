@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Always-on command telemetry: phase spans in a ring buffer, latency histograms, JSONL log.
+
+Recording a span costs two clock reads and one slot store: writers take a
+slot number from an atomic counter and never lock. A flusher thread drains
+the ring once per `flush_interval`, or as soon as it is half full, into per-command and per-phase
+histograms and, if a path is set, appends compact JSONL records (the file
+is rotated to `<path>.1` once it passes `max_bytes`, so at most two are kept):
+
+    {"c": 12, "cmd": "TAKE_POTATO", "p": "motion", "t": 3.512, "ms": 1830.4}
+
+`t` is seconds since the telemetry started. Phases used by the controller
+and tasks: receive (serial line queued until picked up), dispatch, camera
+(frame read), detect (one frame's detector), motion (one arm trajectory),
+reply (serial write), plus a "command" span from receipt to reply.
+
+    tel = get_telemetry()
+    with tel.span("detect"):
+        label = ball_label(frame)
+    print(tel.stats())          # what the STATS command answers
+
+Spans belong to the command begun in the same thread, or in the thread that
+started theirs with pipeline.background() (the command id is a context
+variable, like the cancellation token). Records overwritten in the ring
+before a flush reached them are counted in `dropped` and reported at the
+end of stats().
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds in ms (1-2-5 series); the last bucket is open-ended
+BUCKETS_MS = tuple(m * 10 ** e for e in range(-1, 5) for m in (1, 2, 5))
+# Spans per second the ring holds between two timed flushes without dropping any;
+# the controller records a few hundred (two per camera frame, a few per command)
+SPAN_RATE = 2000
+RING_SIZE = 4096  # smallest ring
+MAX_LOG_BYTES = 8 * 1024 * 1024
+
+# (command id, command, phase, start, end) in clock seconds
+Record = Tuple[int, Optional[str], str, float, float]
+
+# (command id, command) that spans recorded in this context belong to
+_command: ContextVar[Tuple[int, Optional[str]]] = ContextVar("telemetry_command", default=(0, None))
+
+
+class Histogram:
+    """Counts per BUCKETS_MS bucket plus exact count, sum and max"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.n = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        i = 0
+        while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (max for the open bucket)"""
+        rank = q / 100 * self.n
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKETS_MS[i], self.max_ms) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> str:
+        return (f"n={self.n} mean={_ms(self.total_ms / max(self.n, 1))} p50<={_ms(self.percentile(50))} "
+                f"p95<={_ms(self.percentile(95))} max={_ms(self.max_ms)}")
+
+
+def _ms(value: float) -> str:
+    return f"{value:.0f}" if value >= 100 else f"{value:.3g}"
+
+
+class _Span:
+    __slots__ = ("telemetry", "phase", "start")
+
+    def __init__(self, telemetry: "Telemetry", phase: str):
+        self.telemetry = telemetry
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = self.telemetry.clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.telemetry.record(self.phase, self.start, self.telemetry.clock())
+        return False
+
+
+class Telemetry:
+    """Lock-free span ring drained by a background flusher into histograms and a JSONL file"""
+
+    def __init__(self, path: Optional[str] = None, size: Optional[int] = None, flush_interval: float = 1.0,
+                 clock=time.perf_counter, max_bytes: int = MAX_LOG_BYTES):
+        """size: ring slots (default: SPAN_RATE spans per flush_interval, twice over);
+        max_bytes: rotate the log to `<path>.1` past this size (0: never)"""
+        if size is None:
+            size = max(RING_SIZE, int(2 * SPAN_RATE * flush_interval))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.origin = clock()
+        self.ring: List[Optional[Tuple[int, Record]]] = [None] * size
+        self.commands: Dict[str, Histogram] = {}
+        self.phases: Dict[str, Histogram] = {}
+        self.dropped = 0  # records overwritten before they were flushed
+        self._seq = itertools.count()
+        self._flushed = 0  # next sequence number to flush
+        self._command_ids = itertools.count(1)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # set by writers when the ring is half full
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._file_bytes = 0
+
+    def start(self) -> "Telemetry":
+        """Start the flusher thread (and open the log file)"""
+        if self._thread is None:
+            if self.path is not None:
+                self._open_log()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._flush_loop, name="telemetry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the flusher after a final flush"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open_log(self) -> None:
+        self._file = open(self.path, "a", buffering=64 * 1024)
+        self._file_bytes = self._file.tell()
+
+    def _write_log(self, lines: List[str]) -> None:
+        """Append JSONL lines, rotating wherever the next line would pass max_bytes"""
+        chunk: List[str] = []
+        size = self._file_bytes
+        for line in lines:
+            if self.max_bytes and size and size + len(line) + 1 > self.max_bytes:
+                self._file.write("".join(chunk))
+                self._file.close()
+                os.replace(self.path, self.path + ".1")
+                self._open_log()
+                chunk, size = [], 0
+            chunk.append(line + "\n")
+            size += len(line) + 1
+        self._file.write("".join(chunk))
+        self._file.flush()
+        self._file_bytes = size
+
+    # Recording (any thread, no locks)
+
+    def begin(self, command: str) -> int:
+        """Mark the start of a command; later spans in this thread, and in threads it
+        starts with background(), are attributed to it"""
+        command_id = next(self._command_ids)
+        _command.set((command_id, command))
+        return command_id
+
+    def end(self, start: float) -> None:
+        """Record the current command's total latency from `start` (clock seconds)"""
+        self.record("command", start, self.clock())
+        _command.set((0, None))
+
+    def span(self, phase: str) -> _Span:
+        return _Span(self, phase)
+
+    def record(self, phase: str, start: float, end: float, command: Optional[str] = None) -> None:
+        """Store one span; `command` overrides the current command (e.g. replies sent mid-task)"""
+        command_id, current = _command.get()
+        if command is None:
+            command = current
+        else:
+            command_id = 0
+        seq = next(self._seq)
+        self.ring[seq % self.size] = (seq, (command_id, command, phase, start, end))
+        if seq - self._flushed >= self.size // 2 and not self._wake.is_set():
+            self._wake.set()
+
+    # Draining
+
+    def flush(self) -> int:
+        """Move new records into the histograms and the log; returns how many"""
+        with self._flush_lock:
+            lines = []
+            flushed = 0
+            seq = self._flushed
+            while True:
+                slot = self.ring[seq % self.size]
+                if slot is None or slot[0] < seq:
+                    break  # not written yet
+                if slot[0] > seq:
+                    # The writers lapped the ring: everything older than one ring length is gone
+                    oldest = slot[0] - self.size + 1
+                    self.dropped += oldest - seq
+                    seq = oldest
+                    continue
+                command_id, command, phase, start, end = slot[1]
+                ms = (end - start) * 1000
+                if phase == "command":
+                    self.commands.setdefault(command, Histogram()).add(ms)
+                else:
+                    self.phases.setdefault(phase, Histogram()).add(ms)
+                if self._file is not None:
+                    lines.append(json.dumps({"c": command_id, "cmd": command, "p": phase,
+                                             "t": round(start - self.origin, 4), "ms": round(ms, 3)},
+                                            separators=(",", ":")))
+                flushed += 1
+                seq += 1
+            self._flushed = seq
+            if lines:
+                self._write_log(lines)
+            return flushed
+
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break  # stop() flushes once more
+            try:
+                self.flush()
+            except Exception as exc:
+                print(f"Telemetry flush failed: {exc}")
+
+    # Queries
+
+    def stats(self, kind: str = "commands") -> str:
+        """One-line latency summary per command (or per phase with kind="phases"), in ms,
+        ending with how many records were dropped"""
+        self.flush()
+        histograms = self.phases if kind == "phases" else self.commands
+        summary = "; ".join(f"{name} {histogram.summary()}" for name, histogram in sorted(histograms.items()))
+        return f"{summary or 'no data'}; dropped={self.dropped}"
+
+
+_TELEMETRY: Optional[Telemetry] = None
+
+
+def get_telemetry() -> Telemetry:
+    """The process-wide Telemetry; histograms only until configure() sets a log path"""
+    global _TELEMETRY
+    if _TELEMETRY is None:
+        _TELEMETRY = Telemetry().start()
+    return _TELEMETRY
+
+
+def configure(path: Optional[str], **kwargs) -> Telemetry:
+    """Replace the process-wide Telemetry, logging to `path` (None: no log file)"""
+    global _TELEMETRY
+    if _TELEMETRY is not None:
+        _TELEMETRY.stop()
+    _TELEMETRY = Telemetry(path, **kwargs).start()
+    return _TELEMETRY
+
+
+@contextmanager
+def attributed(command: Optional[str]):
+    """Attribute spans recorded in this thread (and threads it starts) to `command`, outside any command"""
+    reset = _command.set((0, command))
+    try:
+        yield
+    finally:
+        _command.reset(reset)
+
+
+def span(phase: str) -> _Span:
+    """Span on the process-wide Telemetry"""
+    return get_telemetry().span(phase)
+
+
+if __name__ == '__main__':
+    # Summarize a telemetry log: telemetry.py telemetry.jsonl
+    import sys
+    commands: Dict[str, Histogram] = {}
+    phases: Dict[str, Histogram] = {}
+    with open(sys.argv[1] if len(sys.argv) > 1 else "telemetry.jsonl") as f:
+        for line in f:
+            record = json.loads(line)
+            target = commands if record["p"] == "command" else phases
+            target.setdefault(record["cmd"] if record["p"] == "command" else record["p"], Histogram()).add(record["ms"])
+    for title, histograms in (("command", commands), ("phase", phases)):
+        for name, histogram in sorted(histograms.items()):
+            print(f"{title:<8}{name:<20}{histogram.summary()}")
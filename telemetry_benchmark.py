@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Cost of the always-on telemetry vs. the controller's log lines.
+
+Times one span (enter + exit, record into the ring) with and without the
+flusher thread and a JSONL log, the flush itself per record, and a log line
+with the old per-line datetime.now().strftime timestamp vs. the cached one.
+The logged run uses a LOG_CAP-byte log. A second logged run records
+PACED_RATE spans per second, ten times the rate the ring is sized for
+(telemetry.SPAN_RATE), from a background() worker of a command: it only
+keeps up if writers wake the flusher early. Exits with status 1 if a log outgrows the cap, stats()
+does not report the dropped records, or the paced run drops any records or
+logs them under another command.
+
+Usage: python3 telemetry_benchmark.py [spans]
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from pipeline import background
+from telemetry import SPAN_RATE, Telemetry
+
+LOG_CAP = 1024 * 1024
+PACED_RATE = 10 * SPAN_RATE
+PACED_SECONDS = 1.0
+
+
+def per_call_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def span_cost(telemetry, n):
+    def one():
+        with telemetry.span("detect"):
+            pass
+    return per_call_us(one, n)
+
+
+def paced(telemetry, rate, seconds, tick=0.01):
+    """Record `rate` spans per second in bursts every `tick` s; returns how many"""
+    per_tick = int(rate * tick)
+    start = time.perf_counter()
+    ticks = int(seconds / tick)
+    for i in range(ticks):
+        for _ in range(per_tick):
+            with telemetry.span("detect"):
+                pass
+        time.sleep(max(0.0, start + (i + 1) * tick - time.perf_counter()))
+    return ticks * per_tick
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rows = []
+
+    idle = Telemetry(size=n + 1)
+    rows.append(("span, ring only", span_cost(idle, n)))
+    start = time.perf_counter()
+    flushed = idle.flush()
+    rows.append(("flush into histograms, per record", (time.perf_counter() - start) / flushed * 1e6))
+
+    log_path = os.path.join(tempfile.mkdtemp(prefix="telemetry_"), "telemetry.jsonl")
+    logged = Telemetry(log_path, size=4096, flush_interval=0.05, max_bytes=LOG_CAP).start()
+    logged.begin("TAKE_POTATO")
+    rows.append(("span, flusher + JSONL log", span_cost(logged, n)))
+    logged.stop()
+    logs = [path for path in (log_path + ".1", log_path) if os.path.exists(path)]
+    lines = 0
+    for path in logs:
+        with open(path) as f:
+            lines += sum(1 for _ in f)
+    sizes = [os.path.getsize(path) for path in logs]
+
+    paced_path = os.path.join(os.path.dirname(log_path), "paced.jsonl")
+    steady = Telemetry(paced_path).start()
+    steady.begin("FIND_BOX_COLOR")
+    recorded = background("paced", paced, steady, PACED_RATE, PACED_SECONDS).result()
+    steady.stop()
+    with open(paced_path) as f:
+        commands = [json.loads(line)["cmd"] for line in f]
+
+    from raspi import RaspberryPiController
+    controller = RaspberryPiController.__new__(RaspberryPiController)
+    sink = io.StringIO()
+    with redirect_stdout(sink):
+        old = per_call_us(lambda: print(f"{datetime.now().strftime('[%Y-%m-%d %H:%M:%S]')} - ESP32: PING"), n // 10)
+        new = per_call_us(lambda: print(f"{controller.timestamp()} - ESP32: PING"), n // 10)
+    rows.append(("log line, strftime per line", old))
+    rows.append(("log line, cached timestamp", new))
+
+    print(f"{'operation':<36}{'us':>8}")
+    for name, us in rows:
+        print(f"{name:<36}{us:>8.2f}")
+    # A tight loop outruns the ring between flushes; overwritten records are counted, not logged
+    print(f"tight loop: JSONL records written: {lines} of {n + 1}, dropped {logged.dropped}")
+    print(f"paced at {PACED_RATE}/s: {len(commands)} of {recorded} records logged, dropped {steady.dropped}, "
+          f"{commands.count('FIND_BOX_COLOR')} attributed to the command")
+    print(f"log files: {', '.join(f'{os.path.basename(p)} {size} B' for p, size in zip(logs, sizes))} "
+          f"(cap {LOG_CAP} B)")
+    failures = []
+    if max(sizes) > LOG_CAP:
+        failures.append(f"log grew to {max(sizes)} B, over the {LOG_CAP} B cap")
+    if f"dropped={logged.dropped}" not in logged.stats():
+        failures.append("stats() does not report the dropped records")
+    if steady.dropped or len(commands) != recorded:
+        failures.append(f"paced run dropped {steady.dropped} records")
+    if commands.count("FIND_BOX_COLOR") != len(commands):
+        failures.append("paced run spans attributed to another command")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
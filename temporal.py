@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Streaming temporal denoise stage over the last few grayscale frames.
+
+Replaces np.median(frames, axis=0), which stacks full BGR frames into a new
+float64 array on every call. The filter keeps a preallocated uint8 ring of
+`depth` grayscale frames and computes its output into preallocated buffers
+with cv2.min/cv2.max (a sorting network for the median), so steady-state
+operation allocates nothing:
+
+    denoise = TemporalFilter(depth=3, mode="median")
+    for frame in frames:
+        out = denoise(frame)   # None until `depth` frames have been pushed
+"""
+from typing import Optional
+
+import cv2
+import numpy as np
+
+MODES = ("median", "mean", "min", "max")
+
+
+class TemporalFilter:
+    """Per-pixel median / mean / min / max over the last `depth` frames"""
+
+    def __init__(self, depth: int = 3, mode: str = "median"):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        if mode == "median" and depth % 2 == 0:
+            raise ValueError("median needs an odd depth")
+        self.depth = depth
+        self.mode = mode
+        self.stack: Optional[np.ndarray] = None
+        self.count = 0  # frames pushed since the last reset
+        self._work: Optional[np.ndarray] = None  # sorting network scratch, median only
+        self._tmp: Optional[np.ndarray] = None
+        self._sum: Optional[np.ndarray] = None  # running float32 sum, mean only
+        self._out: Optional[np.ndarray] = None
+
+    def reset(self) -> None:
+        """Forget buffered frames (buffers are kept)"""
+        self.count = 0
+        if self._sum is not None:
+            self._sum[:] = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.depth
+
+    def _allocate(self, shape) -> None:
+        self.stack = np.empty((self.depth,) + shape, dtype=np.uint8)
+        self._out = np.empty(shape, dtype=np.uint8)
+        if self.mode == "median":
+            self._work = np.empty((self.depth,) + shape, dtype=np.uint8)
+            self._tmp = np.empty(shape, dtype=np.uint8)
+        elif self.mode == "mean":
+            self._sum = np.zeros(shape, dtype=np.float32)
+
+    def push(self, frame: np.ndarray) -> None:
+        """Add a BGR or grayscale frame; BGR is converted straight into the ring slot"""
+        shape = frame.shape[:2]
+        if self.stack is None or self.stack.shape[1:] != shape:
+            self._allocate(shape)
+            self.reset()
+
+        slot = self.stack[self.count % self.depth]
+        if self.mode == "mean" and self.count >= self.depth:
+            cv2.subtract(self._sum, slot, dst=self._sum, dtype=cv2.CV_32F)
+        if frame.ndim == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=slot)
+        else:
+            np.copyto(slot, frame)
+        if self.mode == "mean":
+            cv2.add(self._sum, slot, dst=self._sum, dtype=cv2.CV_32F)
+        self.count += 1
+
+    def result(self) -> Optional[np.ndarray]:
+        """Filtered uint8 frame (reused buffer, valid until the next call), or None if not ready"""
+        if not self.ready:
+            return None
+        out, stack, depth = self._out, self.stack, self.depth
+
+        if self.mode == "mean":
+            cv2.convertScaleAbs(self._sum, dst=out, alpha=1.0 / depth)
+        elif self.mode in ("min", "max"):
+            op = cv2.min if self.mode == "min" else cv2.max
+            np.copyto(out, stack[0])
+            for i in range(1, depth):
+                op(out, stack[i], dst=out)
+        elif depth == 1:
+            np.copyto(out, stack[0])
+        elif depth == 3:
+            # median(a, b, c) = max(min(a, b), min(max(a, b), c))
+            a, b, c = stack
+            lo, hi = self._work[0], self._work[1]
+            cv2.min(a, b, dst=lo)
+            cv2.max(a, b, dst=hi)
+            cv2.min(hi, c, dst=hi)
+            cv2.max(lo, hi, dst=out)
+        else:
+            # Odd-even transposition sort of the frames, pixel-wise, then take the middle one
+            work, tmp = self._work, self._tmp
+            np.copyto(work, stack)
+            for rnd in range(depth):
+                for i in range(rnd % 2, depth - 1, 2):
+                    cv2.min(work[i], work[i + 1], dst=tmp)
+                    cv2.max(work[i], work[i + 1], dst=work[i + 1])
+                    np.copyto(work[i], tmp)
+            np.copyto(out, work[depth // 2])
+        return out
+
+    def __call__(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """Pipeline stage: push a frame and return the filtered output (None until ready)"""
+        self.push(frame)
+        return self.result()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Memory and latency of TemporalFilter vs. the old np.median frame stack in is_red_good.
+
+Old: collect 3 BGR frames (sleeping 0.1 s between reads), then
+np.median(frames, axis=0).astype(np.uint8) and convert to gray.
+New: push each frame into a preallocated grayscale ring and take the median
+in place. Reported per filtered frame: compute time, bytes allocated
+(tracemalloc peak) and time from the first frame read to the first filtered
+frame at 30 fps.
+
+Usage: python3 temporal_benchmark.py [repeats]
+"""
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from temporal import TemporalFilter
+
+FRAME_INTERVAL = 1 / 30.0  # camera frame period
+OLD_SLEEP = 0.1  # sleep between reads in the old capture loop
+
+
+def old_median(frames):
+    median_frame = np.median(frames, axis=0).astype(np.uint8)
+    return cv2.cvtColor(median_frame, cv2.COLOR_BGR2GRAY)
+
+
+def measure(fn, repeats):
+    """(ms per call, peak bytes allocated during one call)"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    ms = (time.perf_counter() - start) * 1000 / repeats
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ms, peak
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(3)]
+
+    denoise = TemporalFilter(depth=3, mode="median")
+    for frame in frames:
+        denoise.push(frame)
+
+    def new_median():
+        denoise.push(frames[0])
+        return denoise.result()
+
+    old_ms, old_bytes = measure(lambda: old_median(frames), repeats)
+    new_ms, new_bytes = measure(new_median, repeats)
+    resident = denoise.stack.nbytes + denoise._work.nbytes + denoise._tmp.nbytes + denoise._out.nbytes
+
+    # First filtered frame: old loop reads 3 frames with a 0.1 s sleep after each
+    old_first = 3 * max(OLD_SLEEP, FRAME_INTERVAL) * 1000 + old_ms
+    new_first = 3 * FRAME_INTERVAL * 1000 + new_ms
+
+    print("640x480, 3-frame median")
+    print(f"{'':<26}{'np.median':>12}{'TemporalFilter':>16}")
+    print(f"{'compute ms/frame':<26}{old_ms:>12.2f}{new_ms:>16.2f}")
+    print(f"{'allocated per frame (KB)':<26}{old_bytes / 1024:>12.0f}{new_bytes / 1024:>16.0f}")
+    print(f"{'resident buffers (KB)':<26}{'-':>12}{resident / 1024:>16.0f}")
+    print(f"{'first result after (ms)':<26}{old_first:>12.0f}{new_first:>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Multi-process vision pipeline: capture, preprocessing and detection in separate
+processes, handing frames over through shared memory.
+
+    capture ──▶ preprocess ──▶ detect ×N ──▶ results (in frame order)
+
+Frames are decoded straight into slots of a shared-memory ring and never
+copied between processes; the queues only carry slot numbers. Each stage
+writes its output into the same slot of a second ring (e.g. the coarse HSV
+image for the color detectors, the denoised gray image for the tag
+detector), so frame n can be in detection while n+1 is preprocessed and
+n+2 captured. A slot returns to the free list once its frame is detected:
+with `drop` the capture stage skips frames while every slot is busy (live
+camera, lowest latency), otherwise it waits (recorded video, no frame lost).
+
+Preprocessing runs in one process, in frame order, so it may keep state
+across frames (the tag task's temporal median). Detection runs on
+`workers` processes; results are put back in frame order.
+
+    with VisionPipeline("match.mp4", "box", workers=2) as pipeline:
+        decision = pipeline.decide(BOX_POLICY)
+
+Usage: python3 vision_pipeline.py box|ball|tag video|image_dir [--workers N]
+"""
+import argparse
+import heapq
+import multiprocessing as mp
+import queue
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from camera_service import open_source
+from decision import Decision, DecisionPolicy
+
+POLL = 0.1  # s between stop checks in blocking queue waits
+
+
+class VisionTask(NamedTuple):
+    """The two halves of a per-frame detector"""
+    preprocess: Callable[[], Callable[[np.ndarray], Optional[np.ndarray]]]  # factory; None = frame skipped
+    detect: Callable[[np.ndarray, np.ndarray], Any]  # (frame, preprocessed) -> label
+
+
+def _box_preprocess():
+    from find_box_color import BOX_MODE
+    from roi import first_pass_hsv
+    return lambda frame: first_pass_hsv(frame, BOX_MODE)
+
+
+def _box_detect(frame, hsv):
+    from find_box_color import box_label
+    return box_label(frame, hsv=hsv)
+
+
+def _ball_preprocess():
+    from roi import first_pass_hsv
+    from take_potato import BALL_MODE
+    return lambda frame: first_pass_hsv(frame, BALL_MODE)
+
+
+def _ball_detect(frame, hsv):
+    from take_potato import ball_label
+    return ball_label(frame, hsv=hsv)
+
+
+def _tag_preprocess():
+    from is_red_good import TAG_ROI
+    from roi import crop
+    from temporal import TemporalFilter
+    denoise = TemporalFilter(depth=3, mode="median")
+    return lambda frame: denoise(crop(frame, TAG_ROI)[0])
+
+
+def _tag_detect(frame, gray):
+    from is_red_good import TAG_SCALES, TAG_SWEEP
+    from tag_detector import detect
+    tags = detect(gray, scales=TAG_SCALES, sweep=TAG_SWEEP)
+    if not tags:
+        return None
+    return "true" if tags[0].id % 2 == 0 else "false"
+
+
+# The tasks' per-frame work, split as in find_box_color, take_potato and is_red_good
+TASKS: Dict[str, VisionTask] = {
+    "box": VisionTask(_box_preprocess, _box_detect),
+    "ball": VisionTask(_ball_preprocess, _ball_detect),
+    "tag": VisionTask(_tag_preprocess, _tag_detect),
+}
+
+
+class Result(NamedTuple):
+    seq: int
+    label: Any  # None if preprocessing skipped the frame (filter not primed), a stage failed or nothing was found
+    captured: float  # time.monotonic() when the frame had been read (same clock in every process)
+    done: float  # time.monotonic() when its detection finished
+
+
+class SharedRing:
+    """`slots` equally sized buffers in one shared-memory block, viewed as numpy arrays"""
+
+    def __init__(self, slots: int, slot_bytes: int, name: Optional[str] = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+    def view(self, slot: int, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        return np.ndarray(shape, dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def close(self) -> None:
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _get(q, stop) -> Any:
+    """q.get() that gives up (returns None) once `stop` is set"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=POLL)
+        except queue.Empty:
+            continue
+    return None
+
+
+def _capture_stage(spec, fps, max_frames, drop, shape, frames_name, slots, free, captured, stop, dropped):
+    ring = SharedRing(slots, int(np.prod(shape)), frames_name)
+    source = open_source(spec, fps=fps)
+    source.loop = max_frames is not None
+    scratch = np.empty(shape, np.uint8)
+    seq = 0
+    try:
+        if not source.open():
+            return
+        while not stop.is_set() and (max_frames is None or seq < max_frames):
+            if drop:
+                try:
+                    slot = free.get_nowait()
+                except queue.Empty:
+                    # Every slot is still in use: read and discard so the camera does not back up
+                    if source.read(scratch)[0]:
+                        with dropped.get_lock():
+                            dropped.value += 1
+                    continue
+            else:
+                slot = _get(free, stop)
+                if slot is None:
+                    break
+            out = ring.view(slot, shape)
+            ret, frame = source.read(out)
+            if not ret or frame is None:
+                free.put(slot)
+                break
+            start = time.monotonic()
+            if frame is not out:
+                np.copyto(out, frame)  # the source could not decode in place
+            captured.put((slot, seq, start))
+            seq += 1
+    finally:
+        source.release()
+        captured.put(None)
+        ring.close()
+
+
+def _preprocess_stage(task_name, shape, frames_name, pre_name, slots, workers, free, captured, ready, results,
+                      stop):
+    frames = SharedRing(slots, int(np.prod(shape)), frames_name)
+    pre = SharedRing(slots, int(np.prod(shape)), pre_name)
+    try:
+        preprocess = TASKS[task_name].preprocess()
+        while True:
+            item = _get(captured, stop)
+            if item is None:
+                break
+            slot, seq, start = item
+            try:
+                out = preprocess(frames.view(slot, shape))
+            except Exception as exc:
+                print(f"Preprocessing frame {seq} failed: {exc}", file=sys.stderr)
+                out = None
+            if out is None:
+                free.put(slot)
+                results.put(Result(seq, None, start, time.monotonic()))
+                continue
+            np.copyto(pre.view(slot, out.shape, out.dtype), out)
+            ready.put((slot, seq, start, out.shape, out.dtype.str))
+    finally:
+        for _ in range(workers):
+            ready.put(None)
+        frames.close()
+        pre.close()
+
+
+def _detect_stage(task_name, shape, frames_name, pre_name, slots, free, ready, results, stop):
+    frames = SharedRing(slots, int(np.prod(shape)), frames_name)
+    pre = SharedRing(slots, int(np.prod(shape)), pre_name)
+    detect = TASKS[task_name].detect
+    try:
+        while True:
+            item = _get(ready, stop)
+            if item is None:
+                break
+            slot, seq, start, pre_shape, pre_dtype = item
+            label = None
+            try:
+                label = detect(frames.view(slot, shape), pre.view(slot, pre_shape, np.dtype(pre_dtype)))
+            except Exception as exc:
+                # A result for every frame all the same: results() waits for each seq in order
+                print(f"Detecting frame {seq} failed: {exc}", file=sys.stderr)
+            finally:
+                free.put(slot)
+            results.put(Result(seq, label, start, time.monotonic()))
+    finally:
+        results.put(None)
+        frames.close()
+        pre.close()
+
+
+def probe(spec) -> Tuple[int, ...]:
+    """Shape of the first frame of a source"""
+    source = open_source(spec, fps=None)
+    try:
+        if not source.open():
+            raise OSError(f"Cannot open video source {spec!r}")
+        ret, frame = source.read()
+        if not ret:
+            raise OSError(f"Video source {spec!r} returned no frames")
+        return frame.shape
+    finally:
+        source.release()
+
+
+class VisionPipeline:
+    """Capture, preprocess and `workers` detect processes over two shared-memory rings.
+
+    spec: device index, video file or image directory (camera_service.open_source)
+    fps: pace file sources like a camera (None: as fast as they decode)
+    max_frames: stop after this many frames (file sources loop); None: until the source ends
+    """
+
+    def __init__(self, spec, task: str = "box", workers: int = 2, slots: int = 8, drop: bool = False,
+                 fps: Optional[float] = None, max_frames: Optional[int] = None):
+        if task not in TASKS:
+            raise ValueError(f"task must be one of {sorted(TASKS)}")
+        if slots < workers + 2:
+            raise ValueError("Need at least one slot per stage (slots >= workers + 2)")
+        self.spec = spec
+        self.task = task
+        self.workers = workers
+        self.slots = slots
+        self.drop = drop
+        self.fps = fps
+        self.max_frames = max_frames
+        self.shape: Optional[Tuple[int, ...]] = None
+        self._processes: List[mp.Process] = []
+        self._rings: List[SharedRing] = []
+        self._results = None
+        self._stop = None
+        self._dropped = None
+
+    @property
+    def dropped(self) -> int:
+        """Frames the capture stage discarded because every slot was busy (drop mode)"""
+        return self._dropped.value if self._dropped is not None else 0
+
+    def start(self) -> "VisionPipeline":
+        self.shape = probe(self.spec)
+        frames = SharedRing(self.slots, int(np.prod(self.shape)))
+        pre = SharedRing(self.slots, int(np.prod(self.shape)))
+        self._rings = [frames, pre]
+        free, captured, ready, self._results = mp.Queue(), mp.Queue(), mp.Queue(), mp.Queue()
+        for slot in range(self.slots):
+            free.put(slot)
+        self._stop = mp.Event()
+        self._dropped = mp.Value("l", 0)
+        stages = [("vision-capture", _capture_stage,
+                   (self.spec, self.fps, self.max_frames, self.drop, self.shape, frames.name, self.slots,
+                    free, captured, self._stop, self._dropped)),
+                  ("vision-preprocess", _preprocess_stage,
+                   (self.task, self.shape, frames.name, pre.name, self.slots, self.workers, free, captured,
+                    ready, self._results, self._stop))]
+        stages += [(f"vision-detect-{i}", _detect_stage,
+                    (self.task, self.shape, frames.name, pre.name, self.slots, free, ready, self._results,
+                     self._stop)) for i in range(self.workers)]
+        for name, target, args in stages:
+            process = mp.Process(target=target, args=args, name=name, daemon=True)
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def results(self) -> Iterator[Result]:
+        """Detection results in frame order, until the source ends or stop()"""
+        pending: List[Result] = []
+        next_seq = 0
+        running = self.workers
+        while running:
+            item = _get(self._results, self._stop)
+            if item is None:
+                if self._stop.is_set():
+                    return
+                running -= 1
+                continue
+            heapq.heappush(pending, item)
+            while pending and pending[0].seq == next_seq:
+                yield heapq.heappop(pending)
+                next_seq += 1
+        while pending:
+            yield heapq.heappop(pending)
+
+    def decide(self, policy: DecisionPolicy, clock=time.monotonic) -> Decision:
+        """Vote on the labels in frame order until the policy settles (as the task loops do)"""
+        vote = policy.start(clock)
+        for result in self.results():
+            if result.label is not None:
+                vote.add(result.label)
+            if vote.done:
+                break
+        return vote.decision()
+
+    def stop(self) -> None:
+        """Stop every stage and free the shared memory"""
+        if self._stop is not None:
+            self._stop.set()
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        for ring in self._rings:
+            ring.close()
+        self._rings = []
+
+    def __enter__(self) -> "VisionPipeline":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("task", choices=sorted(TASKS))
+    parser.add_argument("source", help="Video file, image directory or device index")
+    parser.add_argument("--workers", type=int, default=2, help="Detect processes")
+    parser.add_argument("--frames", type=int, help="Stop after this many frames (loops the source)")
+    args = parser.parse_args()
+
+    with VisionPipeline(args.source, args.task, args.workers, max_frames=args.frames) as pipeline:
+        start = time.monotonic()
+        results = list(pipeline.results())
+        elapsed = time.monotonic() - start
+    latencies = sorted((r.done - r.captured) * 1000 for r in results)
+    if latencies:
+        print(f"{len(results)} frames, {len(results) / elapsed:.1f} frames/s, "
+              f"latency p50 {latencies[len(latencies) // 2]:.1f} ms, max {latencies[-1]:.1f} ms")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Frames/s and end-to-end latency of the single-process vision loop vs. the
+multi-process shared-memory pipeline (vision_pipeline.py), on recorded video.
+
+For each task (box, ball, tag):
+  throughput  the video decoded as fast as possible; frames/s
+  latency     the video paced like a camera (--fps), pipeline in drop mode;
+              ms from a frame being read to its label, p50 / p95
+  labels      whether the pipeline's labels equal the single loop's, frame by frame
+
+Without --video a clip is synthesized: red and blue boxes, an orange ball
+and an AprilTag 16h5 moving over a gray background.
+
+Usage: python3 vision_pipeline_benchmark.py [--video clip.mp4] [--workers 1 2 3] [--fps 30]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("HOPE_HAL", "sim")  # take_potato (ball task) opens GPIO at import
+
+import cv2
+import numpy as np
+
+from camera_service import open_source
+from find_box_color import box_label
+from is_red_good import TAG_ROI, TAG_SCALES, TAG_SWEEP
+from roi import crop
+from tag_detector import detect
+from take_potato import ball_label
+from temporal import TemporalFilter
+from vision_pipeline import VisionPipeline
+
+WARMUP = 10  # first frames left out of the latency figures (imports, buffer allocation)
+
+
+def synthesize(path, frames=300, size=(640, 480)):
+    """Moving boxes, ball and tag on gray, as an MJPG video"""
+    width, height = size
+    tag = cv2.aruco.generateImageMarker(cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_16h5), 4, 120)
+    tag = cv2.copyMakeBorder(tag, 20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, size)
+    for i in range(frames):
+        frame = np.full((height, width, 3), 110, np.uint8)
+        phase = (i // 50) % 3
+        x = 40 + (i * 3) % 200
+        if phase == 0:
+            cv2.rectangle(frame, (x, 120), (x + 260, 360), (30, 30, 200), -1)  # red box
+        elif phase == 1:
+            cv2.rectangle(frame, (x, 120), (x + 260, 360), (200, 80, 20), -1)  # blue box
+        else:
+            cv2.circle(frame, (x + 130, 240), 110, (20, 120, 240), -1)  # orange ball
+        y = 20 + (i * 2) % 60
+        frame[y:y + tag.shape[0], width - tag.shape[1] - 20:width - 20] = tag[:, :, None]
+        writer.write(frame)
+    writer.release()
+
+
+def tag_loop():
+    denoise = TemporalFilter(depth=3, mode="median")
+
+    def label(frame):
+        gray = denoise(crop(frame, TAG_ROI)[0])
+        if gray is None:
+            return None
+        tags = detect(gray, scales=TAG_SCALES, sweep=TAG_SWEEP)
+        return ("true" if tags[0].id % 2 == 0 else "false") if tags else None
+    return label
+
+
+LOOPS = {"box": lambda: box_label, "ball": lambda: ball_label, "tag": tag_loop}
+
+
+def single_loop(video, task, fps, frames):
+    """The task loops' shape: read a frame, label it, repeat. Returns (labels, seconds, latencies ms)"""
+    label = LOOPS[task]()
+    source = open_source(video, fps=fps)
+    source.open()
+    labels, latencies = [], []
+    start = time.monotonic()
+    try:
+        while len(labels) < frames:
+            ret, frame = source.read()
+            if not ret:
+                break
+            captured = time.monotonic()
+            labels.append(label(frame))
+            latencies.append((time.monotonic() - captured) * 1000)
+    finally:
+        source.release()
+    return labels, time.monotonic() - start, latencies[WARMUP:]
+
+
+def pipeline_run(video, task, workers, fps, frames):
+    drop = fps is not None
+    with VisionPipeline(video, task, workers, drop=drop, fps=fps, max_frames=frames) as pipeline:
+        start = time.monotonic()
+        results = list(pipeline.results())
+        elapsed = time.monotonic() - start
+    latencies = [(r.done - r.captured) * 1000 for r in results][WARMUP:]
+    return [r.label for r in results], elapsed, latencies
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return float("nan"), float("nan")
+    return statistics.median(values), values[min(len(values) - 1, int(len(values) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", help="Recorded video (default: a synthesized clip)")
+    parser.add_argument("--tasks", nargs="+", default=["box", "ball", "tag"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=float, default=30.0, help="Camera rate for the latency runs")
+    args = parser.parse_args()
+
+    video = args.video
+    if video is None:
+        video = os.path.join(tempfile.mkdtemp(prefix="hope_vision_"), "clip.avi")
+        synthesize(video, args.frames)
+    latency_frames = min(args.frames, int(args.fps * 5))
+
+    print(f"{os.cpu_count()} CPU cores; throughput over {args.frames} frames, "
+          f"latency over {latency_frames} frames at {args.fps:g} fps")
+    print(f"{'task':<6}{'mode':<14}{'frames/s':>10}{'p50 ms':>9}{'p95 ms':>9}  labels")
+    for task in args.tasks:
+        labels, elapsed, _ = single_loop(video, task, None, args.frames)
+        _, _, latencies = single_loop(video, task, args.fps, latency_frames)
+        p50, p95 = percentiles(latencies)
+        print(f"{task:<6}{'single loop':<14}{len(labels) / elapsed:>10.1f}{p50:>9.1f}{p95:>9.1f}")
+        for workers in args.workers:
+            piped, elapsed, _ = pipeline_run(video, task, workers, None, args.frames)
+            _, _, latencies = pipeline_run(video, task, workers, args.fps, latency_frames)
+            p50, p95 = percentiles(latencies)
+            same = "same" if piped == labels else f"{sum(a != b for a, b in zip(piped, labels))} differ"
+            print(f"{'':<6}{f'{workers} detect':<14}{len(piped) / elapsed:>10.1f}{p50:>9.1f}{p95:>9.1f}  {same}")
+
+
+if __name__ == '__main__':
+    main()